@@ -1,162 +1,474 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-import tempfile, zipfile, os, json
-from app.parser import extract_cv_from_file
-from app.scoring import score_cv
-from app.llm import extract_structured_cv, generate_explanation
+from fastapi.responses import StreamingResponse, PlainTextResponse
+import asyncio, tempfile, zipfile, os, json, shutil, time
+from app.ranking import score_candidate, score_stored, rank_page, select_top, decode_cursor
+from app.scoring import compile_config
+from app.explain import explanations
+from app.pipeline import extract_cvs, iter_cvs
+from app.cache import get_cache
+from app.llm_client import get_llm_client
+from app.batches import batches
+from app.jobs import get_job_queue
+from app.ingest import save_upload, open_cv_zip, ZipLimitError
+from app.store import get_store
+from app.search import get_search_index, build_search_index
+from app.profiles import get_profiles, validate_config, validate_mappings
+from app.logs import get_logger
+from app.metrics import span, REGISTRY
+
+log = get_logger(__name__)
 
 router = APIRouter()
 
-@router.post("/rank")
-async def rank_cvs(
-    cvs_zip: UploadFile = File(...),
-    config: str = Form(...),
-    mappings: str = Form(...)
-):
-    print("\n" + "="*80)
-    print("===== /rank ENDPOINT CALLED =====")
-    print("="*80)
-    
-    # --- Load config and mappings ---
+def load_scoring_inputs(config, mappings):
+    """Parse and validate the config/mappings JSON form fields."""
     try:
         config = json.loads(config)
         mappings = json.loads(mappings)
-        print("✓ Config loaded successfully:")
-        print(f"  Weights: {config.get('weights', {})}")
-        print(f"✓ Mappings loaded successfully:")
-        print(f"  Degree levels: {list(mappings.get('degree_levels', {}).keys())}")
-        print(f"  University tiers: {list(mappings.get('university_tiers', {}).keys())}")
+        validate_config(config)
+        validate_mappings(mappings)
+        log.debug("scoring_inputs_loaded", weights=config.get("weights", {}),
+                  degree_levels=len(mappings.get("degree_levels", {})),
+                  university_tiers=len(mappings.get("university_tiers", {})))
     except Exception as e:
-        print(f"✗ Error loading config/mappings: {e}")
+        log.warning("scoring_inputs_invalid", error=str(e))
         raise HTTPException(400, f"Invalid config/mappings: {e}")
+    return config, mappings
 
-    cvs = []
+
+def resolve_scoring(profile, config, mappings):
+    """
+    (config, mappings, compiled config, profile info) for a request: the
+    named server-side profile, or the config/mappings form fields. A
+    profile is validated and compiled once, not per request.
+    """
+    if profile:
+        p = get_profiles().get(profile)
+        if p is None:
+            raise HTTPException(404, f"Unknown scoring profile: {profile}")
+        return p.config, p.mappings, p.cfg, {"id": p.id, "version": p.version}
+    if config is None or mappings is None:
+        raise HTTPException(400, "Send a scoring profile, or both config and mappings")
+    config, mappings = load_scoring_inputs(config, mappings)
+    return config, mappings, compile_config(config, mappings), None
+
+
+async def open_upload(cvs_zip, tmp):
+    """
+    Stream the uploaded zip into `tmp` and list its CV members lazily;
+    nothing is extracted to disk. Caller closes the returned ZipFile.
+    """
+    zip_path = os.path.join(tmp, "upload.zip")
+    try:
+        with span("unzip"):
+            size = await save_upload(cvs_zip, zip_path)
+            zf, members = await asyncio.to_thread(open_cv_zip, zip_path)
+    except (ZipLimitError, zipfile.BadZipFile) as e:
+        log.warning("upload_rejected", upload=cvs_zip.filename, error=str(e))
+        raise HTTPException(400, f"Invalid zip upload: {e}")
+    log.info("upload_received", upload=cvs_zip.filename, mb=round(size / 1024 / 1024, 1), cvs=len(members))
+    return zf, members
+
+
+def check_paging(top_k, offset, min_score, cursor):
+    """Validate the top_k/offset/min_score/cursor ranking parameters."""
+    if top_k is not None and top_k < 0 or offset < 0:
+        raise HTTPException(400, "top_k and offset must be non-negative")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    return {"top_k": top_k, "offset": offset, "min_score": min_score, "cursor": cursor}
+
+
+async def store_cvs(cvs, source):
+    """Append extracted CVs to the persistent candidate store (if enabled)."""
+    store = get_store()
+    if store is None:
+        return
+    try:
+        await asyncio.to_thread(store.add_many, cvs, source)
+    except Exception as e:
+        log.warning("candidate_store_failed", error=str(e))
+
+
+@router.post("/rank")
+async def rank_cvs(
+    cvs_zip: UploadFile = File(...),
+    profile: str = Form(None),
+    config: str = Form(None),
+    mappings: str = Form(None),
+    top_k: int = Form(None),
+    offset: int = Form(0),
+    min_score: float = Form(None),
+    cursor: str = Form(None)
+):
+    """
+    Extract and rank every CV in the zip, scored with the server-side
+    `profile` (see /profiles) or with the `config` and `mappings` JSON.
+    `top_k`, `offset`, `min_score` and `cursor` select one page of the
+    ranking (default: all of it); use the returned `next_cursor` with
+    /batches/{batch_id}/rescore for more.
+    """
+    paging = check_paging(top_k, offset, min_score, cursor)
+
+    # --- Load config and mappings ---
+    config, mappings, cfg, profile = resolve_scoring(profile, config, mappings)
+
+    cvs, duplicates = [], []
 
     try:
         with tempfile.TemporaryDirectory() as tmp:
-            zip_path = os.path.join(tmp, cvs_zip.filename)
-            with open(zip_path, "wb") as f:
-                f.write(await cvs_zip.read())
-            print(f"\n✓ Zip file uploaded: {cvs_zip.filename}")
-            print(f"  Saved to: {zip_path}")
-
-            with zipfile.ZipFile(zip_path, "r") as z:
-                z.extractall(tmp)
-                file_list = z.namelist()
-            print(f"✓ Zip extracted successfully")
-            print(f"  Files found: {file_list}")
+            zf, members = await open_upload(cvs_zip, tmp)
 
             # --- Extract CVs from files ---
-            print(f"\n{'='*80}")
-            print("EXTRACTING CVs FROM FILES")
-            print(f"{'='*80}")
-            
-            file_count = 0
-            for root, _, files in os.walk(tmp):
-                for file in files:
-                    if file.lower().endswith((".pdf", ".docx")):
-                        file_count += 1
-                        file_path = os.path.join(root, file)
-                        print(f"\n[{file_count}] Processing: {file}")
-                        print("-" * 60)
-                        
-                        try:
-                            # Extract raw text
-                            print("  → Extracting text from file...")
-                            text = extract_cv_from_file(file_path)
-                            text_preview = text[:300].replace('\n', ' ')
-                            print(f"  ✓ Text extracted ({len(text)} chars)")
-                            print(f"  Preview: {text_preview}...")
-                            
-                            # Extract structured JSON via Gemini
-                            print("  → Calling LLM for structured extraction...")
-                            cv_json = extract_structured_cv(text, file)
-                            print(f"  ✓ Structured data extracted:")
-                            print(f"     Name: {cv_json.get('name', 'N/A')}")
-                            print(f"     Education entries: {len(cv_json.get('education', []))}")
-                            print(f"     Experience entries: {len(cv_json.get('experience', []))}")
-                            print(f"     Publications: {len(cv_json.get('publications', []))}")
-                            print(f"     Awards: {len(cv_json.get('awards', []))}")
-                            
-                            cvs.append(cv_json)
-                            print(f"  ✓ CV added to list (Total: {len(cvs)})")
-                            
-                        except Exception as e:
-                            print(f"  ✗ Error processing {file}: {e}")
-                            import traceback
-                            traceback.print_exc()
-                            continue
-
-        print(f"\n{'='*80}")
-        print(f"EXTRACTION COMPLETE: {len(cvs)} CVs processed successfully")
-        print(f"{'='*80}")
+            # OCR runs on a process pool, LLM calls are rate limited;
+            # results keep zip order so ranking matches the serial path.
+            with zf:
+                cvs = await extract_cvs(members, clusters=duplicates)
+
+        log.info("extraction_complete", cvs=len(cvs), files=len(members), duplicate_clusters=len(duplicates))
 
         if len(cvs) < 1:
-            print("✗ ERROR: No CVs were successfully processed!")
             raise HTTPException(400, "At least 1 CV required for processing")
 
-        # --- Scoring ---
-        print(f"\n{'='*80}")
-        print("SCORING CVs")
-        print(f"{'='*80}")
-        
-        ranked = []
-        for idx, cv in enumerate(cvs, 1):
-            try:
-                print(f"\n[{idx}] Scoring: {cv.get('name', 'Unknown')}")
-                print("-" * 60)
-                
-                score = score_cv(cv, config, mappings)
-                
-                candidate_data = {
-                    "name": cv.get("name", "Unknown"),
-                    "sys_score": score,
-                    "subscores": {
-                        "education": cv.get("education_score", 0),
-                        "experience": cv.get("experience_score", 0),
-                        "publications": cv.get("publications_score", 0),
-                        "coherence": cv.get("coherence_score", 0),
-                        "awards": cv.get("awards_score", 0),
-                    },
-                    "explanation": {
-                        "summary": f"Candidate with {score:.2f} overall score",
-                        "reasons": ["Well-qualified candidate based on assessment criteria"]
-                    }
-                }
-                
-                ranked.append(candidate_data)
-                print(f"  ✓ Score calculated: {score:.2f}")
-                print(f"     Education: {candidate_data['subscores']['education']:.2f}")
-                print(f"     Experience: {candidate_data['subscores']['experience']:.2f}")
-                print(f"     Publications: {candidate_data['subscores']['publications']:.2f}")
-                
-            except Exception as e:
-                print(f"  ✗ Error scoring CV: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-
-        # --- Ranking ---
-        print(f"\n{'='*80}")
-        print("FINAL RANKING")
-        print(f"{'='*80}")
-        
-        ranked.sort(key=lambda x: x["sys_score"], reverse=True)
-        
-        for i, c in enumerate(ranked, 1):
-            print(f"  {i}. {c['name']:<30} Score: {c['sys_score']:.2f}")
-
-        print(f"\n{'='*80}")
-        print(f"✓ RANKING COMPLETE - Returning {len(ranked)} candidates")
-        print(f"{'='*80}\n")
-
-        response_data = {"ranked_candidates": ranked}
-        print(f"Response JSON preview:")
-        print(json.dumps(response_data, indent=2)[:500] + "...")
-        
-        return response_data
+        page = rank_page(cvs, config, mappings, cfg=cfg, **paging)
+        batch_id = batches.create(cvs, (config, mappings))
+        await store_cvs(cvs, "rank")
+
+        return {"batch_id": batch_id, **page, "duplicates": duplicates, "profile": profile}
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in /rank: {e}")
+        log.exception("rank_failed")
         raise HTTPException(500, f"Internal server error: {str(e)}")
+
+
+@router.post("/rank/stream")
+async def rank_cvs_stream(
+    cvs_zip: UploadFile = File(...),
+    profile: str = Form(None),
+    config: str = Form(None),
+    mappings: str = Form(None),
+    top_k: int = Form(None),
+    offset: int = Form(0),
+    min_score: float = Form(None),
+    cursor: str = Form(None)
+):
+    """
+    Same as /rank, but streams NDJSON events as each CV finishes:
+    {"event": "start"}, then "progress" and "candidate" per CV, and a
+    final "ranking" event (or "error" if no CV could be processed).
+    Batch positions (for /explain) are only known once every file is
+    done, so "candidate" events have no `position`; the candidates in
+    "ranking" carry it.
+    """
+    paging = check_paging(top_k, offset, min_score, cursor)
+    config, mappings, cfg, profile = resolve_scoring(profile, config, mappings)
+
+    # The upload is unpacked before the response starts; the temp dir is
+    # removed once the stream finishes or the client disconnects.
+    tmp = tempfile.mkdtemp()
+    try:
+        zf, members = await open_upload(cvs_zip, tmp)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    async def events():
+        def line(event, **data):
+            return json.dumps({"event": event, **data}) + "\n"
+
+        # only compact candidate rows are kept for the final ranking
+        scored, cvs, reports, duplicates, done = [], {}, {}, [], 0
+        try:
+            yield line("start", total=len(members), profile=profile)
+            async for idx, filename, cv in iter_cvs(members, reports=reports, clusters=duplicates):
+                done += 1
+                parse = reports.pop(idx, None)
+                if isinstance(cv, Exception):
+                    yield line("progress", done=done, total=len(members), file=filename,
+                               ok=False, error=str(cv), parse=parse)
+                    continue
+                cvs[idx] = cv
+                candidate = score_candidate(cv, cfg)
+                yield line("progress", done=done, total=len(members), file=filename,
+                           ok=candidate is not None, parse=parse)
+                if candidate is not None:
+                    scored.append((idx, candidate))
+                    yield line("candidate", candidate={k: v for k, v in candidate.items() if k != "position"})
+
+            if not cvs:
+                yield line("error", detail="At least 1 CV required for processing")
+                return
+            # ties keep file order, exactly like /rank; positions match the
+            # stored batch so the cursor also works with /rescore
+            order = sorted(cvs)
+            position = {idx: pos for pos, idx in enumerate(order)}
+            candidates = {position[idx]: c for idx, c in scored}
+            page, total, next_cursor = select_top(
+                ((c["sys_score"], pos) for pos, c in candidates.items()), **paging)
+            for pos, c in candidates.items():
+                c["position"] = pos
+            batch_id = batches.create([cvs[i] for i in order], (config, mappings))
+            await store_cvs([cvs[i] for i in order], "rank/stream")
+            yield line("ranking", batch_id=batch_id, ranked_candidates=[candidates[pos] for _, pos in page],
+                       total=total, next_cursor=next_cursor, duplicates=duplicates)
+        finally:
+            zf.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus-style stage latency histograms and counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.info()}
+
+
+@router.get("/llm/stats")
+def llm_stats():
+    client = get_llm_client()
+    if client is None:
+        return {"enabled": False}
+    return {"enabled": True, "circuit": client.breaker.state, **client.metrics.as_dict()}
+
+
+@router.get("/candidates")
+def query_candidates(degree: str = None, domain: str = None, min_months: int = None,
+                     venue: str = None, limit: int = 50, profile: str = None):
+    """
+    Filter the candidate store, e.g. /candidates?degree=phd&domain=nlp&min_months=24.
+    With a scoring `profile` the matches are ranked best first by
+    `sys_score`, scored straight from the store's tables.
+    """
+    store = get_store()
+    if store is None:
+        raise HTTPException(404, "Candidate store is disabled")
+    ids = store.query(degree=degree, domain=domain, min_months=min_months, venue=venue)
+    if profile:
+        config, mappings, _, info = resolve_scoring(profile, None, None)
+        with span("scoring"):
+            pool_ids, scores = score_stored(store, config, mappings, ids)
+        page, scored, _ = select_top(((float(s), i) for i, s in enumerate(scores)), max(limit, 0))
+        names = store.names([pool_ids[i] for _, i in page])
+        return {
+            "total": len(ids),
+            "scored": scored,
+            "profile": info,
+            "candidates": [{"id": int(pool_ids[i]), "name": names.get(int(pool_ids[i])), "sys_score": s}
+                           for s, i in page],
+        }
+    return {
+        "total": len(ids),
+        "candidates": [{"id": cid, "name": cv.get("name")} for cid, cv in store.get_many(ids[:max(limit, 0)])],
+    }
+
+
+@router.get("/candidates/stats")
+def candidate_stats():
+    store = get_store()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.info()}
+
+
+@router.get("/search")
+async def search_candidates(q: str, top_k: int = 20):
+    """
+    Stored candidates closest to a free-text query or job description.
+    Candidates added since the last index build are searched too, up to
+    SEARCH_FRESH_MAX of them; `not_searched` counts the rest until the
+    index is rebuilt.
+    """
+    store = get_store()
+    if store is None:
+        raise HTTPException(404, "Candidate store is disabled")
+    index = get_search_index()
+    if index is None:
+        raise HTTPException(409, "No search index yet; build it with POST /search/index")
+    if top_k < 1:
+        raise HTTPException(400, "top_k must be >= 1")
+    started = time.perf_counter()
+    with span("search"):
+        hits, pending, skipped = await asyncio.to_thread(index.search_fresh, store, q, top_k)
+    if skipped:
+        log.warning("search_index_stale", not_yet_indexed=pending, not_searched=skipped,
+                    hint="rebuild with POST /search/index")
+    return {
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "indexed": index.meta["count"],
+        "not_yet_indexed": pending,
+        "not_searched": skipped,
+        "results": [{"id": cid, "name": name, "score": round(sim, 4)} for cid, sim, name in hits],
+    }
+
+
+@router.post("/search/index")
+async def rebuild_search_index():
+    """(Re)build the search index over the whole candidate store."""
+    store = get_store()
+    if store is None:
+        raise HTTPException(404, "Candidate store is disabled")
+    try:
+        index = await asyncio.to_thread(build_search_index, store)
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    return index.meta
+
+
+def batch_cvs(batch_id):
+    """
+    CVs of an uploaded batch, or None if unknown or expired. A background
+    job's batch (named after the job) is reloaded from the job store when it
+    is no longer in memory, e.g. after a restart.
+    """
+    cvs = batches.get(batch_id)
+    if cvs is None:
+        restored = get_job_queue().store.batch(batch_id)
+        if restored is not None:
+            cvs, scoring = restored
+            batches.create(cvs, scoring, batch_id=batch_id)
+    return cvs
+
+
+@router.post("/batches/{batch_id}/rescore")
+def rescore_batch(
+    batch_id: str,
+    profile: str = Form(None),
+    config: str = Form(None),
+    mappings: str = Form(None),
+    top_k: int = Form(None),
+    offset: int = Form(0),
+    min_score: float = Form(None),
+    cursor: str = Form(None)
+):
+    """
+    Re-rank an uploaded batch with new weights or another `profile`
+    without re-extracting the CVs. Also serves further pages of a ranking
+    via `cursor`.
+    """
+    paging = check_paging(top_k, offset, min_score, cursor)
+    cvs = batch_cvs(batch_id)
+    if cvs is None:
+        raise HTTPException(404, f"Unknown or expired batch: {batch_id}")
+    config, mappings, cfg, profile = resolve_scoring(profile, config, mappings)
+    batches.set_scoring(batch_id, config, mappings)
+    return {"batch_id": batch_id, **rank_page(cvs, config, mappings, cfg=cfg, **paging), "profile": profile}
+
+
+@router.get("/profiles")
+def list_profiles():
+    """Server-side scoring profiles, with their version and any load error."""
+    return {"profiles": get_profiles().list()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    profile = get_profiles().get(profile_id)
+    if profile is None:
+        raise HTTPException(404, f"Unknown scoring profile: {profile_id}")
+    return {**profile.info(), "config": profile.config, "mappings": profile.mappings}
+
+
+@router.post("/profiles/reload")
+def reload_profiles():
+    """Re-read every profile file now instead of waiting for the next check."""
+    profiles = get_profiles()
+    profiles.refresh(force=True)
+    return {"profiles": profiles.list()}
+
+
+@router.get("/explain")
+async def explain_pair(batch_id: str, a: int, b: int, narrative: bool = True):
+    """
+    Why candidate `a` ranks above or below `b` (positions in the batch, as
+    returned in `ranked_candidates`), under the config the batch was last
+    ranked with. The feature diff is returned immediately; the LLM narrative
+    is generated in the background, so poll until `narrative.status` is not
+    "pending".
+    """
+    cvs = await asyncio.to_thread(batch_cvs, batch_id)
+    scoring = batches.get_scoring(batch_id)
+    if cvs is None or scoring is None:
+        raise HTTPException(404, f"Unknown or expired batch: {batch_id}")
+    for pos in (a, b):
+        if not 0 <= pos < len(cvs):
+            raise HTTPException(400, f"Position {pos} is out of range (batch has {len(cvs)} CVs)")
+    config, mappings = scoring
+    try:
+        result = explanations.explain(cvs[a], cvs[b], config, mappings, narrative)
+    except Exception as e:
+        raise HTTPException(422, f"Cannot score these candidates: {e}")
+    return {"batch_id": batch_id, "a": cvs[a].get("name"), "b": cvs[b].get("name"), **result}
+
+
+@router.get("/explain/stats")
+def explain_stats():
+    return explanations.stats()
+
+
+@router.post("/jobs")
+async def submit_job(
+    cvs_zip: UploadFile = File(...),
+    profile: str = Form(None),
+    config: str = Form(None),
+    mappings: str = Form(None)
+):
+    """Queue a zip for background ranking; poll /jobs/{id} for progress."""
+    # the job keeps a copy of the profile as it is now, even if it is edited later
+    config, mappings, _, profile = resolve_scoring(profile, config, mappings)
+    jobs = get_job_queue()
+    job_id = jobs.store.create(cvs_zip.filename, config, mappings)
+    job_dir = jobs.store.job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    zip_path = os.path.join(job_dir, "upload.zip")
+    try:
+        await save_upload(cvs_zip, zip_path)
+        # validate limits up front so bad uploads fail fast
+        zf, _ = await asyncio.to_thread(open_cv_zip, zip_path)
+        zf.close()
+    except (ZipLimitError, zipfile.BadZipFile) as e:
+        jobs.store.update(job_id, status="failed", error=str(e))
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(400, f"Invalid zip upload: {e}")
+
+    jobs.submit(job_id)
+    return {"job_id": job_id, "status": "queued", "profile": profile}
+
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return {k: job[k] for k in ("id", "status", "filename", "total", "done", "failed", "error", "created", "updated")}
+
+
+@router.get("/jobs/{job_id}/result")
+def job_result(job_id: str, top_k: int = None, offset: int = 0,
+               min_score: float = None, cursor: str = None):
+    paging = check_paging(top_k, offset, min_score, cursor)
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    if job["status"] != "completed":
+        raise HTTPException(409, f"Job is {job['status']}")
+    result = json.loads(job["result"])
+    ranked = result["ranked_candidates"]
+    # stored rankings are already in order, so positions are ranks
+    page, total, next_cursor = select_top(((c["sys_score"], i) for i, c in enumerate(ranked)), **paging)
+    return {**result, "ranked_candidates": [ranked[i] for _, i in page],
+            "total": total, "next_cursor": next_cursor}
@@ -0,0 +1,170 @@
+import numpy as np
+from app.scoring import calculate_months, CompiledConfig
+from app.matcher import get_matcher
+from app.search import semantic_similarity
+
+
+def round2(values):
+    """
+    np.round(x, 2) scales by 100 and can land on the other side of a tie
+    from Python's round(). Re-round the few values near a .005 boundary
+    with round() so results are identical to score_cv.
+    """
+    out = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        out[near_tie] = [round(float(v), 2) for v in values[near_tie]]
+    return out
+
+
+class CandidateColumns:
+    """
+    Columnar view of a candidate pool. Everything that does not depend on
+    weights is resolved once here: mapping lookups, experience months,
+    domain matches, best venue and award counts. Education entries are kept
+    per entry (grouped by candidate) because the best entry depends on the
+    sub-weights.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.valid = np.ones(n, dtype=bool)
+        self.months = np.zeros(n)
+        self.domain = np.zeros(n)
+        self.best_pub = np.zeros(n)
+        self.awards = np.zeros(n)
+        self.semantic = np.zeros(n)
+        # education entries, as (E,) arrays
+        self.edu_owner = None
+        self.edu_degree = None
+        self.edu_tier = None
+        self.edu_gpa = None
+
+
+class BatchScorer:
+    """
+    Vectorized equivalent of `score_cv` for large candidate pools.
+
+    Mappings and policies are compiled once; `columns()` turns a list of CV
+    dicts into NumPy arrays and `score()` scores them against one config
+    (returns shape (N,)) or a list of M configs (returns shape (N, M)) in a
+    single pass. Candidates that `score_cv` would fail on are NaN.
+    """
+
+    def __init__(self, mappings, policies):
+        self.matcher = get_matcher(mappings)
+        self.domain = policies["domain"].lower()
+        self.missing_gpa = policies.get("missing_values_penalty", 0.5)
+        self.job_description = policies.get("job_description") or ""
+
+    def columns(self, cvs):
+        matcher = self.matcher
+        cols = CandidateColumns(len(cvs))
+        owner, degree, tier, gpa = [], [], [], []
+        for i, cv in enumerate(cvs):
+            try:
+                entries = []
+                for e in cv.get("education", []):
+                    g_val = e.get("gpa", self.missing_gpa)
+                    if not isinstance(g_val, (int, float)):
+                        raise TypeError(f"non-numeric gpa {g_val!r}")
+                    entries.append((
+                        matcher.degree(str(e.get("degree", "")).lower()),
+                        matcher.university(e.get("university", "Unknown")),
+                        g_val,
+                    ))
+
+                months, domain = 0, 0
+                for exp in cv.get("experience", []):
+                    months += calculate_months(exp.get("start"), exp.get("end"))
+                    if self.domain in exp.get("domain", "").lower():
+                        domain = 1
+
+                best_pub = 0
+                for pub in cv.get("publications", []):
+                    best_pub = max(best_pub, matcher.venue(pub.get("venue", "Unknown")))
+
+                awards = min(len(cv.get("awards", [])) * 0.5, 1.0)
+            except Exception:
+                # score_cv raises on this candidate; keep the row but mark it
+                cols.valid[i] = False
+                continue
+
+            for d, t, g in entries:
+                owner.append(i)
+                degree.append(d)
+                tier.append(t)
+                gpa.append(g)
+            cols.months[i] = months
+            cols.domain[i] = domain
+            cols.best_pub[i] = best_pub
+            cols.awards[i] = awards
+
+        if self.job_description and cvs:
+            cols.semantic = semantic_similarity(cvs, self.job_description).astype(float)
+
+        cols.edu_owner = np.asarray(owner, dtype=np.int64)
+        cols.edu_degree = np.asarray(degree, dtype=float)
+        cols.edu_tier = np.asarray(tier, dtype=float)
+        cols.edu_gpa = np.asarray(gpa, dtype=float)
+        return cols
+
+    def weight_matrix(self, configs):
+        """Stack the weight-dependent parts of each compiled config into (M,) columns."""
+        rows = []
+        for config in configs:
+            c = CompiledConfig(config, self.matcher)
+            if c.domain != self.domain or c.missing_gpa != self.missing_gpa or \
+                    c.job_description != self.job_description:
+                raise ValueError("All configs in a batch must share domain, missing_values_penalty "
+                                 "and job_description")
+            rows.append((
+                c.s_deg, c.s_tier, c.s_gpa, c.exp_dur, c.exp_dom, c.min_months,
+                c.w_edu, c.w_exp, c.w_pub, c.w_awd, c.w_coh,
+                c.w_sem if self.job_description else 0,
+            ))
+        return np.asarray(rows, dtype=float).T
+
+    def score(self, cols, configs):
+        single = isinstance(configs, dict)
+        (s_deg, s_tier, s_gpa, s_dur, s_dom, min_months,
+         w_edu, w_exp, w_pub, w_awd, w_coh, w_sem) = self.weight_matrix([configs] if single else configs)
+        m = s_deg.shape[0]
+
+        # EDUCATION: best weighted entry per candidate, (N, M)
+        best_edu = np.zeros((cols.n, m))
+        if cols.edu_owner.size:
+            entry_val = (cols.edu_degree[:, None] * s_deg +
+                         cols.edu_tier[:, None] * s_tier +
+                         cols.edu_gpa[:, None] * s_gpa)
+            # entries are grouped by owner, so reduce each contiguous run
+            starts = np.flatnonzero(np.r_[True, cols.edu_owner[1:] != cols.edu_owner[:-1]])
+            best = np.maximum.reduceat(entry_val, starts, axis=0)
+            best_edu[cols.edu_owner[starts]] = np.maximum(best, 0)
+
+        # EXPERIENCE
+        # same rule as score_breakdown: no minimum (0 or less) gives the full duration score
+        positive = min_months > 0
+        dur_score = np.where(positive, np.minimum(cols.months[:, None] / np.where(positive, min_months, 1), 1), 1)
+        exp_val = dur_score * s_dur + cols.domain[:, None] * s_dom
+
+        # FINAL SCORE (same operation order as score_cv)
+        final = (
+            best_edu * 10 * w_edu +
+            exp_val * 10 * w_exp +
+            cols.best_pub[:, None] * 10 * w_pub +
+            cols.awards[:, None] * 10 * w_awd +
+            8.0 * w_coh +
+            cols.semantic[:, None] * 10 * w_sem
+        )
+        final = round2(final)
+        final[~cols.valid] = np.nan
+        return final[:, 0] if single else final
+
+
+def score_batch(cvs, configs, mappings):
+    """Score `cvs` against one config dict or a list of configs sharing policies."""
+    policies = (configs if isinstance(configs, dict) else configs[0])["policies"]
+    scorer = BatchScorer(mappings, policies)
+    return scorer.score(scorer.columns(cvs), configs)
@@ -0,0 +1,65 @@
+import os, threading, time, uuid
+from collections import OrderedDict
+
+# How many uploaded batches to keep and for how long (override in .env)
+MAX_BATCHES = int(os.getenv("MAX_BATCHES", 50))
+BATCH_TTL_MINUTES = float(os.getenv("BATCH_TTL_MINUTES", 120))
+
+
+class BatchStore:
+    """
+    Keeps the structured CVs of recent uploads in memory under a batch ID so
+    they can be re-scored with new weights without re-running extraction.
+    The config and mappings a batch was last ranked with are kept alongside
+    (for /explain). The oldest batches are dropped once `max_batches` is
+    reached.
+    """
+
+    def __init__(self, max_batches=MAX_BATCHES, ttl=BATCH_TTL_MINUTES * 60):
+        self.max_batches = max_batches
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, cvs, scoring=None, batch_id=None):
+        """
+        `scoring` is the (config, mappings) the batch was ranked with.
+        `batch_id` names the batch instead of a new random ID, e.g. a
+        background job's ID so the batch can be reloaded after a restart.
+        """
+        batch_id = batch_id or uuid.uuid4().hex
+        with self.lock:
+            self.items[batch_id] = [time.time(), list(cvs), scoring]
+            while len(self.items) > self.max_batches:
+                self.items.popitem(last=False)
+        return batch_id
+
+    def _entry(self, batch_id):
+        entry = self.items.get(batch_id)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self.items[batch_id]
+            return None
+        self.items.move_to_end(batch_id)
+        return entry
+
+    def get(self, batch_id):
+        with self.lock:
+            entry = self._entry(batch_id)
+            return entry[1] if entry else None
+
+    def get_scoring(self, batch_id):
+        """(config, mappings) the batch was last ranked with, or None."""
+        with self.lock:
+            entry = self._entry(batch_id)
+            return entry[2] if entry else None
+
+    def set_scoring(self, batch_id, config, mappings):
+        with self.lock:
+            entry = self._entry(batch_id)
+            if entry is not None:
+                entry[2] = (config, mappings)
+
+
+batches = BatchStore()
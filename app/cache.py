@@ -0,0 +1,122 @@
+import hashlib, json, os, sqlite3, threading, time
+from app.metrics import REGISTRY
+
+# On-disk cache settings (override in .env)
+CACHE_PATH = os.getenv("CV_CACHE_PATH", "cvs_data/cache/cv_cache.sqlite")
+CACHE_MAX_MB = float(os.getenv("CV_CACHE_MAX_MB", 512))
+CACHE_MAX_AGE_DAYS = float(os.getenv("CV_CACHE_MAX_AGE_DAYS", 30))
+CACHE_ENABLED = os.getenv("CV_CACHE_ENABLED", "1") != "0"
+
+EVICT_EVERY = 50  # puts between eviction sweeps
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CVCache:
+    """
+    Content-addressed SQLite cache for extracted text ("text") and
+    structured CV JSON ("cv"). Entries are evicted by age and, when the
+    cache grows past `max_bytes`, least recently used first.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                 max_age=CACHE_MAX_AGE_DAYS * 86400):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, kind TEXT, value TEXT,
+                size INTEGER, created REAL, accessed REAL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self.db.commit()
+        self.stats = {kind: {"hits": 0, "misses": 0} for kind in ("text", "cv")}
+        self.puts = 0
+        self.evict()
+
+    def get(self, kind, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (f"{kind}:{key}",)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age:
+                self.stats[kind]["misses"] += 1
+                return None
+            self.db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, f"{kind}:{key}"))
+            self.db.commit()
+            self.stats[kind]["hits"] += 1
+            return row[0]
+
+    def put(self, kind, key, value):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (f"{kind}:{key}", kind, value, len(value.encode("utf-8")), now, now))
+            self.db.commit()
+            self.puts += 1
+        if self.puts % EVICT_EVERY == 0:
+            self.evict()
+
+    def get_json(self, kind, key):
+        value = self.get(kind, key)
+        return json.loads(value) if value is not None else None
+
+    def put_json(self, kind, key, obj):
+        self.put(kind, key, json.dumps(obj, ensure_ascii=False))
+
+    def evict(self):
+        with self.lock:
+            self.db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.max_age,))
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used entries until we are back under the limit
+                excess = total - self.max_bytes
+                rows = self.db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                self.db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            self.db.commit()
+
+    def info(self):
+        with self.lock:
+            count, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": int(self.max_bytes), **self.stats}
+
+
+_cache = None
+
+def get_cache():
+    """Shared cache instance, or None when disabled via CV_CACHE_ENABLED=0."""
+    global _cache
+    if _cache is None and CACHE_ENABLED:
+        _cache = CVCache()
+    return _cache
+
+@REGISTRY.collector
+def collect_cache_metrics():
+    if _cache is None:
+        return []
+    return [
+        (f"hr_cache_{kind}_{outcome}_total", "counter", f"CV cache {kind} lookups ({outcome})", n)
+        for kind, stats in _cache.stats.items() for outcome, n in stats.items()
+    ]
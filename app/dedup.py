@@ -0,0 +1,226 @@
+import asyncio, copy, os, re, zlib
+import numpy as np
+from app.metrics import DUPLICATE_CVS
+from app.local_extract import cv_name
+
+# Near-duplicate detection settings (override in .env)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") != "0"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))   # estimated Jaccard of word shingles
+DEDUP_PERMUTATIONS = 128
+SHINGLE_WORDS = 5
+
+WORD_RE = re.compile(r"\w+")
+PRIME = (1 << 32) + 15   # > any 32-bit shingle hash
+
+
+def shingles(text, k=SHINGLE_WORDS):
+    """Hashes of the distinct k-word shingles of `text` (case and spacing ignored)."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return np.unique(np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64))
+
+
+class MinHasher:
+    """MinHash signatures: one universal hash (a*x + b) mod p per permutation."""
+
+    def __init__(self, num_perm=DEDUP_PERMUTATIONS, seed=1):
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a*x inside uint64 for 32-bit x
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text):
+        """(num_perm,) uint32 signature, or None for text without words."""
+        x = shingles(text)
+        if not x.size:
+            return None
+        return ((np.outer(self.a, x) + self.b[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def lsh_bands(num_perm, threshold):
+    """
+    (bands, rows) with bands * rows == num_perm whose S-curve midpoint
+    (1/bands) ** (1/rows) sits well below `threshold`, so true duplicates
+    almost always share a bucket; candidates are then verified exactly.
+    """
+    pairs = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in pairs if (1 / b) ** (1 / r) <= threshold - 0.1]
+    return max(below, key=lambda p: (1 / p[0]) ** (1 / p[1])) if below else pairs[-1]
+
+
+class NearDuplicateIndex:
+    """
+    Incremental LSH index over MinHash signatures. `add` files a document
+    and returns the key of the cluster it belongs to: the first document
+    seen whose estimated Jaccard similarity is at least `threshold`, or the
+    document itself.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_PERMUTATIONS):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+        self.parent = {}
+        self.members = {}
+
+    def add(self, key, text):
+        sig = self.hasher.signature(text)
+        if sig is None:
+            self.parent[key] = key
+            self.members[key] = [key]
+            return key
+
+        band_keys = [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        best, best_sim = None, self.threshold
+        seen = set()
+        for band, bucket in zip(band_keys, self.buckets):
+            for other in bucket.get(band, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                sim = float(np.mean(self.signatures[other] == sig))
+                if sim >= best_sim:
+                    best, best_sim = other, sim
+
+        rep = key if best is None else self.parent[best]
+        self.parent[key] = rep
+        self.members.setdefault(rep, []).append(key)
+        self.signatures[key] = sig
+        for band, bucket in zip(band_keys, self.buckets):
+            bucket.setdefault(band, []).append(key)
+        return rep
+
+    def clusters(self):
+        """{representative: [members, representative first]} for clusters of two or more."""
+        return {rep: keys for rep, keys in self.members.items() if len(keys) > 1}
+
+    def stats(self):
+        return {"documents": len(self.parent), "clusters": len(self.clusters()),
+                "duplicates": len(self.parent) - len(self.members)}
+
+
+class Deduplicator:
+    """
+    Clusters near-identical CV texts with a `NearDuplicateIndex` so
+    each cluster is sent to the LLM once. `keys` lists every CV of the
+    run in order; the member that comes first there is the cluster's
+    representative, whatever order the texts arrive in, and the other
+    members reuse a copy of its result under their own name.
+
+    The first CV of a cluster to arrive is extracted at once. Other
+    members wait until every CV before them in `keys` has arrived (or is
+    `finished`), so the cluster's first member is known. A first arrival
+    that turns out not to be first in `keys` also takes the
+    representative's result, which costs at most one extra extraction per
+    cluster but keeps results the same on every run.
+
+    Finished results stay in memory for later members unless the caller
+    has saved them elsewhere: `saved(key, ref)` drops the result and later
+    members get `load(ref)` instead, so long runs keep one reference per
+    cluster rather than every parsed CV.
+    """
+
+    def __init__(self, keys, load=None):
+        self.index = NearDuplicateIndex()
+        self.position = {key: i for i, key in enumerate(keys)}
+        self.arrived = [False] * len(self.position)
+        self.prefix = 0      # keys before this position have all arrived
+        self.waiters = []    # (position, future) waiting for `prefix` to pass it
+        self.leaders = {}    # index cluster key -> its first member (in `keys`) so far
+        self.results = {}    # extracted key -> future of its extraction
+        self.refs = {}       # extracted key -> reference passed to `saved`
+        self.load = load
+        self.names = {}
+
+    def finished(self, key):
+        """`key` has arrived or will never call `extract` (its text failed, it was skipped)."""
+        pos = self.position[key]
+        if self.arrived[pos]:
+            return
+        self.arrived[pos] = True
+        while self.prefix < len(self.arrived) and self.arrived[self.prefix]:
+            self.prefix += 1
+        ready = [fut for p, fut in self.waiters if p <= self.prefix]
+        self.waiters = [(p, fut) for p, fut in self.waiters if p > self.prefix]
+        for fut in ready:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def earlier_arrived(self, key):
+        pos = self.position[key]
+        if pos > self.prefix:
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append((pos, fut))
+            await fut
+
+    async def extract(self, key, filename, text, extract):
+        """Await `extract()` for a cluster's representative, or a copy of its result for other members."""
+        self.names[key] = filename
+        root = self.index.add(key, text)
+        self.finished(key)
+        leader = self.leaders.get(root)
+        if leader is None:
+            # first of its cluster so far: extract now rather than wait for earlier files
+            self.lead(root, key)
+            cv = await self.run(key, extract)
+            await self.earlier_arrived(key)
+            if self.leaders[root] == key:
+                return cv
+        elif self.position[key] < self.position[leader]:
+            # comes before the cluster's first arrival: extract once nothing earlier can join
+            self.lead(root, key)
+            await self.earlier_arrived(key)
+            if self.leaders[root] == key:
+                return await self.run(key, extract)
+        else:
+            await self.earlier_arrived(key)
+        # every earlier CV has arrived, so the leader is final
+        leader = self.leaders[root]
+        if leader in self.refs:
+            cv = await asyncio.to_thread(self.load, self.refs[leader])
+        else:
+            cv = copy.deepcopy(await asyncio.shield(self.results[leader]))
+        # the representative's name would rank every member as the same person
+        cv["name"] = cv_name(text, filename)
+        DUPLICATE_CVS.inc()
+        return cv
+
+    def lead(self, root, key):
+        """Make `key` the cluster's representative; members await its result from here on."""
+        self.leaders[root] = key
+        self.results[key] = asyncio.get_running_loop().create_future()
+
+    async def run(self, key, extract):
+        result = self.results[key]
+        try:
+            cv = await extract()
+        except Exception as e:
+            result.set_exception(e)
+            result.exception()   # members re-raise it; nothing to log if there are none
+            raise
+        result.set_result(cv)
+        return cv
+
+    def saved(self, key, ref):
+        """The result of `key` was stored at `ref`; forget it unless there is no `load` to get it back."""
+        result = self.results.get(key)
+        if self.load is not None and result is not None and result.done():
+            self.refs[key] = ref
+            del self.results[key]
+
+    def representative(self, key):
+        """Filename of the CV whose extraction `key` shares (its own if it is unique); final once `extract` returns."""
+        return self.names[self.leaders[self.index.parent[key]]]
+
+    def clusters(self):
+        """[{"representative": filename, "members": [filenames]}] for clusters of two or more, in `keys` order."""
+        clusters = sorted((sorted(members, key=self.position.get) for members in self.index.clusters().values()),
+                          key=lambda members: self.position[members[0]])
+        return [{"representative": self.names[members[0]], "members": [self.names[k] for k in members]}
+                for members in clusters]
@@ -0,0 +1,140 @@
+import asyncio, hashlib, json, os, threading
+from collections import OrderedDict
+import app.llm as llm
+from app.scoring import score_breakdown, compile_config, describe, COMPONENT_LABELS
+from app.llm_client import LLMError
+from app.logs import get_logger
+
+log = get_logger(__name__)
+
+# Pairwise explanations kept in memory (override in .env)
+EXPLAIN_CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", 2048))
+
+
+def fingerprint(*values):
+    """Stable hash of JSON-like values (key order does not matter)."""
+    data = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def feature_diff(wb, rb):
+    """
+    Deterministic comparison of two CVs from their `score_breakdown`s:
+    per-component points and the entries behind them, largest gaps first.
+    """
+    components = []
+    for name, w_pts in wb["components"].items():
+        r_pts = rb["components"][name]
+        delta = round(w_pts - r_pts, 2)
+        if not delta:
+            continue
+        components.append({
+            "component": name,
+            "winner_points": round(w_pts, 2),
+            "runner_points": round(r_pts, 2),
+            "delta": delta,
+            "winner": describe(name, wb["evidence"]),
+            "runner": describe(name, rb["evidence"]),
+        })
+    components.sort(key=lambda c: (-abs(c["delta"]), c["component"]))
+    reasons = [f"{COMPONENT_LABELS[c['component']]}: {c['delta']:+.2f} points "
+               f"({c['winner']} vs {c['runner']})" for c in components]
+    return {
+        "winner_score": round(wb["total"], 2),
+        "runner_score": round(rb["total"], 2),
+        "components": components,
+        "reasons": reasons or ["Both candidates score the same on every component"],
+    }
+
+
+class ExplanationCache:
+    """
+    LRU memo of pairwise explanations keyed by both CVs' content hashes and
+    a fingerprint of the config and mappings. The feature diff is computed
+    on the first request; the LLM narrative is generated in a background
+    task and filled into the same entry, so the client polls until
+    `narrative.status` is no longer "pending".
+    """
+
+    def __init__(self, max_items=EXPLAIN_CACHE_SIZE):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.tasks = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.items[key] = entry
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def explain(self, cv_a, cv_b, config, mappings, narrative=True):
+        """
+        Compare two CVs. Returns {"winner": "a" | "b", "diff": ..., "narrative":
+        {"status", "text"}}; the same pair in either order shares one entry.
+        """
+        ha, hb = fingerprint(cv_a), fingerprint(cv_b)
+        key = (*sorted((ha, hb)), fingerprint(config, mappings))
+        entry = self.get(key)
+        if entry is None:
+            cfg = compile_config(config, mappings)
+            ba, bb = score_breakdown(cv_a, cfg), score_breakdown(cv_b, cfg)
+            score_a, score_b = ba["total"], bb["total"]
+            # ties go to the lower content hash so both orders agree
+            a_wins = score_a > score_b or (score_a == score_b and ha <= hb)
+            entry = {
+                "winner_hash": ha if a_wins else hb,
+                "diff": feature_diff(ba, bb) if a_wins else feature_diff(bb, ba),
+                "narrative": {"status": "not_requested", "text": None},
+            }
+            self.put(key, entry)
+        if narrative and entry["narrative"]["status"] in ("not_requested", "failed"):
+            self.start_narrative(entry, *((cv_a, cv_b) if entry["winner_hash"] == ha else (cv_b, cv_a)))
+        return {
+            "winner": "a" if entry["winner_hash"] == ha else "b",
+            "diff": entry["diff"],
+            "narrative": dict(entry["narrative"]),
+        }
+
+    def start_narrative(self, entry, winner, runner):
+        if llm.client is None:
+            entry["narrative"] = {"status": "unavailable", "text": None}
+            return
+        entry["narrative"] = {"status": "pending", "text": None}
+        diff = entry["diff"]
+
+        async def run():
+            try:
+                text = await llm.generate_explanation(
+                    {"name": winner.get("name", "Unknown"), "sys_score": diff["winner_score"], "raw_data": winner},
+                    {"name": runner.get("name", "Unknown"), "sys_score": diff["runner_score"], "raw_data": runner})
+                entry["narrative"] = {"status": "ready", "text": text}
+            except LLMError as e:
+                log.warning("explanation_failed", error=str(e))
+                # not final: the next request for this pair tries again
+                entry["narrative"] = {"status": "failed", "text": None, "error": str(e)}
+
+        task = asyncio.get_running_loop().create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.items), "max_entries": self.max_items,
+                    "hits": self.hits, "misses": self.misses, "narratives_running": len(self.tasks)}
+
+
+explanations = ExplanationCache()
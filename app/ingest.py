@@ -0,0 +1,85 @@
+import os, zipfile
+
+# Upload / zip limits (override in .env)
+UPLOAD_CHUNK = 1 << 20
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", 4096))
+MAX_ZIP_MEMBERS = int(os.getenv("MAX_ZIP_MEMBERS", 10000))
+MAX_MEMBER_MB = float(os.getenv("MAX_MEMBER_MB", 50))
+MAX_TOTAL_UNCOMPRESSED_MB = float(os.getenv("MAX_TOTAL_UNCOMPRESSED_MB", 20480))
+MAX_COMPRESSION_RATIO = float(os.getenv("MAX_COMPRESSION_RATIO", 200))
+
+CV_EXTENSIONS = (".pdf", ".docx")
+
+
+class ZipLimitError(ValueError):
+    pass
+
+
+async def save_upload(upload, path, max_bytes=MAX_UPLOAD_MB * 1024 * 1024):
+    """Stream an UploadFile to `path` in chunks instead of reading it into memory."""
+    written = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise ZipLimitError(f"Upload exceeds {max_bytes / 1024 / 1024:.0f} MB")
+            f.write(chunk)
+    return written
+
+
+class ZipMember:
+    """A CV inside an open zip, read lazily (and with a hard size cap) when needed."""
+
+    def __init__(self, zf, info):
+        self.zf = zf
+        self.info = info
+        self.name = info.filename
+        self.filename = os.path.basename(info.filename)
+
+    def read(self, max_bytes=MAX_MEMBER_MB * 1024 * 1024):
+        info = self.info
+        if info.file_size > max_bytes:
+            raise ZipLimitError(f"{self.name} is larger than {max_bytes / 1024 / 1024:.0f} MB")
+        if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+            raise ZipLimitError(f"{self.name} has a suspicious compression ratio")
+        # Header sizes can lie, so the decompressed stream is capped as well
+        chunks, total = [], 0
+        with self.zf.open(info) as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise ZipLimitError(f"{self.name} is larger than {max_bytes / 1024 / 1024:.0f} MB")
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def open_cv_zip(zip_path):
+    """
+    Open a zip and list its PDF/DOCX members without extracting anything.
+    Raises ZipLimitError when the archive has too many members or declares
+    more uncompressed data than allowed.
+    """
+    zf = zipfile.ZipFile(zip_path)
+    try:
+        infos = zf.infolist()
+        if len(infos) > MAX_ZIP_MEMBERS:
+            raise ZipLimitError(f"Zip has {len(infos)} entries (limit {MAX_ZIP_MEMBERS})")
+        total = sum(i.file_size for i in infos)
+        if total > MAX_TOTAL_UNCOMPRESSED_MB * 1024 * 1024:
+            raise ZipLimitError(f"Zip expands to more than {MAX_TOTAL_UNCOMPRESSED_MB:.0f} MB")
+        members = [
+            ZipMember(zf, i) for i in infos
+            if not i.is_dir()
+            and i.filename.lower().endswith(CV_EXTENSIONS)
+            and not os.path.basename(i.filename).startswith(".")
+        ]
+    except Exception:
+        zf.close()
+        raise
+    return zf, members
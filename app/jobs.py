@@ -0,0 +1,202 @@
+import asyncio, json, os, shutil, sqlite3, threading, time, uuid
+from app.pipeline import iter_cvs
+from app.ranking import rank_candidates
+from app.batches import batches
+from app.ingest import open_cv_zip
+from app.logs import get_logger
+
+log = get_logger(__name__)
+
+# Background job settings (override in .env)
+JOBS_DIR = os.getenv("JOBS_DIR", "cvs_data/jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 1))
+# Finished CVs are committed in groups of this many (or at least every JOB_COMMIT_SECONDS)
+JOB_COMMIT_ITEMS = int(os.getenv("JOB_COMMIT_ITEMS", 20))
+JOB_COMMIT_SECONDS = float(os.getenv("JOB_COMMIT_SECONDS", 2))
+
+
+class JobStore:
+    """
+    Durable job state in SQLite. Finished CVs are recorded in `job_items`
+    so an interrupted job resumes after a restart without redoing them, and
+    a completed job's batch can be rebuilt from them (`batch`).
+    """
+
+    def __init__(self, root=JOBS_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "jobs.sqlite"), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT, filename TEXT,
+                config TEXT, mappings TEXT,
+                total INTEGER DEFAULT 0, done INTEGER DEFAULT 0, failed INTEGER DEFAULT 0,
+                error TEXT, result TEXT, created REAL, updated REAL);
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT, idx INTEGER, member TEXT, cv_json TEXT, error TEXT,
+                PRIMARY KEY (job_id, idx));
+        """)
+        self.db.commit()
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def create(self, filename, config, mappings):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO jobs (id, status, filename, config, mappings, created, updated) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, json.dumps(config), json.dumps(mappings), now, now))
+            self.db.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self.lock:
+            self.db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            self.db.commit()
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created").fetchall()
+        return [r["id"] for r in rows]
+
+    def record_items(self, job_id, items):
+        """Record finished CVs, as (idx, member, cv or None, error or None), in one commit."""
+        rows = [(job_id, idx, member, json.dumps(cv) if cv is not None else None, error)
+                for idx, member, cv, error in items]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO job_items VALUES (?, ?, ?, ?, ?)", rows)
+            self.db.execute(
+                "UPDATE jobs SET done = (SELECT COUNT(*) FROM job_items WHERE job_id = ?), "
+                "failed = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND error IS NOT NULL), "
+                "updated = ? WHERE id = ?",
+                (job_id, job_id, time.time(), job_id))
+            self.db.commit()
+
+    def items(self, job_id):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT idx, cv_json FROM job_items WHERE job_id = ? ORDER BY idx", (job_id,)).fetchall()
+        return {r["idx"]: (json.loads(r["cv_json"]) if r["cv_json"] else None) for r in rows}
+
+    def batch(self, job_id):
+        """
+        (cvs, (config, mappings)) of a completed job, in the order its batch
+        was created with, or None. Lets /batches/{job_id}/rescore and
+        /explain reload the batch once the in-memory BatchStore has lost it.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != "completed":
+            return None
+        items = self.items(job_id)
+        cvs = [items[i] for i in sorted(items) if items[i] is not None]
+        return cvs, (json.loads(job["config"]), json.loads(job["mappings"]))
+
+
+class JobQueue:
+    """Local worker pool that runs queued jobs on the server's event loop."""
+
+    def __init__(self, store, workers=JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.queue = None
+        self.tasks = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        for job_id in self.store.unfinished():
+            log.info("job_resumed", job=job_id)
+            self.queue.put_nowait(job_id)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, job_id):
+        self.queue.put_nowait(job_id)
+
+    async def worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self.run(job_id)
+            except Exception as e:
+                log.exception("job_failed", job=job_id)
+                self.store.update(job_id, status="failed", error=str(e))
+            finally:
+                self.queue.task_done()
+
+    async def run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+        self.store.update(job_id, status="running")
+
+        job_dir = self.store.job_dir(job_id)
+        # Members are read lazily from the stored zip; zip order keeps
+        # indexes stable across restarts
+        zf, members = await asyncio.to_thread(open_cv_zip, os.path.join(job_dir, "upload.zip"))
+        with zf:
+            self.store.update(job_id, total=len(members))
+            done = self.store.items(job_id)
+            todo = [i for i in range(len(members)) if i not in done]
+            duplicates = []   # near-duplicate clusters among the files processed in this run
+            if todo:
+                log.info("job_progress", job=job_id, done=len(done), total=len(members), todo=len(todo))
+            # finished CVs are committed in groups off the event loop; a crash redoes at most one group
+            pending, flushed = [], time.monotonic()
+            try:
+                async for pos, filename, cv in iter_cvs([members[i] for i in todo], clusters=duplicates):
+                    member = members[todo[pos]].name
+                    if isinstance(cv, Exception):
+                        pending.append((todo[pos], member, None, str(cv)))
+                    else:
+                        pending.append((todo[pos], member, cv, None))
+                    if len(pending) >= JOB_COMMIT_ITEMS or time.monotonic() - flushed >= JOB_COMMIT_SECONDS:
+                        items, pending, flushed = pending, [], time.monotonic()
+                        await asyncio.to_thread(self.store.record_items, job_id, items)
+                if pending:
+                    items, pending = pending, []
+                    await asyncio.to_thread(self.store.record_items, job_id, items)
+            finally:
+                if pending:
+                    # failed or cancelled: keep what finished so a resume does not redo it
+                    self.store.record_items(job_id, pending)
+
+        items = self.store.items(job_id)
+        cvs = [items[i] for i in sorted(items) if items[i] is not None]
+        if not cvs:
+            self.store.update(job_id, status="failed", error="At least 1 CV required for processing")
+            return
+        config, mappings = json.loads(job["config"]), json.loads(job["mappings"])
+        ranked = await asyncio.to_thread(rank_candidates, cvs, config, mappings)
+        # the job's ID names its batch, so JobStore.batch can reload it after a restart
+        result = {"batch_id": batches.create(cvs, (config, mappings), batch_id=job_id),
+                  "ranked_candidates": ranked, "duplicates": duplicates}
+        self.store.update(job_id, status="completed", result=json.dumps(result))
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+_queue = None
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(JobStore())
+    return _queue
@@ -1,153 +1,85 @@
-import os, json
-from dotenv import load_dotenv
+import json
+from app.cache import get_cache
+from app.llm_client import get_llm_client, llm_init_error, LLMError
+from app.logs import get_logger
+from app.local_extract import extract_local
 
-load_dotenv()
+log = get_logger(__name__)
 
-# Initialize Gemini client only if API key is available
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-client = None
+# Shared async client (rate limits, retries, fallback models, circuit breaker)
+client = get_llm_client()
 
-if GOOGLE_API_KEY and GOOGLE_API_KEY != "your_api_key_here":
-    try:
-        from google import genai
-        from google.genai import types
-        client = genai.Client(api_key=GOOGLE_API_KEY)
-        print("✓ Gemini API client initialized successfully")
-    except Exception as e:
-        print(f"⚠ Warning: Could not initialize Gemini API: {e}")
-        print("  The system will use mock data for CV extraction")
+if client is not None:
+    log.info("gemini_client_ready")
 else:
-    print("⚠ Warning: GOOGLE_API_KEY not set in .env file")
-    print("  The system will use mock data for CV extraction")
+    log.warning("gemini_client_unavailable", reason=llm_init_error(), fallback="local rule-based extraction")
 
-def extract_structured_cv(text, filename):
-    """
-    Use Gemini to extract structured CV data according to target JSON schema.
-    """
-    
-    # If no API client, return mock data
-    if client is None:
-        print(f"  → Using mock data for {filename}")
-        return {
-            "name": filename.replace('.pdf', '').replace('.docx', ''),
-            "education": [
-                {
-                    "degree": "Master",
-                    "field": "Computer Science",
-                    "university": "MIT",
-                    "country": "USA",
-                    "start": "2020-09",
-                    "end": "2022-06",
-                    "gpa": 3.8,
-                    "scale": 4.0
-                }
-            ],
-            "experience": [
-                {
-                    "title": "Software Engineer",
-                    "org": "Tech Company",
-                    "start": "2022-07",
-                    "end": "2024-12",
-                    "duration_months": 29,
-                    "domain": "NLP"
-                }
-            ],
-            "publications": [
-                {
-                    "title": "Sample Publication",
-                    "venue": "IEEE",
-                    "year": 2023,
-                    "type": "conference",
-                    "authors": ["Author 1", filename.replace('.pdf', '').replace('.docx', '')],
-                    "author_position": 2,
-                    "journal_if": 0.7,
-                    "domain": "NLP"
-                }
-            ],
-            "awards": [
-                {
-                    "title": "Best Paper Award",
-                    "issuer": "Conference",
-                    "year": 2023,
-                    "type": "academic"
-                }
-            ]
-        }
-    
-    prompt = f"""
+# Bump PROMPT_VERSION whenever the extraction prompt changes so cached
+# structured CVs from the old prompt are not reused.
+EXTRACTION_MODEL = "gemini-2.0-flash-exp"
+PROMPT_VERSION = "1"
+
+CV_SCHEMA = """{"name": "...", "education":[{"degree":"", "field":"", "university":"", "country":"", "start":"", "end":"", "gpa":null, "scale":null}],
+"experience":[{"title":"", "org":"", "start":"", "end":"", "duration_months":null, "domain":""}],
+"publications":[{"title":"", "venue":"", "year":null, "type":"", "authors":[], "author_position":null, "journal_if":null, "domain":""}],
+"awards":[{"title":"", "issuer":"", "year":null, "type":""}]
+}"""
+
+def build_extraction_prompt(text, filename):
+    return f"""
 Extract structured CV metadata from the following text.
 Output JSON in the format:
-{{"name": "...", "education":[{{"degree":"", "field":"", "university":"", "country":"", "start":"", "end":"", "gpa":null, "scale":null}}],
-"experience":[{{"title":"", "org":"", "start":"", "end":"", "duration_months":null, "domain":""}}],
-"publications":[{{"title":"", "venue":"", "year":null, "type":"", "authors":[], "author_position":null, "journal_if":null, "domain":""}}],
-"awards":[{{"title":"", "issuer":"", "year":null, "type":""}}]
-}}
+{CV_SCHEMA}
 
 CV Filename: {filename}
 
 Text:
 {text}
 """
+
+async def generate_text(prompt, model=EXTRACTION_MODEL):
+    """Gemini call through the shared client; raises LLMError on failure."""
+    if client is None:
+        raise LLMError("Gemini client is not configured")
+    return await client.generate(prompt, model)
+
+def llm_cache_key(content_hash, prompt_version=PROMPT_VERSION):
+    return f"{content_hash}:{EXTRACTION_MODEL}:{prompt_version}"
+
+def cached_structured_cv(content_hash, prompt_version=PROMPT_VERSION):
+    """Structured CV previously extracted from a file with this content hash, or None."""
+    cache = get_cache()
+    return cache.get_json("cv", llm_cache_key(content_hash, prompt_version)) if cache is not None else None
+
+def store_structured_cv(content_hash, cv, prompt_version=PROMPT_VERSION):
+    cache = get_cache()
+    if cache is not None:
+        cache.put_json("cv", llm_cache_key(content_hash, prompt_version), cv)
+
+async def extract_structured_cv(text, filename, content_hash=None):
+    """
+    Use Gemini to extract structured CV data according to target JSON schema.
+    When `content_hash` is given, successful extractions are cached per file
+    content, model and prompt version (see cached_structured_cv).
+    Without an API client the rule-based extractor's result is returned.
+    Raises LLMError when the call or the JSON parsing fails.
+    """
+    # Without an API client (air-gapped deployments) use the rule-based extractor
+    if client is None:
+        log.debug("local_extraction", file=filename)
+        return extract_local(text, filename)[0]
+
+    prompt = build_extraction_prompt(text, filename)
+    raw = await generate_text(prompt)
     try:
-        resp = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0)
-        )
-        parsed = json.loads(resp.text)
-        return parsed
-    except Exception as e:
-        print(f"Error extracting CV {filename}: {e}")
-        print("  → Falling back to mock data")
-        # Return mock data with reasonable values
-        import random
-        return {
-            "name": filename.replace('.pdf', '').replace('.docx', ''),
-            "education": [
-                {
-                    "degree": random.choice(["PhD", "Master", "Bachelor"]),
-                    "field": "Computer Science",
-                    "university": random.choice(["MIT", "Stanford", "Top Tier"]),
-                    "country": "USA",
-                    "start": "2018-09",
-                    "end": "2022-06",
-                    "gpa": round(random.uniform(3.5, 4.0), 2),
-                    "scale": 4.0
-                }
-            ],
-            "experience": [
-                {
-                    "title": "Software Engineer",
-                    "org": "Tech Company",
-                    "start": "2022-07",
-                    "end": "2024-12",
-                    "duration_months": random.randint(24, 36),
-                    "domain": "NLP"
-                }
-            ],
-            "publications": [
-                {
-                    "title": "Research Paper",
-                    "venue": random.choice(["IEEE", "ACM", "Nature"]),
-                    "year": 2023,
-                    "type": "conference",
-                    "authors": ["Co-Author", filename.replace('.pdf', '').replace('.docx', '')],
-                    "author_position": random.randint(1, 3),
-                    "journal_if": round(random.uniform(0.6, 1.0), 2),
-                    "domain": "NLP"
-                }
-            ],
-            "awards": [
-                {
-                    "title": "Academic Excellence",
-                    "issuer": "University",
-                    "year": 2023,
-                    "type": "academic"
-                }
-            ]
-        }
-
-def generate_explanation(winner, runner):
+        parsed = json.loads(raw)
+    except ValueError as e:
+        raise LLMError(f"Invalid JSON from Gemini for {filename}: {e}") from e
+    if content_hash:
+        store_structured_cv(content_hash, parsed)
+    return parsed
+
+async def generate_explanation(winner, runner):
     def ev(cv):
         edu = ", ".join(f"{e.get('degree')} from {e.get('university')}" for e in cv.get("education", []))
         exp = ", ".join(f"{x.get('title')} at {x.get('org')}" for x in cv.get("experience", [])[:3])
@@ -164,12 +96,4 @@ Provide 3 bullet points explaining why the winner ranks higher.
 Each bullet should cite specific text from the CVs.
 Output as plain text.
 """
-    try:
-        resp = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0)
-        )
-        return resp.text.strip()
-    except Exception as e:
-        return str(e)
+    return (await generate_text(prompt, model="gemini-2.0-flash-lite")).strip()
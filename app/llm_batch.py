@@ -0,0 +1,176 @@
+import asyncio, json, re, time
+from app.llm import CV_SCHEMA, build_extraction_prompt
+from app.logs import get_logger
+
+log = get_logger(__name__)
+
+BATCH_PROMPT_VERSION = "batch-1"
+
+BATCH_INSTRUCTIONS = f"""
+Extract structured CV metadata from each of the CVs below.
+For every CV, output one JSON object in the format:
+{CV_SCHEMA}
+
+Wrap each object in the delimiters shown, using the CV's id, and output
+nothing else:
+<<<RESULT id>>>
+{{...}}
+<<<END id>>>
+"""
+
+RESULT_RE = re.compile(r"<<<RESULT (\d+)>>>\s*(.*?)\s*<<<END \1>>>", re.S)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) used for batch sizing."""
+    return len(text) // 4 + 1
+
+def build_batch_prompt(items):
+    """`items` is a list of (id, text, filename)."""
+    parts = [BATCH_INSTRUCTIONS]
+    for item_id, text, filename in items:
+        parts.append(f"\n<<<CV {item_id}>>>\nCV Filename: {filename}\n\nText:\n{text}\n<<<END CV {item_id}>>>\n")
+    return "".join(parts)
+
+def parse_json(raw):
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`").removeprefix("json").strip()
+    return json.loads(raw)
+
+def valid_cv(cv):
+    return isinstance(cv, dict) and all(
+        isinstance(cv.get(k, []), list) for k in ("education", "experience", "publications", "awards"))
+
+def split_batch_response(raw):
+    """Map of id -> parsed CV for every well-formed, valid result block."""
+    results = {}
+    for item_id, body in RESULT_RE.findall(raw or ""):
+        try:
+            cv = parse_json(body)
+        except ValueError:
+            continue
+        if valid_cv(cv):
+            results[int(item_id)] = cv
+    return results
+
+
+class BatchStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.batched_requests = 0
+        self.cvs = 0
+        self.retried = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.tokens_saved = 0
+
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "cvs": self.cvs,
+            "requests": self.requests,
+            "batched_requests": self.batched_requests,
+            "retried": self.retried,
+            "failed": self.failed,
+            "prompt_tokens": self.prompt_tokens,
+            "tokens_saved": self.tokens_saved,
+            "cvs_per_request": round(self.cvs / self.requests, 2) if self.requests else 0,
+            "cvs_per_second": round(self.cvs / elapsed, 2) if elapsed else 0,
+        }
+
+
+class LLMBatcher:
+    """
+    Packs several CVs into one extraction request, sized by an estimated
+    token budget. `generate` is an async callable prompt -> response text,
+    so a local stub can stand in for Gemini. Results are validated and
+    split per CV; only the CVs missing from a batch response are retried,
+    one request each, with the regular single-CV prompt.
+    """
+
+    def __init__(self, generate, max_tokens=8000, max_items=8, max_wait=0.2):
+        self.generate = generate
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self.stats = BatchStats()
+        self.pending = []   # (id, text, filename, future)
+        self.pending_tokens = 0
+        self.next_id = 0
+        self.timer = None
+        self.running = set()
+        self.instruction_tokens = estimate_tokens(BATCH_INSTRUCTIONS)
+
+    async def submit(self, text, filename):
+        """Queue one CV and wait for its structured JSON (raises if it fails)."""
+        tokens = estimate_tokens(text) + 20
+        if self.pending and (self.pending_tokens + tokens > self.max_tokens
+                             or len(self.pending) >= self.max_items):
+            self.flush()
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append((self.next_id, text, filename, fut))
+        self.next_id += 1
+        self.pending_tokens += tokens
+        if self.pending_tokens >= self.max_tokens or len(self.pending) >= self.max_items:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self.flush)
+        return await fut
+
+    async def extract_many(self, items):
+        """Extract a list of (text, filename); returns results or exceptions in order."""
+        tasks = [asyncio.ensure_future(self.submit(t, f)) for t, f in items]
+        await asyncio.sleep(0)
+        self.flush()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending, self.pending_tokens = self.pending, [], 0
+        task = asyncio.ensure_future(self.run_batch(batch))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def run_batch(self, batch):
+        self.stats.cvs += len(batch)
+        results = {}
+        if len(batch) > 1:
+            prompt = build_batch_prompt([(i, t, f) for i, t, f, _ in batch])
+            self.stats.requests += 1
+            self.stats.batched_requests += 1
+            self.stats.prompt_tokens += estimate_tokens(prompt)
+            try:
+                results = split_batch_response(await self.generate(prompt))
+                # every CV after the first reuses the shared schema instructions
+                self.stats.tokens_saved += self.instruction_tokens * (len(batch) - 1)
+            except Exception as e:
+                log.warning("llm_batch_failed", cvs=len(batch), error=str(e))
+
+        retries = [entry for entry in batch if entry[0] not in results]
+        if len(batch) > 1:
+            self.stats.retried += len(retries)
+        for i, text, filename, fut in batch:
+            if i in results and not fut.done():
+                fut.set_result(results[i])
+        await asyncio.gather(*(self.run_single(text, filename, fut) for _, text, filename, fut in retries))
+
+    async def run_single(self, text, filename, fut):
+        prompt = build_extraction_prompt(text, filename)
+        self.stats.requests += 1
+        self.stats.prompt_tokens += estimate_tokens(prompt)
+        try:
+            cv = parse_json(await self.generate(prompt))
+            if not valid_cv(cv):
+                raise ValueError("response does not match the CV schema")
+            if not fut.done():
+                fut.set_result(cv)
+        except Exception as e:
+            self.stats.failed += 1
+            if not fut.done():
+                fut.set_exception(e)
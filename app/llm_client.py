@@ -0,0 +1,296 @@
+import asyncio, os, random, time
+from dotenv import load_dotenv
+from app.metrics import REGISTRY, span
+
+load_dotenv()
+
+# Shared LLM client settings (override in .env)
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # e.g. a local fake server
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "gemini-1.5-flash").split(",") if m.strip()]
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+LLM_RPM = float(os.getenv("LLM_RPM", 60))
+LLM_TPM = float(os.getenv("LLM_TPM", 1_000_000))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 60.0))
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ("429", "503", "overloaded", "RESOURCE_EXHAUSTED", "UNAVAILABLE")
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+class LLMError(Exception):
+    pass
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def is_retryable(exc):
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code in RETRYABLE_CODES:
+        return True
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__module__.startswith(("httpx", "aiohttp")):
+        return True  # transport errors
+    return any(m in str(exc) for m in RETRYABLE_MARKERS)
+
+
+class TokenBucket:
+    """Async token bucket: `rate_per_minute` tokens refill continuously up to `capacity`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(rate_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, n=1):
+        n = min(n, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for
+    `cooldown` seconds; then lets one trial call through (half-open).
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError if the call must be rejected. Returns True
+        when the call is the half-open trial; only that call may end the
+        trial (`end_trial`), so calls started earlier cannot let a second
+        trial through.
+        """
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial_running):
+            raise CircuitOpenError("LLM circuit breaker is open")
+        if state == "half-open":
+            self.trial_running = True
+            return True
+        return False
+
+    def end_trial(self):
+        self.trial_running = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+class LLMMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.rejected = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe_latency(self, seconds):
+        self.latency_count += 1
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+                break
+        else:
+            self.latency_buckets[-1] += 1
+
+    def as_dict(self):
+        buckets = {f"le_{b}": n for b, n in zip(LATENCY_BUCKETS, self.latency_buckets)}
+        buckets["le_inf"] = self.latency_buckets[-1]
+        return {
+            "requests": self.requests, "successes": self.successes, "failures": self.failures,
+            "retries": self.retries, "fallbacks": self.fallbacks, "rejected": self.rejected,
+            "queue_depth": self.queue_depth, "max_queue_depth": self.max_queue_depth,
+            "latency_avg": round(self.latency_sum / self.latency_count, 3) if self.latency_count else None,
+            "latency_buckets": buckets,
+        }
+
+
+class AsyncLLMClient:
+    """
+    Shared async Gemini client: one pooled connection, a concurrency cap,
+    token buckets for requests/minute and tokens/minute, jittered
+    exponential backoff on 429/5xx, fallback models and a circuit breaker.
+    """
+
+    def __init__(self, genai_client, model_fallbacks=LLM_FALLBACK_MODELS, concurrency=LLM_CONCURRENCY,
+                 rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX,
+                 breaker_failures=LLM_BREAKER_FAILURES, breaker_cooldown=LLM_BREAKER_COOLDOWN):
+        self.genai = genai_client
+        self.model_fallbacks = list(model_fallbacks)
+        self.concurrency = concurrency
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self.metrics = LLMMetrics()
+        self._slots = None
+
+    @property
+    def slots(self):
+        # created lazily so the semaphore belongs to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, delay)  # full jitter
+
+    async def _call(self, model, prompt, temperature):
+        from google.genai import types
+        resp = await self.genai.aio.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=types.GenerateContentConfig(temperature=temperature),
+        )
+        return resp.text
+
+    async def generate(self, prompt, model, temperature=0):
+        """
+        Generate text for `prompt` with `model`, falling back to the
+        configured fallback models when retries are exhausted. Raises
+        LLMError (or CircuitOpenError) instead of returning placeholder data.
+        """
+        m = self.metrics
+        try:
+            is_trial = self.breaker.before_call()
+        except CircuitOpenError:
+            m.rejected += 1
+            raise
+
+        try:
+            return await self._generate(prompt, model, temperature)
+        finally:
+            if is_trial:
+                # also ends a trial that was cancelled
+                self.breaker.end_trial()
+
+    async def _generate(self, prompt, model, temperature):
+        m = self.metrics
+        tokens = estimate_tokens(prompt)
+        last_error = None
+        models = [model] + [f for f in self.model_fallbacks if f != model]
+        for i, current in enumerate(models):
+            if i:
+                m.fallbacks += 1
+            for attempt in range(self.max_retries + 1):
+                m.queue_depth += 1
+                m.max_queue_depth = max(m.max_queue_depth, m.queue_depth)
+                try:
+                    await self.requests_bucket.acquire(1)
+                    await self.tokens_bucket.acquire(tokens)
+                    await self.slots.acquire()
+                finally:
+                    m.queue_depth -= 1
+                m.requests += 1
+                started = time.monotonic()
+                try:
+                    with span("llm_call"):
+                        text = await self._call(current, prompt, temperature)
+                except Exception as e:
+                    last_error = e
+                    if not is_retryable(e):
+                        m.failures += 1
+                        self.breaker.failure()
+                        raise LLMError(f"{current}: {e}") from e
+                else:
+                    m.observe_latency(time.monotonic() - started)
+                    m.successes += 1
+                    self.breaker.success()
+                    return text
+                finally:
+                    self.slots.release()
+                if attempt < self.max_retries:
+                    m.retries += 1
+                    await asyncio.sleep(self.backoff(attempt))
+
+        m.failures += 1
+        self.breaker.failure()
+        raise LLMError(f"All models failed: {last_error}") from last_error
+
+
+_client = None
+_init_error = None
+
+def get_llm_client():
+    """Shared client, or None when no API key is configured."""
+    global _client, _init_error
+    if _client is None and _init_error is None:
+        if not GOOGLE_API_KEY or GOOGLE_API_KEY == "your_api_key_here":
+            _init_error = "GOOGLE_API_KEY not set"
+            return None
+        try:
+            from google import genai
+            from google.genai import types
+            http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+            _client = AsyncLLMClient(genai.Client(api_key=GOOGLE_API_KEY, http_options=http_options))
+        except Exception as e:
+            _init_error = str(e)
+    return _client
+
+def llm_init_error():
+    return _init_error
+
+@REGISTRY.collector
+def collect_llm_metrics():
+    if _client is None:
+        return []
+    m = _client.metrics
+    return [
+        ("hr_llm_requests_total", "counter", "LLM HTTP attempts", m.requests),
+        ("hr_llm_failures_total", "counter", "LLM calls failed after retries/fallbacks", m.failures),
+        ("hr_llm_retries_total", "counter", "LLM retries after 429/5xx", m.retries),
+        ("hr_llm_fallbacks_total", "counter", "Switches to a fallback model", m.fallbacks),
+        ("hr_llm_rejected_total", "counter", "Calls rejected by the open circuit breaker", m.rejected),
+        ("hr_llm_queue_depth", "gauge", "Calls waiting for rate limit or concurrency slots", m.queue_depth),
+        ("hr_llm_circuit_open", "gauge", "1 while the circuit breaker is open", int(_client.breaker.state == "open")),
+    ]
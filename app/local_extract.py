@@ -0,0 +1,277 @@
+"""
+Rule-based structured extraction. CV text is split into sections
+(app/sections.py) and each line is parsed with small regex grammars for
+dates, degrees, GPAs and years, using the mappings.json vocabularies to
+recognise universities and venues. The result has the LLM's schema plus
+a confidence in [0, 1]; callers go to the LLM only when it is low.
+"""
+import json, os, re
+from functools import lru_cache
+from app.matcher import get_matcher
+from app.scoring import calculate_months
+from app.sections import segment, ENTRY_LINE_CHARS
+
+# Local extraction settings (override in .env)
+LOCAL_EXTRACT = os.getenv("LOCAL_EXTRACT", "1") != "0"
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_MIN_CONFIDENCE", 0.8))
+MAPPINGS_PATH = os.getenv("MAPPINGS_PATH", "mappings.json")
+
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+DATE = (r"(?:(?:19|20)\d\d[-/.](?:0?[1-9]|1[0-2])(?!\d)|(?:0?[1-9]|1[0-2])[-/.](?:19|20)\d\d"
+        r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.? (?:19|20)\d\d|(?:19|20)\d\d)")
+ONGOING = r"(?:present|current(?:ly working)?|now|today|ongoing|to date)"
+RANGE_RE = re.compile(rf"\b(?P<start>{DATE})\s*(?:-|–|—|to|until)\s*(?P<end>{DATE}|{ONGOING})\b", re.IGNORECASE)
+DATE_RE = re.compile(rf"\b{DATE}\b", re.IGNORECASE)
+YEAR_RE = re.compile(r"\b(?:19|20)\d\d\b")
+GPA_RE = re.compile(r"\b(?:c?gpa|grade)\s*:?\s*(?P<gpa>\d(?:\.\d+)?)(?:\s*(?:/|out of)\s*(?P<scale>\d+(?:\.\d+)?))?",
+                    re.IGNORECASE)
+DEGREE_RE = re.compile(
+    r"\b(?:ph\.?\s?d|doctor(?:ate)?|d\.?phil|master'?s?|m\.?sc|m\.?eng|m\.?phil|mba|m\.?s\.|m\.?a\.|"
+    r"bachelor'?s?|b\.?sc|b\.?eng|b\.?tech|b\.?s\.|b\.?a\.|diploma|associate degree|licen[cs]iate)(?!\w)",
+    re.IGNORECASE)
+INSTITUTION_RE = re.compile(
+    r"\b(?:universit(?:y|ä|é|à|e|at|ad|à)|college|institut[eo]?|school|polytechnic|academy|ecole|école|hochschule)\b",
+    re.IGNORECASE)
+PART_SPLIT_RE = re.compile(r"\s*[,|;•]\s*|\s+[-–—]\s+|\s+at\s+|\s*[()]\s*")
+NAME_RE = re.compile(r"[A-Z][\w'.-]*(?: [A-Z][\w'.-]*){1,3}")
+JOURNAL_RE = re.compile(r"\b(?:journal|transactions|letters|review|nature|science|magazine)\b", re.IGNORECASE)
+CONFERENCE_RE = re.compile(r"\b(?:conference|proceedings|proc\.|workshop|symposium|congress|meeting)\b|"
+                           r"\b(?:sigir|neurips|nips|icml|iclr|acl|emnlp|cvpr|iccv|eccv|kdd|aaai|ijcai)\b",
+                           re.IGNORECASE)
+DOMAIN_LABEL_RE = re.compile(r"^(?:domain|area|field|focus|sector|industry)\s*:\s*", re.IGNORECASE)
+DOMAIN_RE = re.compile(r"[A-Za-z][\w&/+.' -]{0,39}")
+QUOTED_RE = re.compile(r"[\"“](.+?)[\"”]")
+SENTENCE_RE = re.compile(r"(?<=[a-z0-9)\]]{2}[.?!])\s+")   # not after initials such as "A."
+AUTHOR_SPLIT_RE = re.compile(r"\s*(?:,|;|&|\band\b)\s*")
+INITIALS_RE = re.compile(r"(?:[A-Z]\.?-?\s*){1,3}")
+BULLET_CHARS = "-*•· "
+ENTRY_KINDS = ("education", "experience", "publications", "awards")
+
+
+@lru_cache(maxsize=1)
+def default_mappings():
+    """mappings.json vocabularies (MAPPINGS_PATH), empty if the file is missing."""
+    try:
+        with open(MAPPINGS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"degree_levels": {}, "university_tiers": {}, "journal_impact": {}}
+
+
+def normalize_date(text):
+    """'2019-03', '03/2019', 'March 2019' or '2019' -> '2019-03' ('2019-01' for a bare year); None if ongoing."""
+    text = text.strip().lower()
+    if re.fullmatch(ONGOING, text):
+        return None
+    year = YEAR_RE.search(text).group()
+    month = 1
+    if text[:3] in MONTHS:
+        month = MONTHS[text[:3]]
+    else:
+        digits = [d for d in re.split(r"[-/.]", text) if d != year and d.isdigit()]
+        if digits:
+            month = int(digits[0])
+    return f"{year}-{month:02d}"
+
+
+def parts(text):
+    return [p.strip(" .:;-") for p in PART_SPLIT_RE.split(text) if p and p.strip(" .:;-")]
+
+
+def find_institution(candidates, matcher):
+    for part in candidates:
+        if matcher.university_match(part)[1] is not None or INSTITUTION_RE.search(part):
+            return part
+    return ""
+
+
+def completeness(*fields):
+    return sum(1 for f in fields if f) / len(fields)
+
+
+def parse_education(line, matcher):
+    """(entry, completeness) for a line naming a degree, else None."""
+    if not (DEGREE_RE.search(line) or matcher.degree_match(line.lower())[1] is not None):
+        return None
+    gpa = scale = None
+    g = GPA_RE.search(line)
+    if g:
+        gpa = float(g.group("gpa"))
+        scale = float(g.group("scale")) if g.group("scale") else (4.0 if gpa <= 4 else None)
+        line = line[:g.start()] + line[g.end():]
+    start = end = None
+    r = RANGE_RE.search(line)
+    if r:
+        start, end = normalize_date(r.group("start")), normalize_date(r.group("end"))
+        line = line[:r.start()] + line[r.end():]
+    else:
+        d = DATE_RE.search(line)
+        if d:
+            end = normalize_date(d.group())
+            line = line[:d.start()] + line[d.end():]
+    fields = parts(line)
+    degree_part = next((p for p in fields if DEGREE_RE.search(p) or matcher.degree_match(p.lower())[1]), "")
+    degree, _, field = degree_part.rpartition(" in ") if " in " in degree_part else (degree_part, "", "")
+    rest = [p for p in fields if p != degree_part]
+    university = find_institution(rest, matcher)
+    if not field:
+        field = next((p for p in rest if p != university and not YEAR_RE.search(p)), "")
+    entry = {"degree": degree, "field": field, "university": university, "country": "",
+             "start": start, "end": end}
+    if gpa is not None:
+        # left out when absent, so scoring applies missing_values_penalty
+        entry.update(gpa=gpa, scale=scale)
+    return entry, completeness(degree, university, start or end)
+
+
+def find_domain(candidates):
+    """
+    The first part that reads as a domain ("NLP", "Area: Computer Vision"):
+    a short phrase, not a date or a sentence. "" when there is none.
+    """
+    for part in candidates:
+        part = DOMAIN_LABEL_RE.sub("", part)
+        if DOMAIN_RE.fullmatch(part) and len(part.split()) <= 5 and not DATE_RE.search(part) \
+                and not re.fullmatch(ONGOING, part, re.IGNORECASE):
+            return part
+    return ""
+
+
+def parse_experience(line, previous):
+    """(entry, completeness) for a line with a date range; `previous` holds the title line if this one has none."""
+    r = RANGE_RE.search(line)
+    if r is None:
+        return None
+    start, end = normalize_date(r.group("start")), normalize_date(r.group("end"))
+    before, after = parts(line[:r.start()]), parts(line[r.end():])
+    if not before and previous:
+        before = parts(previous)
+    elif not before:
+        # "2019/03 to 2021/05  Acme — Engineer": what follows the dates is the job, not its domain
+        before, after = after, []
+    title = before[0] if before else ""
+    org = before[1] if len(before) > 1 else ""
+    domain = find_domain(after[:1])
+    entry = {"title": title, "org": org, "start": start, "end": end,
+             "duration_months": calculate_months(start, end) if start else None, "domain": domain}
+    return entry, completeness(title, org, start, domain)
+
+
+def split_authors(text):
+    """'Smith, J., Lee, K. and Ito, M.' or 'J. Smith, K. Lee' -> one string per author."""
+    authors = []
+    for piece in AUTHOR_SPLIT_RE.split(text):
+        if not piece:
+            continue
+        if authors and INITIALS_RE.fullmatch(piece):
+            authors[-1] += ", " + piece   # "Smith, J." is one author
+        else:
+            authors.append(piece)
+    return authors
+
+
+def parse_publication(line, matcher, surname):
+    """(entry, completeness) for a reference line with a year, else None."""
+    y = YEAR_RE.search(line)
+    if y is None:
+        return None
+    quoted = QUOTED_RE.search(line)
+    if quoted:
+        # Author, A. "Title." Venue, 2020.
+        lead, title, rest = line[:quoted.start()].strip(" .,"), quoted.group(1).strip(" .,"), line[quoted.end():]
+    else:
+        # Title. Venue, 2020.  /  A. Author, B. Author. Title. Venue, 2020.
+        chunks = [c.strip(" .,") for c in SENTENCE_RE.split(line) if c.strip(" .,")]
+        lead = chunks[0] if len(chunks) >= 3 and ("," in chunks[0] or " and " in chunks[0]) else ""
+        chunks = chunks[1:] if lead else chunks
+        title = chunks[0] if not YEAR_RE.fullmatch(chunks[0]) else ""
+        rest = " ".join(chunks[1:])
+    authors = split_authors(lead) if not YEAR_RE.search(lead) else []
+    venue_parts = parts(YEAR_RE.sub("", rest))
+    known = matcher.venue_match(rest)[1]
+    venue = next((p for p in venue_parts if known is None or known in p), "")
+    kind = ("preprint" if "arxiv" in line.lower() else "journal" if JOURNAL_RE.search(venue)
+            else "conference" if CONFERENCE_RE.search(venue) else "")
+    position = next((i for i, a in enumerate(authors, 1) if surname and surname in a), None)
+    entry = {"title": title, "venue": venue, "year": int(y.group()), "type": kind, "authors": authors,
+             "author_position": position, "journal_if": None, "domain": ""}
+    return entry, completeness(title, venue)
+
+
+def parse_award(line):
+    y = YEAR_RE.search(line)
+    fields = parts(YEAR_RE.sub("", line))
+    if not fields:
+        return None
+    entry = {"title": fields[0], "issuer": fields[1] if len(fields) > 1 else "",
+             "year": int(y.group()) if y else None, "type": ""}
+    return entry, completeness(fields[0], y)
+
+
+def find_name(header):
+    for line in header[:5]:
+        candidate = parts(line)[0] if parts(line) else ""
+        if NAME_RE.fullmatch(candidate) and not INSTITUTION_RE.search(candidate):
+            return candidate
+    return ""
+
+
+def cv_name(text, filename=""):
+    """The candidate's name from the top of `text`, else the file name without its extension."""
+    header = next(body for kind, _, body in segment(text) if kind == "header")
+    return find_name(header) or os.path.splitext(os.path.basename(filename))[0]
+
+
+def extract_local(text, filename="", mappings=None):
+    """
+    Structured CV in the extraction schema and a confidence in [0, 1]:
+    the mean completeness of every entry line found in the education,
+    experience, publications and awards sections (unparseable entry lines
+    count as 0), halved when no name was found and halved again when a job
+    has no domain. The LLM infers a domain from the job description, which
+    these rules cannot, and an empty one loses the domain match. Text
+    without any of those sections has confidence 0.
+    """
+    matcher = get_matcher(mappings or default_mappings())
+    sections = segment(text)
+    header = next(body for kind, _, body in sections if kind == "header")
+    name = find_name(header)
+    surname = name.split()[-1] if name else ""
+    cv = {"name": name or os.path.splitext(filename)[0], **{kind: [] for kind in ENTRY_KINDS}}
+    scores = []
+    for kind, _, body in sections:
+        if kind not in ENTRY_KINDS:
+            continue
+        previous = None
+        found = len(cv[kind])
+        for line in body:
+            line = line.lstrip(BULLET_CHARS)
+            entry_line = len(line) <= ENTRY_LINE_CHARS
+            if kind == "education":
+                parsed = parse_education(line, matcher)
+                # a university or date without a degree is an entry we could not read
+                if parsed is None and entry_line and (RANGE_RE.search(line) or find_institution([line], matcher)):
+                    scores.append(0)
+            elif kind == "experience":
+                parsed = parse_experience(line, previous)
+            elif kind == "publications":
+                parsed = parse_publication(line, matcher, surname)
+                if parsed is None and entry_line:
+                    scores.append(0)
+            else:
+                parsed = parse_award(line) if entry_line else None
+            if parsed is not None:
+                entry, score = parsed
+                cv[kind].append(entry)
+                scores.append(score)
+            previous = line if entry_line and parsed is None else None
+        if body and len(cv[kind]) == found:
+            scores.append(0)   # a section with text but no entry we could read
+
+    if not scores:
+        return cv, 0.0
+    confidence = sum(scores) / len(scores) * (1 if name else 0.5)
+    if any(not x["domain"] for x in cv["experience"]):
+        confidence *= 0.5
+    return cv, round(confidence, 3)
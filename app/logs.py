@@ -0,0 +1,79 @@
+import atexit, json, logging, os, queue, random, time
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging settings (override in .env)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")               # "text" or "json"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0))   # share of per-CV detail lines logged
+
+RESERVED = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+class StructuredFormatter(logging.Formatter):
+    """`event key=value ...` lines, or one JSON object per line with LOG_FORMAT=json."""
+
+    def __init__(self, fmt=LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        if self.json:
+            out = {"ts": round(record.created, 3), "level": record.levelname.lower(),
+                   "logger": record.name, "event": record.getMessage(), **fields}
+            if record.exc_info:
+                out["exc"] = self.formatException(record.exc_info)
+            return json.dumps(out, default=str)
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        line = f"{ts} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger taking structured fields as keyword arguments:
+    log.info("cv_extracted", file=name, pages=3). Never pass CV text or
+    other candidate content as a field.
+    """
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in RESERVED}
+        kwargs["extra"] = {"fields": fields}
+        return msg, kwargs
+
+    def sample(self, msg, **fields):
+        """Per-CV detail: logged at INFO for a LOG_SAMPLE_RATE share of calls, else DEBUG."""
+        if LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE:
+            self.info(msg, **fields)
+        else:
+            self.debug(msg, **fields)
+
+
+_listener = None
+
+def setup_logging():
+    """
+    Route the app's loggers through a queue so the request path only
+    enqueues records; a background thread does the (blocking) writes.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter())
+    q = queue.SimpleQueue()
+    _listener = QueueListener(q, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root = logging.getLogger("app")
+    root.addHandler(QueueHandler(q))
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+def get_logger(name):
+    setup_logging()
+    return StructuredLogger(logging.getLogger(name), {})
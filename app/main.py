@@ -1,9 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from app.api import router
-import os
+from app.pipeline import shutdown_pools
+from app.jobs import get_job_queue
+from app.metrics import HTTP_SECONDS
+import os, time
 
 app = FastAPI(title="HR Assistant", version="1.0")
 
@@ -16,6 +19,26 @@ app.add_middleware(
 
 app.include_router(router)
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # label by route template, not the raw path, to keep series bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                         route=route, status=response.status_code)
+    return response
+
+@app.on_event("startup")
+async def start_workers():
+    # Picks up queued/interrupted jobs from the job store
+    await get_job_queue().start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await get_job_queue().stop()
+    shutdown_pools()
+
 # Serve frontend
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
@@ -0,0 +1,192 @@
+import hashlib, json, re, threading, unicodedata
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+LOOKUP_CACHE_SIZE = 65536
+MAX_COMPILED = 8  # distinct mappings versions kept compiled
+
+STOP_WORDS = {"of", "the", "and", "for", "in", "at", "de"}
+GENERIC_WORDS = {"the", "university", "of", "at"}
+
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick automaton over a list of keys. `first_match(text)` returns
+    the index of the earliest key (in list order) that occurs anywhere in
+    `text`, i.e. the same answer as `next(i for i, k in enumerate(keys) if k in text)`,
+    in a single scan of `text`.
+    """
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # lowest key index ending at (or via fail links of) each node
+        for idx, key in enumerate(keys):
+            node = 0
+            for ch in key:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                node = nxt
+            if self.best[node] is None:
+                self.best[node] = idx
+
+        # Breadth-first fail links; fold each node's fail chain into `best`
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                if node:
+                    f = self.fail[node]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[child] = self.goto[f].get(ch, 0)
+                self.best[child] = _min_index(self.best[child], self.best[self.fail[child]])
+                queue.append(child)
+
+    def first_match(self, text):
+        best = self.best[0]  # an empty key matches everything
+        if best == 0:
+            return 0
+        node = 0
+        goto, fail, node_best = self.goto, self.fail, self.best
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            b = node_best[node]
+            if b is not None and (best is None or b < best):
+                best = b
+                if best == 0:
+                    break
+        return best
+
+
+def _min_index(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def normalize_name(name):
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower()
+    name = name.replace("&", " and ")
+    name = re.sub(r"[^\w\s]", " ", name)
+    return " ".join(name.split())
+
+def core_name(normalized):
+    """'university of oxford' / 'oxford university' -> 'oxford'"""
+    return " ".join(w for w in normalized.split() if w not in GENERIC_WORDS)
+
+def acronym_token(name):
+    """'MIT' / 'M.I.T.' -> 'mit'; '' unless `name` is one short all-caps token."""
+    compact = name.replace(".", "").strip()
+    return compact.lower() if 2 <= len(compact) <= 6 and compact.isalpha() and compact.isupper() else ""
+
+
+class MappingMatcher:
+    """
+    Compiled form of mappings.json. Degree and venue keys are matched as
+    substrings with an Aho–Corasick automaton (earliest key wins, as in the
+    original dict scan); institutions go through an exact lookup and then a
+    normalized alias index (case/punctuation, generic words, dotted forms of
+    acronym keys, and an optional `university_aliases` mapping). Initials
+    are never derived from full names, which collide ("Manipal Institute of
+    Technology" is not MIT); list such names in `university_aliases`.
+    Resolved names are LRU cached.
+    """
+
+    def __init__(self, mappings):
+        self.degree_keys = list(mappings["degree_levels"].items())
+        self.venue_keys = list(mappings["journal_impact"].items())
+        self.degree_automaton = KeywordAutomaton([k for k, _ in self.degree_keys])
+        self.venue_automaton = KeywordAutomaton([k for k, _ in self.venue_keys])
+
+        self.tiers = mappings["university_tiers"]
+        self.aliases = {}   # alias -> university_tiers key
+        for name in self.tiers:
+            norm = normalize_name(name)
+            for alias in (norm, core_name(norm)):
+                if alias:
+                    self.aliases.setdefault(alias, name)
+            # short all-caps keys such as "MIT" also match "M.I.T."
+            short = acronym_token(name)
+            if short:
+                self.aliases.setdefault(f"acronym:{short}", name)
+        for alias, name in mappings.get("university_aliases", {}).items():
+            if name in self.tiers:
+                self.aliases[normalize_name(alias)] = name
+
+        # *_match return (value, matched mapping key or None); the plain
+        # lookups return just the value
+        self.degree_match = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._degree_match)
+        self.venue_match = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._venue_match)
+        self.university_match = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._university_match)
+        self.degree = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(lambda degree: self.degree_match(degree)[0])
+        self.venue = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(lambda venue: self.venue_match(venue)[0])
+        self.university = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(lambda name: self.university_match(name)[0])
+
+    def _degree_match(self, degree, default=0.4):
+        idx = self.degree_automaton.first_match(degree)
+        return (default, None) if idx is None else self.degree_keys[idx][::-1]
+
+    def _venue_match(self, venue, default=0.1):
+        if not isinstance(venue, str):
+            raise TypeError(f"venue must be a string, got {type(venue).__name__}")
+        idx = self.venue_automaton.first_match(venue)
+        return (default, None) if idx is None else self.venue_keys[idx][::-1]
+
+    def _university_match(self, name, default=0.5):
+        if name in self.tiers:
+            return self.tiers[name], name
+        if not isinstance(name, str):
+            return default, None
+        norm = normalize_name(name)
+        for alias in (norm, core_name(norm)):
+            if alias in self.aliases:
+                key = self.aliases[alias]
+                return self.tiers[key], key
+        # only an input that is itself an acronym ("M.I.T.") matches an acronym key
+        short = acronym_token(name)
+        if short and f"acronym:{short}" in self.aliases:
+            key = self.aliases[f"acronym:{short}"]
+            return self.tiers[key], key
+        return default, None
+
+
+_compiled = OrderedDict()   # fingerprint -> matcher
+_recent = OrderedDict()     # id(mappings) -> (mappings, matcher)
+_lock = threading.Lock()
+
+def mappings_fingerprint(mappings):
+    return hashlib.sha1(json.dumps(mappings, sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_matcher(mappings):
+    """
+    Compiled matcher for a mappings dict, built once per mappings version.
+    The same dict object is recognised without re-hashing, so calling this
+    once per candidate is cheap (don't mutate a mappings dict in place).
+    """
+    with _lock:
+        hit = _recent.get(id(mappings))
+        if hit is not None and hit[0] is mappings:
+            return hit[1]
+        fp = mappings_fingerprint(mappings)
+        matcher = _compiled.get(fp)
+        if matcher is None:
+            matcher = MappingMatcher(mappings)
+            _compiled[fp] = matcher
+            while len(_compiled) > MAX_COMPILED:
+                _compiled.popitem(last=False)
+        # keep a reference so the id cannot be reused by another dict
+        _recent[id(mappings)] = (mappings, matcher)
+        while len(_recent) > MAX_COMPILED:
+            _recent.popitem(last=False)
+        return matcher
@@ -0,0 +1,137 @@
+import threading, time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a cache hit up to a slow OCR/LLM call
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}   # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self.lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(row)) for key, row in self.values.items()]
+        out = []
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                out.append(f"{self.name}_bucket{format_labels(self.labels, key, [('le', bound)])} {cumulative}")
+            out.append(f"{self.name}_bucket{format_labels(self.labels, key, [('le', '+Inf')])} {row[-1]}")
+            out.append(f"{self.name}_sum{format_labels(self.labels, key)} {row[-2]:.6f}")
+            out.append(f"{self.name}_count{format_labels(self.labels, key)} {row[-1]}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register fn() -> [(name, kind, help, value)] evaluated at scrape time."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for m in self.metrics:
+            lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} {m.kind}", *m.samples()]
+        for fn in self.collectors:
+            for name, kind, help, value in fn():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "hr_stage_seconds", "Time spent per pipeline stage", ["stage"])
+STAGE_ERRORS = REGISTRY.counter(
+    "hr_stage_errors_total", "Pipeline stage failures", ["stage"])
+CVS_PROCESSED = REGISTRY.counter(
+    "hr_cvs_processed_total", "CVs through extraction, by outcome", ["status"])
+OCR_PAGES = REGISTRY.counter(
+    "hr_ocr_pages_total", "PDF pages, by whether they needed OCR", ["kind"])
+DUPLICATE_CVS = REGISTRY.counter(
+    "hr_duplicate_cvs_total", "CVs that reused a near-duplicate's LLM extraction")
+EXTRACTIONS = REGISTRY.counter(
+    "hr_structured_extractions_total", "Structured CV extractions, by method (local rules or LLM)", ["method"])
+PROMPT_TOKENS = REGISTRY.counter(
+    "hr_prompt_cv_tokens_total", "Estimated CV text tokens for extraction prompts, before and after trimming", ["text"])
+HTTP_SECONDS = REGISTRY.histogram(
+    "hr_http_request_seconds", "HTTP request latency", ["method", "route", "status"])
+
+
+@contextmanager
+def span(stage):
+    """Time a pipeline stage into hr_stage_seconds; failures also count in hr_stage_errors_total."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
@@ -1,31 +1,91 @@
 import pytesseract
-from pdf2image import convert_from_path
+import fitz
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 import docx
+import io
 import os
+import time
+from app.textprep import preprocess, detect_language
 
-def extract_text_from_pdf(file_path):
-    text = ""
-    try:
-        # Convert PDF pages to images for OCR
-        images = convert_from_path(file_path)
-        for img in images:
-            text += pytesseract.image_to_string(img) + "\n"
-    except:
-        # fallback: text-based PDF parsing (if not scanned)
-        import PyPDF2
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    return text
+# OCR settings (override in .env)
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", 2))
+
+# Parsers accept either a file path or the file's bytes, so zip members can
+# be parsed without extracting them to disk first.
+
+def ocr_image(image):
+    return pytesseract.image_to_string(image, lang="eng")
+
+def render_page(page, dpi):
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+def extract_pdf_with_report(source, dpi=None):
+    """
+    Use the PDF text layer where there is one and OCR only pages without
+    text. Image pages are OCR'd in parallel (Tesseract runs as a separate
+    process, so threads are enough). Returns (text, report) where the report
+    lists which pages were OCR'd and how long OCR took (`ocr_seconds`):
+    this usually runs in a worker process, so the caller records the time
+    in its own metrics.
+    """
+    dpi = dpi or OCR_DPI
+    if isinstance(source, bytes):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+
+    with doc:
+        pages = [page.get_text() for page in doc]
+        ocr_pages = [i for i, t in enumerate(pages) if not t.strip()]
+        started = time.perf_counter()
+        if ocr_pages:
+            with ThreadPoolExecutor(max_workers=OCR_PAGE_WORKERS) as pool:
+                # render a handful of pages at a time to bound memory
+                for start in range(0, len(ocr_pages), OCR_PAGE_WORKERS):
+                    chunk = ocr_pages[start:start + OCR_PAGE_WORKERS]
+                    images = [render_page(doc[i], dpi) for i in chunk]
+                    for i, text in zip(chunk, pool.map(ocr_image, images)):
+                        pages[i] = text
+        ocr_seconds = time.perf_counter() - started
+
+    text = "".join(t if t.endswith("\n") else t + "\n" for t in pages)
+    report = {"pages": len(pages), "ocr_pages": ocr_pages, "ocr_seconds": ocr_seconds, "dpi": dpi}
+    return text, report
 
-def extract_text_from_docx(file_path):
-    doc = docx.Document(file_path)
+def extract_text_from_pdf(source):
+    return extract_pdf_with_report(source)[0]
+
+def extract_text_from_docx(source):
+    doc = docx.Document(io.BytesIO(source) if isinstance(source, bytes) else source)
     text = "\n".join([p.text for p in doc.paragraphs])
     return text
 
+def extract_cv_with_report(data, filename):
+    """Extract text from CV bytes; returns (text, report)."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".pdf":
+        return extract_pdf_with_report(data)
+    elif ext == ".docx":
+        return extract_text_from_docx(data), {"pages": None, "ocr_pages": []}
+    else:
+        return "", {"pages": 0, "ocr_pages": []}
+
+def extract_prepared_with_report(data, filename):
+    """
+    `extract_cv_with_report` followed by normalization, PII redaction and
+    whitespace cleanup (app/textprep.py); the report gains the language.
+    """
+    text, report = extract_cv_with_report(data, filename)
+    if text.strip():
+        report["language"] = detect_language(text)
+    return preprocess(text), report
+
+def extract_cv_from_bytes(data, filename):
+    return extract_cv_with_report(data, filename)[0]
+
 def extract_cv_from_file(file_path):
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".pdf":
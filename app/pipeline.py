@@ -0,0 +1,175 @@
+import asyncio, os
+from concurrent.futures import ProcessPoolExecutor
+from app.parser import extract_prepared_with_report
+from app.textprep import PREP_VERSION
+from app.sections import prompt_text
+from app.local_extract import extract_local, LOCAL_EXTRACT, LOCAL_MIN_CONFIDENCE
+import app.llm as llm
+from app.llm import extract_structured_cv, cached_structured_cv, store_structured_cv, generate_text
+from app.llm_batch import LLMBatcher, BATCH_PROMPT_VERSION
+from app.cache import get_cache, content_hash
+from app.logs import get_logger
+from app.dedup import Deduplicator, DEDUP_ENABLED
+from app.metrics import span, STAGE_SECONDS, CVS_PROCESSED, OCR_PAGES, EXTRACTIONS
+
+log = get_logger(__name__)
+
+# Concurrency limits (override in .env); LLM concurrency and rate limits
+# live in the shared client, see app/llm_client.py
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 2))
+# Pack several CVs into one Gemini request up to this many estimated tokens (0 = off)
+LLM_BATCH_TOKENS = int(os.getenv("LLM_BATCH_TOKENS", 0))
+LLM_BATCH_MAX_CVS = int(os.getenv("LLM_BATCH_MAX_CVS", 8))
+
+_ocr_pool = None
+
+def get_ocr_pool():
+    """OCR/parsing is CPU bound, so it runs in a shared process pool."""
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _ocr_pool
+
+def shutdown_pools():
+    global _ocr_pool
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(cancel_futures=True)
+        _ocr_pool = None
+
+
+def source_name(source):
+    return source.filename if hasattr(source, "filename") else os.path.basename(source)
+
+def load_source(source):
+    """Read a CV source (a file path or a lazily read zip member) and hash it."""
+    if hasattr(source, "read"):
+        data = source.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    return data, content_hash(data)
+
+
+async def extract_text(source, filename, ocr_slots):
+    """
+    Load and parse one CV. Extracted (preprocessed) text is cached by file
+    content and preprocessing version, so unchanged CVs skip OCR.
+    `ocr_slots` bounds how many file buffers are held in memory at once.
+    """
+    async with ocr_slots:
+        data, digest = await asyncio.to_thread(load_source, source)
+        cache = get_cache()
+        text_key = f"{digest}:prep{PREP_VERSION}"
+        text = cache.get("text", text_key) if cache is not None else None
+        report = {"cached": True}
+        if text is None:
+            loop = asyncio.get_running_loop()
+            with span("text_extraction"):
+                text, report = await loop.run_in_executor(
+                    get_ocr_pool(), extract_prepared_with_report, data, filename)
+            if report.get("ocr_pages"):
+                # timed in the OCR worker process, whose metrics never reach this registry
+                STAGE_SECONDS.observe(report["ocr_seconds"], stage="ocr")
+            if report.get("pages"):
+                OCR_PAGES.inc(len(report["ocr_pages"]), kind="ocr")
+                OCR_PAGES.inc(report["pages"] - len(report["ocr_pages"]), kind="text_layer")
+            if cache is not None:
+                cache.put("text", text_key, text)
+    return text, digest, report
+
+
+async def process_cv(source, filename, ocr_slots, report_to, batcher, dedup=None, idx=None):
+    text, digest, report = await extract_text(source, filename, ocr_slots)
+    report_to(report)
+    if dedup is not None:
+        return await dedup.extract(idx, filename, text,
+                                   lambda: structure_cv(text, digest, filename, batcher))
+    return await structure_cv(text, digest, filename, batcher)
+
+
+async def structure_cv(text, digest, filename, batcher):
+    # Cache hits skip the LLM queue and rate limiter entirely
+    version = BATCH_PROMPT_VERSION if batcher else llm.PROMPT_VERSION
+    cached = cached_structured_cv(digest, version)
+    if cached is not None:
+        return cached
+    # well-formatted CVs are parsed locally; the LLM only sees the rest
+    if LOCAL_EXTRACT:
+        cv, confidence = extract_local(text, filename)
+        if confidence >= LOCAL_MIN_CONFIDENCE or llm.client is None:
+            EXTRACTIONS.inc(method="local")
+            log.debug("local_extraction", file=filename, confidence=confidence)
+            return cv
+    EXTRACTIONS.inc(method="llm")
+    # only the sections the schema needs, within per-section token budgets
+    text = prompt_text(text)
+    if batcher:
+        cv = await batcher.submit(text, filename)
+        store_structured_cv(digest, cv, version)
+        return cv
+    return await extract_structured_cv(text, filename, digest)
+
+
+async def iter_cvs(sources, reports=None, clusters=None):
+    """
+    Run OCR + LLM extraction for every source (file path or ZipMember)
+    concurrently and yield (index, filename, cv_json or exception) as each
+    CV finishes. If `reports` is a dict, each file's parse report (pages,
+    which pages were OCR'd) is stored in it under the source index. If
+    `clusters` is a list, clusters of near-duplicate CVs (which shared one
+    LLM extraction) are appended to it once all sources are done.
+    """
+    ocr_slots = asyncio.Semaphore(OCR_WORKERS * 2)
+    dedup = Deduplicator(range(len(sources))) if DEDUP_ENABLED else None
+    batcher = None
+    if LLM_BATCH_TOKENS and llm.client is not None:
+        batcher = LLMBatcher(generate_text, max_tokens=LLM_BATCH_TOKENS, max_items=LLM_BATCH_MAX_CVS)
+
+    async def run(idx, source):
+        filename = source_name(source)
+        def report_to(report):
+            if reports is not None:
+                reports[idx] = report
+        try:
+            cv = await process_cv(source, filename, ocr_slots, report_to, batcher, dedup, idx)
+        except Exception as e:
+            CVS_PROCESSED.inc(status="failed")
+            return idx, filename, e
+        finally:
+            if dedup is not None:
+                dedup.finished(idx)   # later duplicates stop waiting for a file that failed
+        CVS_PROCESSED.inc(status="ok")
+        return idx, filename, cv
+
+    tasks = [asyncio.create_task(run(i, s)) for i, s in enumerate(sources)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+        if batcher and batcher.stats.cvs:
+            log.info("llm_batching", **batcher.stats.as_dict())
+        if dedup is not None:
+            if clusters is not None:
+                clusters.extend(dedup.clusters())
+            if dedup.index.stats()["duplicates"]:
+                log.info("near_duplicates", **dedup.index.stats())
+
+
+async def extract_cvs(sources, clusters=None):
+    """
+    Extract all CVs concurrently. Results come back in the order of `sources`
+    (failed files are skipped) so ranking matches the serial path.
+    """
+    results, reports = {}, {}
+    async for idx, filename, cv in iter_cvs(sources, reports=reports, clusters=clusters):
+        if isinstance(cv, Exception):
+            log.warning("cv_failed", file=filename, error=str(cv))
+            continue
+        log.sample("cv_extracted", file=filename, done=len(results) + 1, total=len(sources),
+                   ocr_pages=reports.get(idx, {}).get("ocr_pages"),
+                   education=len(cv.get("education", [])), experience=len(cv.get("experience", [])),
+                   publications=len(cv.get("publications", [])), awards=len(cv.get("awards", [])))
+        results[idx] = cv
+    return [results[i] for i in sorted(results)]
@@ -0,0 +1,235 @@
+"""
+Named scoring profiles stored on the server. A profile is a config and a
+mappings dict, validated against a small schema and compiled once into an
+immutable `Profile`; requests reference it by id instead of sending both
+as JSON. Profile files are re-checked on access and recompiled when they
+change, so editing config.json, mappings.json or profiles/*.json takes
+effect without a restart.
+
+profiles/<id>.json holds {"description": ..., "config": {...} or
+"config_file": path, "mappings": {...} or "mappings_file": path}; paths
+are relative to the profile file. The "default" profile is CONFIG_PATH
+and MAPPINGS_PATH unless profiles/default.json exists.
+"""
+import hashlib, json, os, threading, time
+from app.scoring import compile_config
+from app.logs import get_logger
+
+log = get_logger(__name__)
+
+# Profile settings (override in .env)
+PROFILES_DIR = os.getenv("PROFILES_DIR", "profiles")
+CONFIG_PATH = os.getenv("CONFIG_PATH", "config.json")
+MAPPINGS_PATH = os.getenv("MAPPINGS_PATH", "mappings.json")
+PROFILE_CHECK_SECONDS = float(os.getenv("PROFILE_CHECK_SECONDS", 1.0))   # min time between file checks
+
+NUMBER = "number"
+# "key?" marks an optional key; other keys are allowed and ignored
+CONFIG_SCHEMA = {
+    "weights": {"education": NUMBER, "experience": NUMBER, "publications": NUMBER,
+                "awards_other?": NUMBER, "coherence?": NUMBER, "semantic?": NUMBER},
+    "subweights": {
+        "education": {"degree_level": NUMBER, "university_tier": NUMBER, "gpa": NUMBER},
+        "experience?": {"duration_months?": NUMBER, "domain_match?": NUMBER},
+    },
+    "policies": {"min_months_experience_for_bonus": NUMBER, "domain": str,
+                 "missing_values_penalty?": NUMBER, "job_description?": str},
+}
+MAPPING_TABLES = ("degree_levels", "university_tiers", "journal_impact")
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def check(value, schema, path):
+    if not isinstance(value, dict):
+        raise ProfileError(f"{path} must be an object")
+    for key, rule in schema.items():
+        name = key.rstrip("?")
+        where = f"{path}.{name}"
+        if name not in value or (key.endswith("?") and value[name] is None):
+            if not key.endswith("?"):
+                raise ProfileError(f"{where} is required")
+            continue
+        item = value[name]
+        if isinstance(rule, dict):
+            check(item, rule, where)
+        elif rule is NUMBER:
+            if isinstance(item, bool) or not isinstance(item, (int, float)) or item < 0:
+                raise ProfileError(f"{where} must be a non-negative number")
+        elif not isinstance(item, rule):
+            raise ProfileError(f"{where} must be a {rule.__name__}")
+
+def validate_config(config):
+    """Raise ProfileError unless `config` has every key scoring reads, with the right types."""
+    check(config, CONFIG_SCHEMA, "config")
+    if config["policies"]["min_months_experience_for_bonus"] <= 0:
+        raise ProfileError("config.policies.min_months_experience_for_bonus must be positive")
+
+def validate_mappings(mappings):
+    """Raise ProfileError unless every mapping table maps names to non-negative numbers."""
+    if not isinstance(mappings, dict):
+        raise ProfileError("mappings must be an object")
+    for table in MAPPING_TABLES:
+        entries = mappings.get(table)
+        if not isinstance(entries, dict):
+            raise ProfileError(f"mappings.{table} is required and must be an object")
+        for name, value in entries.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ProfileError(f"mappings.{table}[{name!r}] must be a non-negative number")
+    aliases = mappings.get("university_aliases", {})
+    if not isinstance(aliases, dict) or not all(isinstance(v, str) for v in aliases.values()):
+        raise ProfileError("mappings.university_aliases must map names to university_tiers keys")
+
+
+class Profile:
+    """
+    A validated, compiled scoring profile. Immutable: a reload builds a new
+    Profile, so a request keeps the version it started with. `config` and
+    `mappings` are shared with every request and must not be modified.
+    """
+
+    __slots__ = ("id", "description", "config", "mappings", "cfg", "version", "sources", "loaded")
+
+    def __init__(self, profile_id, config, mappings, description="", sources=()):
+        validate_config(config)
+        validate_mappings(mappings)
+        data = json.dumps([config, mappings], sort_keys=True).encode("utf-8")
+        fields = {
+            "id": profile_id, "description": description, "config": config, "mappings": mappings,
+            "cfg": compile_config(config, mappings),
+            "version": hashlib.sha1(data).hexdigest()[:12],
+            "sources": tuple(sources), "loaded": time.time(),
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Profile is immutable; edit its files to change it")
+
+    def info(self):
+        return {"id": self.id, "description": self.description, "version": self.version,
+                "sources": list(self.sources), "loaded": self.loaded}
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def load_profile(profile_id, path):
+    """Profile from profiles/<id>.json, or from CONFIG_PATH and MAPPINGS_PATH when `path` is None."""
+    if path is None:
+        return Profile(profile_id, read_json(CONFIG_PATH), read_json(MAPPINGS_PATH),
+                       "config.json and mappings.json", (CONFIG_PATH, MAPPINGS_PATH))
+    spec = read_json(path)
+    if not isinstance(spec, dict):
+        raise ProfileError(f"{path} must hold a JSON object")
+    base = os.path.dirname(path)
+    sources, parts = [path], {}
+    for part in ("config", "mappings"):
+        if f"{part}_file" in spec:
+            part_path = os.path.join(base, spec[f"{part}_file"])
+            sources.append(part_path)
+            parts[part] = read_json(part_path)
+        elif part in spec:
+            parts[part] = spec[part]
+        else:
+            raise ProfileError(f"{path} needs \"{part}\" or \"{part}_file\"")
+    return Profile(profile_id, parts["config"], parts["mappings"], spec.get("description", ""), sources)
+
+
+def stamp(paths):
+    """(path, mtime, size) per file; changes whenever one of them is edited, replaced or removed."""
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append((path, None, None))
+    return tuple(stamps)
+
+
+class ProfileRegistry:
+    """
+    Profiles by id, reloaded when their files change. Files are checked at
+    most every `check_interval` seconds, on access; a profile whose files
+    fail to load or validate keeps its last good version and reports the
+    error in `list()`.
+    """
+
+    def __init__(self, directory=PROFILES_DIR, check_interval=PROFILE_CHECK_SECONDS):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.profiles = {}
+        self.errors = {}
+        self.stamps = {}
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def discover(self):
+        """{profile id: profile file, or None for the built-in default}."""
+        found = {}
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith(".json"):
+                    found[name[:-5]] = os.path.join(self.directory, name)
+        if "default" not in found and os.path.exists(CONFIG_PATH) and os.path.exists(MAPPINGS_PATH):
+            found["default"] = None
+        return found
+
+    def refresh(self, force=False):
+        """Reload profiles whose files changed; `force` re-reads every file now."""
+        now = time.monotonic()
+        if not force and self.checked is not None and now - self.checked < self.check_interval:
+            return
+        with self.lock:
+            self.checked = now
+            found = self.discover()
+            for profile_id in set(self.profiles) | set(self.errors) | set(self.stamps):
+                if profile_id not in found:
+                    self.profiles.pop(profile_id, None)
+                    self.errors.pop(profile_id, None)
+                    self.stamps.pop(profile_id, None)
+                    log.info("profile_removed", profile=profile_id)
+            for profile_id, path in found.items():
+                current = self.profiles.get(profile_id)
+                sources = current.sources if current else ((path,) if path else (CONFIG_PATH, MAPPINGS_PATH))
+                stamps = stamp(sources)
+                if not force and stamps == self.stamps.get(profile_id):
+                    continue
+                try:
+                    profile = load_profile(profile_id, path)
+                except (OSError, ValueError) as e:
+                    # a half-written file fails here; the next change retries
+                    self.stamps[profile_id] = stamps
+                    self.errors[profile_id] = str(e)
+                    log.warning("profile_invalid", profile=profile_id, error=str(e))
+                    continue
+                self.profiles[profile_id] = profile
+                self.stamps[profile_id] = stamp(profile.sources)
+                self.errors.pop(profile_id, None)
+                log.info("profile_loaded", profile=profile_id, version=profile.version,
+                         reloaded=current is not None)
+
+    def get(self, profile_id):
+        """The current compiled profile, or None."""
+        self.refresh()
+        return self.profiles.get(profile_id)
+
+    def list(self):
+        self.refresh()
+        ids = sorted(set(self.profiles) | set(self.errors))
+        return [{**(self.profiles[i].info() if i in self.profiles else {"id": i}),
+                 "error": self.errors.get(i)} for i in ids]
+
+
+_profiles = None
+
+def get_profiles():
+    """Shared profile registry."""
+    global _profiles
+    if _profiles is None:
+        _profiles = ProfileRegistry()
+    return _profiles
@@ -0,0 +1,178 @@
+import base64, heapq, json, os
+from app.scoring import score_breakdown, semantic_scores, compile_config, describe, COMPONENT_LABELS
+from app.batch_scoring import score_batch, BatchScorer
+from app.logs import get_logger
+from app.metrics import span
+
+log = get_logger(__name__)
+
+# Pools at least this large are scored with the vectorized BatchScorer
+BATCH_SCORING_MIN = int(os.getenv("BATCH_SCORING_MIN", 256))
+
+
+def compact(value):
+    """Drop None values and empty containers so the breakdown serializes small."""
+    if isinstance(value, dict):
+        out = {k: compact(v) for k, v in value.items()}
+        return {k: v for k, v in out.items() if v is not None and v != [] and v != {}}
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def candidate_result(cv, score, breakdown, position=None):
+    """
+    The response shape for one scored CV. `breakdown` is its
+    `score_breakdown`; `position` is its index in the batch (for /explain).
+    """
+    components = breakdown["components"]
+    top = sorted((k for k, v in components.items() if v > 0), key=lambda k: -components[k])[:3]
+    return {
+        "name": cv.get("name", "Unknown"),
+        "position": position,
+        "sys_score": score,
+        "subscores": {k: round(v, 2) for k, v in components.items() if v or k != "semantic"},
+        "breakdown": compact(breakdown["evidence"]),
+        "explanation": {
+            "summary": f"Candidate with {score:.2f} overall score",
+            "reasons": [f"{COMPONENT_LABELS[k]}: {components[k]:.2f} points ({describe(k, breakdown['evidence'])})"
+                        for k in top if k != "coherence"],
+        }
+    }
+
+
+def score_candidate(cv, cfg, position=None):
+    """Score one structured CV against a `CompiledConfig` into the response shape, or None if scoring fails."""
+    try:
+        breakdown = score_breakdown(cv, cfg)
+        return candidate_result(cv, round(breakdown["total"], 2), breakdown, position)
+    except Exception as e:
+        log.debug("scoring_failed", error=str(e))
+        return None
+
+
+# ---------------------- TOP-K SELECTION ----------------------
+# Ranking order is score descending, then input position, which is what a
+# stable full sort by score gives. A cursor is the (score, position) of the
+# last candidate on a page; the next page starts strictly after it.
+
+def encode_cursor(score, idx):
+    return base64.urlsafe_b64encode(json.dumps([score, idx]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(score, idx) from a cursor string; raises ValueError if it is malformed."""
+    try:
+        score, idx = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(score), int(idx)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+def select_top(scores, top_k=None, offset=0, min_score=None, cursor=None):
+    """
+    Pick one page from an iterable of (score, idx) without sorting the whole
+    pool: a heap keeps only the best `offset + top_k` entries. Returns
+    (page, total, next_cursor) where `total` counts candidates passing
+    `min_score` and `next_cursor` is None on the last page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    total, remaining, pool = 0, 0, []
+    for score, idx in scores:
+        if score is None or score != score:   # failed / NaN
+            continue
+        if min_score is not None and score < min_score:
+            continue
+        total += 1
+        if after is not None and (-score, idx) <= (-after[0], after[1]):
+            continue
+        remaining += 1
+        pool.append((score, idx))
+
+    offset = max(offset or 0, 0)
+    order = lambda x: (-x[0], x[1])
+    if top_k is None:
+        page = sorted(pool, key=order)[offset:]
+    else:
+        page = heapq.nsmallest(offset + max(top_k, 0), pool, key=order)[offset:]
+    more = remaining > offset + len(page)
+    next_cursor = encode_cursor(*page[-1]) if more and page else None
+    return page, total, next_cursor
+
+
+def pool_semantic_scores(cvs, cfg):
+    """`semantic_scores` for a pool, one None per CV when unused or when a CV cannot be encoded."""
+    try:
+        sims = semantic_scores(cvs, cfg)
+    except Exception as e:
+        log.debug("semantic_scoring_failed", error=str(e), fallback="per candidate")
+        sims = None
+    return sims or [None] * len(cvs)
+
+
+def score_pool(cvs, config, mappings, cfg=None):
+    """
+    (scores, breakdowns) for every CV, in order; a score is None where
+    scoring fails. Small pools are scored one CV at a time and keep their
+    breakdowns; large pools go through the BatchScorer (breakdowns None).
+    `cfg` is an already compiled config, e.g. from a scoring profile.
+    """
+    if len(cvs) >= BATCH_SCORING_MIN:
+        try:
+            return [None if s != s else float(s) for s in score_batch(cvs, config, mappings)], None
+        except Exception as e:
+            log.warning("batch_scoring_failed", error=str(e), fallback="score_breakdown")
+    cfg = cfg or compile_config(config, mappings)
+    sims = pool_semantic_scores(cvs, cfg)
+    scores, breakdowns = [], []
+    for cv, sim in zip(cvs, sims):
+        try:
+            b = score_breakdown(cv, cfg, sim)
+            scores.append(round(b["total"], 2))
+            breakdowns.append(b)
+        except Exception as e:
+            log.debug("scoring_failed", error=str(e))
+            scores.append(None)
+            breakdowns.append(None)
+    return scores, breakdowns
+
+
+def score_stored(store, config, mappings, ids=None):
+    """
+    (ids, scores) for candidates in the persistent store, scored by the
+    BatchScorer from the store's flattened tables (`CandidateStore.columns`)
+    without loading any CV JSON. `ids` restricts the pool, e.g. to a
+    `store.query()` result; rows are in id order and a score is NaN where
+    scoring fails.
+    """
+    scorer = BatchScorer(mappings, config["policies"])
+    pool_ids, cols = store.columns(scorer, ids)
+    return pool_ids, scorer.score(cols, config)
+
+
+def rank_page(cvs, config, mappings, top_k=None, offset=0, min_score=None, cursor=None, cfg=None):
+    """
+    Score `cvs` and return one page of the ranking:
+    {"ranked_candidates": [...], "total": n, "next_cursor": str or None}.
+    Only the candidates on the page are turned into response dicts.
+    """
+    with span("scoring"):
+        scores, breakdowns = score_pool(cvs, config, mappings, cfg)
+    with span("ranking"):
+        page, total, next_cursor = select_top(
+            ((s, i) for i, s in enumerate(scores)), top_k, offset, min_score, cursor)
+        if breakdowns is None:
+            # batch-scored pool: only the page needs a breakdown
+            cfg = cfg or compile_config(config, mappings)
+            sims = pool_semantic_scores([cvs[i] for _, i in page], cfg)
+            ranked = [candidate_result(cvs[i], s, score_breakdown(cvs[i], cfg, sim), i)
+                      for (s, i), sim in zip(page, sims)]
+        else:
+            ranked = [candidate_result(cvs[i], s, breakdowns[i], i) for s, i in page]
+
+    log.info("ranking_complete", cvs=len(cvs), scored=total, returned=len(ranked))
+
+    return {"ranked_candidates": ranked, "total": total, "next_cursor": next_cursor}
+
+
+def rank_candidates(cvs, config, mappings):
+    """Full ranking, best first (ties keep input order)."""
+    return rank_page(cvs, config, mappings)["ranked_candidates"]
@@ -1,4 +1,6 @@
 from datetime import datetime
+from app.matcher import get_matcher
+from app.search import semantic_similarity
 
 def calculate_months(start=None, end=None):
     try:
@@ -9,49 +11,151 @@ def calculate_months(start=None, end=None):
     except:
         return 0
 
-def score_cv(cv, config, mappings):
-    w = config["weights"]
-    sw = config["subweights"]
-    p = config["policies"]
-
-    # EDUCATION
-    best_edu = 0
-    for e in cv.get("education", []):
-        deg = str(e.get("degree","")).lower()
-        d_val = next((v for k,v in mappings["degree_levels"].items() if k in deg), 0.4)
-        t_val = mappings["university_tiers"].get(e.get("university","Unknown"), 0.5)
-        g_val = e.get("gpa", p.get("missing_values_penalty",0.5))
-        best_edu = max(best_edu, d_val*sw["education"]["degree_level"] + t_val*sw["education"]["university_tier"] + g_val*sw["education"]["gpa"])
+
+COMPONENT_LABELS = {
+    "education": "Education", "experience": "Experience", "publications": "Publications",
+    "awards": "Awards", "coherence": "Coherence", "semantic": "Job description match",
+}
+
+
+class CompiledConfig:
+    """
+    A scoring config resolved once into flat attributes (weights,
+    sub-weights, policies and the compiled mappings matcher), so scoring
+    a pool does not re-read nested dicts for every candidate.
+    """
+
+    __slots__ = ("matcher", "w_edu", "w_exp", "w_pub", "w_awd", "w_coh", "w_sem",
+                 "s_deg", "s_tier", "s_gpa", "exp_dur", "exp_dom",
+                 "min_months", "domain", "missing_gpa", "job_description")
+
+    def __init__(self, config, matcher):
+        w, sw, p = config["weights"], config["subweights"], config["policies"]
+        self.matcher = matcher
+        self.w_edu, self.w_exp, self.w_pub = w["education"], w["experience"], w["publications"]
+        self.w_awd, self.w_coh, self.w_sem = w.get("awards_other", 0), w.get("coherence", 0), w.get("semantic", 0)
+        edu = sw["education"]
+        self.s_deg, self.s_tier, self.s_gpa = edu["degree_level"], edu["university_tier"], edu["gpa"]
+        if "experience" in sw and "duration_months" in sw["experience"]:
+            self.exp_dur = sw["experience"]["duration_months"]
+            self.exp_dom = sw["experience"].get("domain_match", 0.3)
+        else:
+            # no experience subweights defined: 70% duration, 30% domain
+            self.exp_dur, self.exp_dom = 0.7, 0.3
+        self.min_months = p["min_months_experience_for_bonus"]
+        self.domain = p["domain"].lower()
+        self.missing_gpa = p.get("missing_values_penalty", 0.5)
+        self.job_description = p.get("job_description") or ""
+
+
+def compile_config(config, mappings):
+    return CompiledConfig(config, get_matcher(mappings))
+
+
+def semantic_scores(cvs, cfg):
+    """
+    Job-description similarity of each CV, encoded in one pass for
+    `score_breakdown(cv, cfg, similarity)`; None when `cfg` does not use it.
+    """
+    if not (cfg.w_sem and cfg.job_description):
+        return None
+    return [float(s) for s in semantic_similarity(cvs, cfg.job_description)]
+
+
+def score_breakdown(cv, cfg, similarity=None):
+    """
+    Score one CV against a `CompiledConfig` in a single pass. Returns
+    {"total", "components", "evidence"}: the unrounded score, weighted
+    points per component (in the order they are added) and, per component,
+    the matched mapping keys and the index of the contributing entries.
+    `similarity` is the CV's entry from `semantic_scores`, when scoring a
+    pool; otherwise it is computed here.
+    """
+    matcher = cfg.matcher
+
+    # EDUCATION: best weighted entry
+    best_edu, best_val, edu_entry = 0, 0, None
+    for i, e in enumerate(cv.get("education", [])):
+        d_val, d_key = matcher.degree_match(str(e.get("degree","")).lower())
+        t_val, t_key = matcher.university_match(e.get("university","Unknown"))
+        g_val = e.get("gpa", cfg.missing_gpa)
+        val = d_val*cfg.s_deg + t_val*cfg.s_tier + g_val*cfg.s_gpa
+        if edu_entry is None or val > best_val:
+            best_val = val
+            edu_entry = {"entry": i, "degree": e.get("degree"), "degree_key": d_key,
+                         "university": e.get("university"), "university_key": t_key, "gpa": g_val}
+        best_edu = max(best_edu, val)
 
     # EXPERIENCE
-    months, domain = 0, 0
-    for exp in cv.get("experience", []):
+    months, domain, domain_entries = 0, 0, []
+    for i, exp in enumerate(cv.get("experience", [])):
         months += calculate_months(exp.get("start"), exp.get("end"))
-        if p["domain"].lower() in exp.get("domain","").lower():
+        if cfg.domain in exp.get("domain","").lower():
             domain = 1
-    dur_score = min(months / p["min_months_experience_for_bonus"], 1)
-    # Handle missing experience subweights
-    if "experience" in sw and "duration_months" in sw["experience"]:
-        exp_val = dur_score*sw["experience"]["duration_months"] + domain*sw["experience"].get("domain_match", 0.3)
-    else:
-        # Fallback if no experience subweights defined
-        exp_val = dur_score * 0.7 + (domain * 0.3 if domain else 0)
-
-    # PUBLICATIONS
-    best_pub = 0
-    for pub in cv.get("publications", []):
+            domain_entries.append(i)
+    # no minimum (0 or less): any experience earns the full duration score
+    dur_score = min(months / cfg.min_months, 1) if cfg.min_months > 0 else 1
+    exp_val = dur_score*cfg.exp_dur + domain*cfg.exp_dom
+
+    # PUBLICATIONS: best venue
+    best_pub, pub_entry = 0, None
+    for i, pub in enumerate(cv.get("publications", [])):
         venue = pub.get("venue","Unknown")
-        best_pub = max(best_pub, next((v for k,v in mappings["journal_impact"].items() if k in venue), 0.1))
+        v_val, v_key = matcher.venue_match(venue)
+        if v_val > best_pub:
+            best_pub = v_val
+            pub_entry = {"entry": i, "venue": venue, "venue_key": v_key}
 
     # AWARDS
-    awards = min(len(cv.get("awards",[]))*0.5, 1.0)
-
-    # FINAL SCORE
-    final = (
-        best_edu*10*w["education"] +
-        exp_val*10*w["experience"] +
-        best_pub*10*w["publications"] +
-        awards*10*w.get("awards_other",0) +
-        8.0*w.get("coherence",0)
-    )
-    return round(final, 2)
+    n_awards = len(cv.get("awards",[]))
+    awards = min(n_awards*0.5, 1.0)
+
+    # SEMANTIC MATCH against policies.job_description (optional weight)
+    semantic = 0
+    if cfg.w_sem and cfg.job_description:
+        semantic = similarity if similarity is not None else float(semantic_similarity([cv], cfg.job_description)[0])
+
+    components = {
+        "education": best_edu*10*cfg.w_edu,
+        "experience": exp_val*10*cfg.w_exp,
+        "publications": best_pub*10*cfg.w_pub,
+        "awards": awards*10*cfg.w_awd,
+        "coherence": 8.0*cfg.w_coh,
+        "semantic": semantic*10*cfg.w_sem,
+    }
+    total = (components["education"] + components["experience"] + components["publications"] +
+             components["awards"] + components["coherence"] + components["semantic"])
+    return {
+        "total": total,
+        "components": components,
+        "evidence": {
+            "education": edu_entry,
+            "experience": {"months": months, "domain_match": bool(domain), "domain_entries": domain_entries},
+            "publications": pub_entry,
+            "awards": {"count": n_awards},
+            "semantic": {"similarity": round(semantic, 4)} if cfg.w_sem and cfg.job_description else None,
+        },
+    }
+
+def score_cv(cv, config, mappings):
+    return round(score_breakdown(cv, compile_config(config, mappings))["total"], 2)
+
+
+def describe(component, evidence):
+    """Short, human-readable evidence for one component of a `score_breakdown`."""
+    ev = evidence.get(component)
+    if component == "education":
+        if not ev:
+            return "no degree listed"
+        gpa = f", GPA {ev['gpa']}" if ev.get("gpa") is not None else ""
+        return f"{ev.get('degree') or 'degree'} from {ev.get('university') or 'unknown university'}{gpa}"
+    if component == "experience":
+        domain = "in the target domain" if ev["domain_match"] else "outside the target domain"
+        return f"{ev['months']} months, {domain}"
+    if component == "publications":
+        return f"best venue {ev['venue']}" if ev else "no ranked publications"
+    if component == "awards":
+        return f"{ev['count']} award(s)"
+    if component == "semantic" and ev:
+        return f"similarity {ev['similarity']:.2f}"
+    return ""
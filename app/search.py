@@ -0,0 +1,347 @@
+import json, math, os, re, shutil, threading, time, zlib
+from functools import lru_cache
+import numpy as np
+from app.logs import get_logger
+
+log = get_logger(__name__)
+
+# Search index settings (override in .env)
+SEARCH_DIR = os.getenv("SEARCH_INDEX_DIR", "cvs_data/search")
+SEARCH_MODEL = os.getenv("SEARCH_MODEL", "")        # sentence-transformers model; empty = TF-IDF
+SEARCH_DIM = int(os.getenv("SEARCH_DIM", 256))       # TF-IDF projection width
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", 32))  # IVF lists scanned per query
+SEARCH_EXACT_MAX = int(os.getenv("SEARCH_EXACT_MAX", 50000))  # below this, scan every row
+SEARCH_FRESH_MAX = int(os.getenv("SEARCH_FRESH_MAX", 2000))   # changed candidates encoded per query
+
+IDF_BUCKETS = 1 << 20
+CHUNK = 4096
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+
+def cv_document(cv):
+    """Searchable text of a structured CV: its sections, without contact details."""
+    parts = []
+    for e in cv.get("education", []) or []:
+        if isinstance(e, dict):
+            parts.append(" ".join(str(e.get(k) or "") for k in ("degree", "field", "university")))
+    for x in cv.get("experience", []) or []:
+        if isinstance(x, dict):
+            parts.append(" ".join(str(x.get(k) or "") for k in ("title", "org", "domain")))
+    for p in cv.get("publications", []) or []:
+        if isinstance(p, dict):
+            parts.append(" ".join(str(p.get(k) or "") for k in ("title", "venue", "domain")))
+    for a in cv.get("awards", []) or []:
+        if isinstance(a, dict):
+            parts.append(str(a.get("title") or ""))
+    return "\n".join(parts)
+
+
+def tokens(text):
+    return TOKEN_RE.findall(text.lower())
+
+def token_hashes(text):
+    return np.fromiter((zlib.crc32(t.encode()) for t in tokens(text)), dtype=np.uint32)
+
+
+class HashedTfidf:
+    """
+    TF-IDF without a vocabulary: terms are hashed into IDF buckets and
+    projected (signed feature hashing) onto `dim` dense dimensions, so
+    vectors fit a fixed-width memory-mapped matrix. Cosine similarity of
+    the projections approximates TF-IDF cosine.
+    """
+
+    backend = "tfidf"
+
+    def __init__(self, dim=SEARCH_DIM, idf=None):
+        self.dim = dim
+        self.idf = idf   # (IDF_BUCKETS,) float32, or None for plain TF
+
+    @staticmethod
+    def document_frequencies(texts):
+        df = np.zeros(IDF_BUCKETS, dtype=np.uint32)
+        n = 0
+        for text in texts:
+            df[np.unique(token_hashes(text) & (IDF_BUCKETS - 1))] += 1
+            n += 1
+        return df, n
+
+    @classmethod
+    def fit(cls, df, n, dim=SEARCH_DIM):
+        idf = np.log((1 + n) / (1 + df.astype(np.float32))) + 1
+        return cls(dim, idf.astype(np.float32))
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = token_hashes(text)
+            if not hashes.size:
+                continue
+            uniq, counts = np.unique(hashes, return_counts=True)
+            weights = 1 + np.log(counts.astype(np.float32))
+            if self.idf is not None:
+                weights *= self.idf[uniq & (IDF_BUCKETS - 1)]
+            signs = np.where(uniq >> 31, 1.0, -1.0).astype(np.float32)
+            np.add.at(out[row], (uniq >> 20) % self.dim, weights * signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingModel:
+    """Local CPU sentence-transformers model (optional dependency)."""
+
+    backend = "embedding"
+
+    def __init__(self, name):
+        from sentence_transformers import SentenceTransformer
+        self.name = name
+        self.model = SentenceTransformer(name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(list(texts), batch_size=64, normalize_embeddings=True),
+                          dtype=np.float32)
+
+
+def make_encoder(df=None, n=0):
+    if SEARCH_MODEL:
+        try:
+            return EmbeddingModel(SEARCH_MODEL)
+        except Exception as e:
+            log.warning("embedding_model_unavailable", model=SEARCH_MODEL, error=str(e), fallback="tfidf")
+    return HashedTfidf.fit(df, n) if df is not None else HashedTfidf()
+
+
+def kmeans(vectors, k, iters=10, seed=0, sample=50000):
+    """Spherical k-means on (a sample of) unit vectors; returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    rows = np.sort(rng.choice(n, min(n, sample), replace=False))
+    data = np.asarray(vectors[rows])
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class SearchIndex:
+    """
+    Candidate vectors in a memory-mapped .npy matrix with an IVF
+    (inverted file) index: rows are stored grouped by nearest k-means
+    centroid, and a query scans only the `nprobe` closest groups. Small
+    indexes are scanned exactly.
+    """
+
+    def __init__(self, root, meta, encoder):
+        self.root = root
+        self.meta = meta
+        self.encoder = encoder
+        self.vectors = np.load(os.path.join(root, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(root, "ids.npy"))
+        self.centroids = np.load(os.path.join(root, "centroids.npy"))
+        self.offsets = np.load(os.path.join(root, "offsets.npy"))
+        self.id_order = np.argsort(self.ids)
+
+    @classmethod
+    def load(cls, root=SEARCH_DIR):
+        with open(os.path.join(root, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["backend"] == "embedding":
+            encoder = EmbeddingModel(meta["model"])
+        else:
+            encoder = HashedTfidf(meta["dim"], np.load(os.path.join(root, "idf.npy")))
+        return cls(root, meta, encoder)
+
+    @classmethod
+    def build(cls, store, root=SEARCH_DIR):
+        """Index every candidate in `store`; streams CVs and writes into a fresh directory."""
+        started = time.perf_counter()
+        snapshot = time.time()   # candidates changed after this are re-encoded at scoring time
+        tmp = f"{root}.building"
+        os.makedirs(tmp, exist_ok=True)
+        n = store.count()
+        if not n:
+            raise ValueError("The candidate store is empty")
+
+        df, seen = HashedTfidf.document_frequencies(cv_document(cv) for _, cv in store.iter_cvs())
+        encoder = make_encoder(df, seen)
+
+        # pass 1: encode into an unordered memmap
+        raw_path = os.path.join(tmp, "raw.npy")
+        raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(n, encoder.dim))
+        ids = np.zeros(n, dtype=np.int64)
+        batch, row = [], 0
+        for cid, cv in store.iter_cvs():
+            if row + len(batch) >= n:
+                break   # candidates added while indexing wait for the next build
+            batch.append((cid, cv_document(cv)))
+            if len(batch) == CHUNK:
+                raw[row:row + len(batch)] = encoder.encode([t for _, t in batch])
+                ids[row:row + len(batch)] = [c for c, _ in batch]
+                row += len(batch)
+                batch = []
+        if batch:
+            raw[row:row + len(batch)] = encoder.encode([t for _, t in batch])
+            ids[row:row + len(batch)] = [c for c, _ in batch]
+            row += len(batch)
+        n = row
+
+        # pass 2: IVF lists, rows rewritten grouped by list so each probe is one slice
+        nlist = 1 if n <= SEARCH_EXACT_MAX else int(min(4 * math.sqrt(n), 4096))
+        centroids = kmeans(raw[:n], nlist) if nlist > 1 else np.zeros((1, encoder.dim), dtype=np.float32)
+        assign = np.zeros(n, dtype=np.int32)
+        if nlist > 1:
+            for s in range(0, n, CHUNK * 4):
+                assign[s:s + CHUNK * 4] = np.argmax(np.asarray(raw[s:s + CHUNK * 4]) @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        vectors = np.lib.format.open_memmap(os.path.join(tmp, "vectors.npy"), mode="w+",
+                                            dtype=np.float32, shape=(n, encoder.dim))
+        for s in range(0, n, CHUNK * 4):
+            vectors[s:s + CHUNK * 4] = raw[order[s:s + CHUNK * 4]]
+        vectors.flush()
+        del vectors, raw
+        os.remove(raw_path)
+        np.save(os.path.join(tmp, "ids.npy"), ids[:n][order])
+        np.save(os.path.join(tmp, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp, "offsets.npy"), offsets)
+        if encoder.backend == "tfidf":
+            np.save(os.path.join(tmp, "idf.npy"), encoder.idf)
+        meta = {"backend": encoder.backend, "model": getattr(encoder, "name", None), "dim": encoder.dim,
+                "count": int(n), "nlist": int(nlist), "built": snapshot}
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        # swap the new index in
+        if os.path.isdir(root):
+            old = f"{root}.old"
+            os.replace(root, old)
+            os.replace(tmp, root)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(tmp, root)
+        log.info("search_index_built", candidates=n, lists=nlist, backend=encoder.backend,
+                 seconds=round(time.perf_counter() - started, 2))
+        return cls.load(root)
+
+    def encode_query(self, text):
+        return self.encoder.encode([text])[0]
+
+    def search(self, text, top_k=20, nprobe=SEARCH_NPROBE):
+        """[(candidate_id, similarity)] best first."""
+        q = self.encode_query(text)
+        nlist = len(self.offsets) - 1
+        if nlist <= 1:
+            slices = [(0, len(self.ids))]
+        else:
+            probe = np.argsort(-(self.centroids @ q))[:nprobe]
+            slices = [(int(self.offsets[l]), int(self.offsets[l + 1])) for l in sorted(probe)]
+        rows = np.concatenate([np.arange(a, b) for a, b in slices]) if slices else np.zeros(0, dtype=np.int64)
+        sims = np.concatenate([np.asarray(self.vectors[a:b]) @ q for a, b in slices]) if slices else np.zeros(0)
+        if not sims.size:
+            return []
+        k = min(top_k, sims.size)
+        best = np.argpartition(-sims, k - 1)[:k]
+        best = best[np.lexsort((rows[best], -sims[best]))]
+        return [(int(self.ids[rows[i]]), float(sims[i])) for i in best]
+
+    def similarities(self, ids, text):
+        """Similarity of indexed candidates `ids` to `text` (NaN where not indexed)."""
+        q = self.encode_query(text)
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.full(len(ids), np.nan)
+        if not len(self.ids) or not len(ids):
+            return out
+        pos = np.minimum(np.searchsorted(self.ids, ids, sorter=self.id_order), len(self.ids) - 1)
+        rows = self.id_order[pos]
+        hit = np.flatnonzero(self.ids[rows] == ids)
+        order = hit[np.argsort(rows[hit])]   # read the memmap in row order
+        out[order] = np.asarray(self.vectors[rows[order]]) @ q
+        return out
+
+
+    def search_fresh(self, store, text, top_k=20, nprobe=SEARCH_NPROBE, fresh_max=SEARCH_FRESH_MAX):
+        """
+        `search` kept current with the store between rebuilds: up to
+        `fresh_max` candidates added or updated since the build (most recent
+        first) are encoded on the fly and merged in, and indexed candidates
+        that were changed or deleted are dropped. Returns (hits, pending,
+        skipped): `pending` candidates are not in the index yet and the
+        `skipped` ones beyond `fresh_max` were not searched, so query cost
+        stays bounded until the next rebuild.
+        """
+        pending = store.count_changed_since(self.meta["built"])
+        fresh = store.changed_since(self.meta["built"], fresh_max) if pending else []
+        fresh_ids = {cid for cid, _ in fresh}
+        # over-fetch so rows deleted or changed since the build still leave top_k hits
+        k = top_k + len(fresh)
+        while True:
+            found = self.search(text, k, nprobe)
+            names = store.names([cid for cid, _ in found] + [cid for cid, _ in fresh])
+            hits = [(cid, sim) for cid, sim in found if cid in names and cid not in fresh_ids]
+            if len(hits) >= top_k or len(found) < k:
+                break
+            k *= 2
+        if fresh:
+            sims = self.encoder.encode([cv_document(cv) for _, cv in fresh]) @ self.encode_query(text)
+            hits += [(cid, float(sim)) for (cid, _), sim in zip(fresh, sims)]
+        hits.sort(key=lambda h: (-h[1], h[0]))
+        return [(cid, sim, names.get(cid)) for cid, sim in hits[:top_k]], pending, pending - len(fresh)
+
+
+_index = None
+_index_stamp = None   # (meta path, mtime, size) the loaded index was checked against
+_index_lock = threading.Lock()
+
+def get_search_index(root=SEARCH_DIR):
+    """
+    Loaded index (reloaded after a rebuild), or None if none has been built.
+    meta.json is only re-read when its mtime or size changes, so this is a
+    single stat per call.
+    """
+    global _index, _index_stamp
+    meta_path = os.path.join(root, "meta.json")
+    try:
+        st = os.stat(meta_path)
+    except OSError:
+        return None
+    stamp = (meta_path, st.st_mtime_ns, st.st_size)
+    if _index is not None and stamp == _index_stamp:
+        return _index
+    with _index_lock:
+        if _index is None or stamp != _index_stamp:
+            with open(meta_path, encoding="utf-8") as f:
+                built = json.load(f).get("built")
+            if _index is None or _index.meta.get("built") != built:
+                _index = SearchIndex.load(root)
+            _index_stamp = stamp
+    return _index
+
+def build_search_index(store, root=SEARCH_DIR):
+    global _index
+    with _index_lock:
+        _index = SearchIndex.build(store, root)
+    return _index
+
+
+# ---------------------- SCORING COMPONENT ----------------------
+@lru_cache(maxsize=32)
+def _query_vector(text, built):
+    index = get_search_index()
+    encoder = index.encoder if index is not None else HashedTfidf()
+    return encoder, encoder.encode([text])[0]
+
+def semantic_similarity(cvs, job_description):
+    """
+    Similarity in [0, 1] of each structured CV to a job description, using
+    the search index's encoder (IDF weights) when one is built.
+    """
+    index = get_search_index()
+    encoder, q = _query_vector(job_description, index.meta.get("built") if index is not None else None)
+    vectors = encoder.encode([cv_document(cv) for cv in cvs])
+    return np.clip(vectors @ q, 0, 1)
@@ -0,0 +1,176 @@
+"""
+Section-aware trimming of CV text before it is put into an extraction
+prompt. Lines are grouped under the headings they follow (education,
+experience, publications, awards, ...), OCR noise and repeated page
+furniture are dropped, and each section is cut to a token budget.
+Deterministic and CPU only.
+"""
+import os, re
+from collections import defaultdict
+from app.llm_client import estimate_tokens
+from app.metrics import PROMPT_TOKENS
+
+# Trim CV text before extraction (override in .env)
+PROMPT_TRIM = os.getenv("PROMPT_TRIM", "1") != "0"
+
+# Estimated tokens kept per section; "header" is the text before the first
+# heading (name, contact, summary) and "other" any section not listed below
+SECTION_TOKENS = {
+    "header": 200,
+    "education": 600,
+    "experience": 1500,
+    "publications": 2000,
+    "awards": 400,
+    "other": 200,
+    "ignored": 0,
+}
+# Lines up to this long are entry lines (a degree, a job, a paper) and are
+# kept before any description; longer lines are cut to DESCRIPTION_CHARS
+ENTRY_LINE_CHARS = 160
+DESCRIPTION_CHARS = 200
+
+HEADINGS = {
+    "education": ["education", "academic background", "academic qualifications", "qualifications",
+                  "education and training", "academic education", "degrees"],
+    "experience": ["experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "career history", "research experience",
+                   "industry experience", "positions", "appointments", "academic appointments",
+                   "professional appointments"],
+    "publications": ["publications", "selected publications", "journal publications",
+                     "conference publications", "peer reviewed publications", "papers", "patents",
+                     "publications and patents", "books", "book chapters", "preprints"],
+    "awards": ["awards", "honors", "honours", "honors and awards", "honours and awards",
+               "awards and honors", "awards and honours", "grants", "fellowships", "scholarships",
+               "grants and awards", "achievements", "prizes"],
+    "ignored": ["references", "referees", "skills", "technical skills", "key skills", "core skills",
+                "competencies", "core competencies", "interests", "hobbies", "hobbies and interests",
+                "languages", "language skills", "personal details", "personal information",
+                "declaration", "computer skills", "soft skills"],
+    "other": ["summary", "profile", "professional summary", "objective", "career objective", "about me",
+              "projects", "selected projects", "certifications", "certificates", "teaching",
+              "teaching experience", "talks", "presentations", "invited talks", "service",
+              "professional service", "activities", "volunteering", "memberships", "training", "courses"],
+}
+HEADING_KIND = {phrase: kind for kind, phrases in HEADINGS.items() for phrase in phrases}
+MAX_HEADING_WORDS = max(len(p.split()) for p in HEADING_KIND)
+
+HEADING_STRIP_RE = re.compile(r"^[\W\d_]+|[\W_]+$")
+PAGE_RE = re.compile(r"^(?:page\s*)?\d{1,3}\s*(?:/|of)\s*\d{1,3}$|^page\s*\d{1,3}$", re.IGNORECASE)
+TRIMMED_MARK = "[...]"
+PAGE_LINES = 15   # fewest lines between two copies of a running header
+
+
+def heading_kind(line):
+    """Section kind when `line` is a heading such as "WORK EXPERIENCE:" or "2. Education", else None."""
+    if len(line) > 60:
+        return None
+    words = HEADING_STRIP_RE.sub("", line).lower().replace("&", " and ").split()
+    if not words or len(words) > MAX_HEADING_WORDS:
+        return None
+    return HEADING_KIND.get(" ".join(words))
+
+
+def is_noise(line):
+    """OCR debris (mostly symbols), page numbers."""
+    if PAGE_RE.match(line):
+        return True
+    visible = len(line) - line.count(" ")
+    return visible > 3 and 3 * sum(c.isalnum() for c in line) < visible
+
+
+def segment(text):
+    """
+    [(kind, heading line or None, [lines])] in document order. Noise and
+    lines repeated on three or more pages (running headers and footers) are
+    dropped.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    positions = defaultdict(list)
+    for i, line in enumerate(lines):
+        positions[line].append(i)
+    # identical entries next to each other (three equal awards) are not page furniture
+    repeated = {line for line, pos in positions.items()
+                if line and len(pos) >= 3 and len(line) < ENTRY_LINE_CHARS
+                and min(b - a for a, b in zip(pos, pos[1:])) >= PAGE_LINES}
+    sections = [("header", None, [])]
+    for line in lines:
+        if not line or line in repeated or is_noise(line):
+            continue
+        kind = heading_kind(line)
+        if kind is not None:
+            sections.append((kind, line, []))
+        else:
+            sections[-1][2].append(line)
+    # a repeated line that is also the first line (often the name) is kept once
+    first = next((line for line in lines if line), None)
+    if first in repeated:
+        sections[0][2].insert(0, first)
+    return sections
+
+
+def fit(lines, budget):
+    """
+    Lines kept within `budget` tokens, in their original order: entry lines
+    first, then descriptions cut to DESCRIPTION_CHARS. Returns (lines, dropped).
+    """
+    kept = {}
+    used = 0
+    entries = [i for i, line in enumerate(lines) if len(line) <= ENTRY_LINE_CHARS]
+    descriptions = [i for i, line in enumerate(lines) if len(line) > ENTRY_LINE_CHARS]
+    for indices, shorten in ((entries, False), (descriptions, True)):
+        for i in indices:
+            line = lines[i]
+            if shorten:
+                line = line[:DESCRIPTION_CHARS].rsplit(" ", 1)[0] + " ..."
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                continue
+            kept[i] = line
+            used += cost
+    return [kept[i] for i in sorted(kept)], len(lines) - len(kept)
+
+
+def trim_cv(text, budgets=None):
+    """
+    CV text reduced to what the extraction prompt needs. Returns
+    (text, report) with the estimated tokens before and after and the
+    tokens kept per section. Text without any recognised education,
+    experience, publications or awards heading is cut to the sum of the
+    budgets, entry lines first.
+    """
+    budgets = SECTION_TOKENS if budgets is None else {**SECTION_TOKENS, **budgets}
+    sections = segment(text)
+    targets = {"education", "experience", "publications", "awards"}
+    if not any(kind in targets for kind, _, _ in sections):
+        lines = [line for _, heading, body in sections for line in ([heading] if heading else []) + body]
+        sections = [("unsectioned", None, lines)]
+        budgets = {"unsectioned": sum(v for k, v in budgets.items() if k != "ignored")}
+
+    remaining = dict(budgets)   # a budget covers every section of that kind
+    out, kept_tokens = [], {}
+    for kind, heading, body in sections:
+        key = kind if kind in remaining else "other"
+        lines, dropped = fit(body, remaining[key])
+        tokens = sum(estimate_tokens(line) for line in lines)
+        remaining[key] -= tokens
+        if heading and (lines or dropped) and budgets.get(kind, 1):
+            out.append(heading)
+        out += lines
+        if dropped and budgets.get(kind, 1):
+            out.append(TRIMMED_MARK)
+        kept_tokens[kind] = kept_tokens.get(kind, 0) + tokens
+
+    trimmed = "\n".join(out)
+    report = {"tokens_before": estimate_tokens(text), "tokens_after": estimate_tokens(trimmed),
+              "sections": kept_tokens}
+    return trimmed, report
+
+
+def prompt_text(text):
+    """`trim_cv(text)` when PROMPT_TRIM is on, counting prompt tokens before and after."""
+    if not PROMPT_TRIM:
+        return text
+    trimmed, report = trim_cv(text)
+    PROMPT_TOKENS.inc(report["tokens_before"], text="raw")
+    PROMPT_TOKENS.inc(report["tokens_after"], text="trimmed")
+    return trimmed
@@ -0,0 +1,353 @@
+import hashlib, json, os, sqlite3, threading, time
+from datetime import datetime
+import numpy as np
+from app.batch_scoring import CandidateColumns
+from app.search import get_search_index, semantic_similarity
+
+# Candidate store settings (override in .env)
+STORE_PATH = os.getenv("CANDIDATE_STORE_PATH", "cvs_data/store/candidates.sqlite")
+STORE_MMAP_MB = int(os.getenv("CANDIDATE_STORE_MMAP_MB", 1024))
+STORE_ENABLED = os.getenv("CANDIDATE_STORE_ENABLED", "1") != "0"
+
+FETCH_ROWS = 10000  # rows per fetchmany when streaming large result sets
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id INTEGER PRIMARY KEY, key TEXT UNIQUE, name TEXT, source TEXT,
+    scorable INTEGER, data TEXT, added REAL);
+CREATE TABLE IF NOT EXISTS education (
+    candidate_id INTEGER, degree TEXT, degree_lc TEXT, field TEXT, university TEXT,
+    country TEXT, start TEXT, end TEXT, gpa REAL, scale REAL);
+CREATE TABLE IF NOT EXISTS experience (
+    candidate_id INTEGER, title TEXT, org TEXT, start TEXT, end TEXT,
+    start_ym INTEGER, end_ym INTEGER, domain TEXT, domain_lc TEXT);
+CREATE TABLE IF NOT EXISTS publications (
+    candidate_id INTEGER, title TEXT, venue TEXT, year INTEGER, type TEXT,
+    author_position INTEGER, journal_if REAL, domain TEXT);
+CREATE TABLE IF NOT EXISTS awards (
+    candidate_id INTEGER, title TEXT, issuer TEXT, year INTEGER, type TEXT);
+CREATE INDEX IF NOT EXISTS education_candidate ON education(candidate_id);
+CREATE INDEX IF NOT EXISTS experience_candidate ON experience(candidate_id);
+CREATE INDEX IF NOT EXISTS publications_candidate ON publications(candidate_id);
+CREATE INDEX IF NOT EXISTS awards_candidate ON awards(candidate_id);
+CREATE INDEX IF NOT EXISTS candidates_added ON candidates(added);
+"""
+
+CHILD_TABLES = ("education", "experience", "publications", "awards")
+
+# Months of one experience entry, same rules as scoring.calculate_months:
+# unparseable dates count 0, a missing end date means "now".
+MONTHS_SQL = "CASE WHEN start_ym IS NULL THEN 0 ELSE MAX(COALESCE(end_ym, :now) - start_ym, 0) END"
+
+
+def month_index(value):
+    """'2020-03...' -> months since year 0; raises ValueError like strptime."""
+    d = datetime.strptime(value[:7], "%Y-%m")
+    return d.year * 12 + d.month - 1
+
+def current_month():
+    now = datetime.now()
+    return now.year * 12 + now.month - 1
+
+def experience_months(start, end):
+    """(start_ym, end_ym) for an experience entry; start_ym None means 0 months."""
+    try:
+        if not start:
+            return None, None
+        return month_index(start), month_index(end) if end else None
+    except Exception:
+        return None, None
+
+def number(value):
+    return float(value) if isinstance(value, (int, float)) else None
+
+def cv_key(cv):
+    """Default store key: the CV's content, so re-uploading the same CV updates one row."""
+    return hashlib.sha256(json.dumps(cv, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def is_scorable(cv):
+    """False for CVs that score_cv rejects whatever the config (bad field types)."""
+    try:
+        for e in cv.get("education", []):
+            if "gpa" in e and not isinstance(e["gpa"], (int, float)):
+                return False
+            u = e.get("university", "Unknown")
+            if u is not None and not isinstance(u, str):
+                return False
+        for exp in cv.get("experience", []):
+            if not isinstance(exp.get("domain", ""), str):
+                return False
+        for pub in cv.get("publications", []):
+            if not isinstance(pub.get("venue", "Unknown"), str):
+                return False
+        len(cv.get("awards", []))
+    except Exception:
+        return False
+    return True
+
+
+class CandidateStore:
+    """
+    Persistent store of structured CVs. The raw JSON is kept per candidate
+    and education, experience, publications and awards are flattened into
+    their own tables, so filters and scoring inputs come straight from SQL
+    (memory-mapped reads) instead of loading every CV into Python dicts.
+    Adding a CV under an existing key replaces it.
+    """
+
+    def __init__(self, path=STORE_PATH, mmap_mb=STORE_MMAP_MB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(f"PRAGMA mmap_size={int(mmap_mb) * 1024 * 1024}")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    # ---------------------- writes ----------------------
+    def add_many(self, cvs, source=None, keys=None):
+        """Insert or replace CVs in one transaction; returns their candidate ids."""
+        ids = []
+        now = time.time()
+        with self.lock, self.db:
+            for i, cv in enumerate(cvs):
+                key = keys[i] if keys is not None else cv_key(cv)
+                ids.append(self._upsert(key, cv, source, now))
+        return ids
+
+    def add(self, cv, source=None, key=None):
+        return self.add_many([cv], source, None if key is None else [key])[0]
+
+    def _upsert(self, key, cv, source, now):
+        db = self.db
+        row = db.execute("SELECT id FROM candidates WHERE key = ?", (key,)).fetchone()
+        values = (cv.get("name"), source, int(is_scorable(cv)),
+                  json.dumps(cv, ensure_ascii=False, default=str), now)
+        if row is None:
+            cid = db.execute(
+                "INSERT INTO candidates (key, name, source, scorable, data, added) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, *values)).lastrowid
+        else:
+            cid = row[0]
+            db.execute("UPDATE candidates SET name = ?, source = ?, scorable = ?, data = ?, added = ? "
+                       "WHERE id = ?", (*values, cid))
+            for table in CHILD_TABLES:
+                db.execute(f"DELETE FROM {table} WHERE candidate_id = ?", (cid,))
+
+        def text(v):
+            return v if isinstance(v, str) else None
+
+        db.executemany("INSERT INTO education VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (cid, text(e.get("degree")), str(e.get("degree", "")).lower(), text(e.get("field")),
+             text(e.get("university", "Unknown")), text(e.get("country")), text(e.get("start")), text(e.get("end")),
+             number(e.get("gpa")), number(e.get("scale")))
+            for e in cv.get("education", []) if isinstance(e, dict)])
+        db.executemany("INSERT INTO experience VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (cid, text(x.get("title")), text(x.get("org")), text(x.get("start")), text(x.get("end")),
+             *experience_months(x.get("start"), x.get("end")),
+             text(x.get("domain")), (text(x.get("domain")) or "").lower())
+            for x in cv.get("experience", []) if isinstance(x, dict)])
+        db.executemany("INSERT INTO publications VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            (cid, text(p.get("title")), text(p.get("venue", "Unknown")), number(p.get("year")), text(p.get("type")),
+             number(p.get("author_position")), number(p.get("journal_if")), text(p.get("domain")))
+            for p in cv.get("publications", []) if isinstance(p, dict)])
+        # every award counts towards the score, so a bare string is kept as its title
+        db.executemany("INSERT INTO awards VALUES (?, ?, ?, ?, ?)", [
+            (cid, text(a.get("title")), text(a.get("issuer")), number(a.get("year")), text(a.get("type")))
+            if isinstance(a, dict) else (cid, text(a), None, None, None)
+            for a in cv.get("awards", [])])
+        return cid
+
+    def delete(self, key):
+        with self.lock, self.db:
+            row = self.db.execute("SELECT id FROM candidates WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            for table in CHILD_TABLES:
+                self.db.execute(f"DELETE FROM {table} WHERE candidate_id = ?", (row[0],))
+            self.db.execute("DELETE FROM candidates WHERE id = ?", (row[0],))
+        return True
+
+    # ---------------------- reads ----------------------
+    def query(self, degree=None, domain=None, min_months=None, venue=None, limit=None):
+        """
+        Ids of candidates matching every given filter: a degree containing
+        `degree`, more than `min_months` of experience (in `domain` if given),
+        a publication whose venue contains `venue`. Case-insensitive; runs as
+        set operations in SQL, e.g. query(degree="phd", domain="nlp", min_months=24).
+        """
+        parts, params = [], {"now": current_month()}
+        if degree:
+            parts.append("SELECT candidate_id FROM education WHERE degree_lc LIKE :degree")
+            params["degree"] = f"%{degree.lower()}%"
+        if domain or min_months is not None:
+            where = "WHERE domain_lc LIKE :domain" if domain else ""
+            parts.append(f"SELECT candidate_id FROM experience {where} GROUP BY candidate_id "
+                         f"HAVING SUM({MONTHS_SQL}) > :min_months")
+            params["domain"] = f"%{(domain or '').lower()}%"
+            params["min_months"] = min_months if min_months is not None else -1
+        if venue:
+            parts.append("SELECT candidate_id FROM publications WHERE venue LIKE :venue")
+            params["venue"] = f"%{venue}%"
+        sql = " INTERSECT ".join(parts) if parts else "SELECT id FROM candidates"
+        sql += " ORDER BY 1"
+        if limit is not None:
+            sql += " LIMIT :limit"
+            params["limit"] = int(limit)
+        with self.lock:
+            return np.fromiter((r[0] for r in self.db.execute(sql, params)), dtype=np.int64)
+
+    def get_many(self, ids):
+        """(id, cv) for each of `ids` still in the store, in the same order; missing ids are skipped."""
+        out = {}
+        with self.lock:
+            for start in range(0, len(ids), 500):
+                chunk = [int(i) for i in ids[start:start + 500]]
+                marks = ",".join("?" * len(chunk))
+                for cid, data in self.db.execute(f"SELECT id, data FROM candidates WHERE id IN ({marks})", chunk):
+                    out[cid] = json.loads(data)
+        return [(int(i), out[int(i)]) for i in ids if int(i) in out]
+
+    def names(self, ids):
+        """{id: name} for the `ids` that exist."""
+        ids = [int(i) for i in ids]
+        with self.lock:
+            return dict(self.db.execute(
+                f"SELECT id, name FROM candidates WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall())
+
+    def changed_since(self, timestamp, limit=None):
+        """
+        (id, cv) of candidates added or updated after `timestamp`, most
+        recent first; at most `limit` of them.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT id, data FROM candidates WHERE added > ? ORDER BY added DESC, id "
+                                   "LIMIT ?", (timestamp, -1 if limit is None else int(limit))).fetchall()
+        return [(cid, json.loads(data)) for cid, data in rows]
+
+    def count_changed_since(self, timestamp):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM candidates WHERE added > ?", (timestamp,)).fetchone()[0]
+
+    def iter_cvs(self):
+        """Stream every stored CV as (id, cv) without holding them all in memory."""
+        cur = self.db.cursor()
+        with self.lock:
+            cur.execute("SELECT id, data FROM candidates ORDER BY id")
+            rows = cur.fetchmany(FETCH_ROWS)
+        while rows:
+            for cid, data in rows:
+                yield cid, json.loads(data)
+            with self.lock:
+                rows = cur.fetchmany(FETCH_ROWS)
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def info(self):
+        with self.lock:
+            counts = {t: self.db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                      for t in ("candidates",) + CHILD_TABLES}
+        return counts
+
+    def columns(self, scorer, ids=None):
+        """
+        Build `CandidateColumns` for a `BatchScorer` straight from the
+        flattened tables. Returns (ids, cols) with rows in id order; `ids`
+        restricts the pool (e.g. the result of `query`).
+        """
+        matcher = scorer.matcher
+        with self.lock:
+            db = self.db
+            db.execute("DROP TABLE IF EXISTS temp.pool")
+            if ids is None:
+                db.execute("CREATE TEMP TABLE pool AS SELECT id FROM candidates")
+            else:
+                db.execute("CREATE TEMP TABLE pool (id INTEGER PRIMARY KEY)")
+                db.executemany("INSERT OR IGNORE INTO pool VALUES (?)", ((int(i),) for i in ids))
+            rows = db.execute("SELECT c.id, c.scorable FROM candidates c JOIN pool USING (id) ORDER BY c.id").fetchall()
+            pool_ids = np.array([r[0] for r in rows], dtype=np.int64)
+            cols = CandidateColumns(len(pool_ids))
+            cols.valid[:] = [bool(r[1]) for r in rows]
+
+            def row_of(cids):
+                return np.searchsorted(pool_ids, np.asarray(cids, dtype=np.int64))
+
+            # EDUCATION: one row per entry, grouped by candidate
+            edu = db.execute(
+                "SELECT e.candidate_id, e.degree_lc, e.university, e.gpa FROM education e "
+                "JOIN pool p ON p.id = e.candidate_id ORDER BY e.candidate_id, e.rowid").fetchall()
+            cols.edu_owner = row_of([r[0] for r in edu]) if edu else np.zeros(0, dtype=np.int64)
+            cols.edu_degree = np.array([matcher.degree(r[1]) for r in edu], dtype=float)
+            cols.edu_tier = np.array([matcher.university(r[2]) for r in edu], dtype=float)
+            cols.edu_gpa = np.array([scorer.missing_gpa if r[3] is None else r[3] for r in edu], dtype=float)
+
+            # EXPERIENCE: months and domain match aggregated in SQL
+            exp = db.execute(
+                f"SELECT candidate_id, SUM({MONTHS_SQL}), MAX(instr(domain_lc, :domain) > 0) FROM experience "
+                "JOIN pool p ON p.id = candidate_id GROUP BY candidate_id",
+                {"now": current_month(), "domain": scorer.domain}).fetchall()
+            if exp:
+                idx = row_of([r[0] for r in exp])
+                cols.months[idx] = [r[1] for r in exp]
+                cols.domain[idx] = [r[2] for r in exp]
+
+            # PUBLICATIONS: best venue per candidate
+            best = {}
+            for cid, venue in db.execute(
+                    "SELECT candidate_id, venue FROM publications JOIN pool p ON p.id = candidate_id"):
+                if venue is None:
+                    continue  # only unscorable CVs have non-string venues
+                v = matcher.venue(venue)
+                if v > best.get(cid, 0):
+                    best[cid] = v
+            if best:
+                cols.best_pub[row_of(list(best))] = list(best.values())
+
+            # AWARDS
+            awards = db.execute("SELECT candidate_id, COUNT(*) FROM awards "
+                                "JOIN pool p ON p.id = candidate_id GROUP BY candidate_id").fetchall()
+            if awards:
+                cols.awards[row_of([r[0] for r in awards])] = [min(r[1] * 0.5, 1.0) for r in awards]
+            db.execute("DROP TABLE temp.pool")
+        if scorer.job_description and len(pool_ids):
+            cols.semantic = self.semantic_column(pool_ids, scorer.job_description)
+        return pool_ids, cols
+
+    def semantic_column(self, ids, job_description):
+        """
+        `semantic_similarity` for stored candidates: read from the search
+        index where its vector is current, encoded from the stored CV for
+        candidates added or updated since the last build.
+        """
+        sims = np.full(len(ids), np.nan)
+        index = get_search_index()
+        if index is not None:
+            sims = np.clip(index.similarities(ids, job_description), 0, 1)
+            with self.lock:
+                changed = [r[0] for r in self.db.execute("SELECT id FROM candidates WHERE added > ?",
+                                                         (index.meta["built"],))]
+            if changed:
+                sims[np.isin(ids, changed)] = np.nan
+        missing = np.flatnonzero(np.isnan(sims))
+        if missing.size:
+            found = self.get_many(ids[missing])
+            # candidates deleted since `ids` was read have no CV left to encode
+            sims[missing] = 0
+            if found:
+                row = {cid: r for r, cid in zip(missing, ids[missing])}
+                sims[[row[cid] for cid, _ in found]] = semantic_similarity([cv for _, cv in found], job_description)
+        return sims
+
+
+_store = None
+
+def get_store():
+    """Shared store instance, or None when disabled via CANDIDATE_STORE_ENABLED=0."""
+    global _store
+    if _store is None and STORE_ENABLED:
+        _store = CandidateStore()
+    return _store
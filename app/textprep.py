@@ -0,0 +1,134 @@
+"""
+Text preprocessing shared by the server (app/parser.py) and cv_pipeline.py:
+Unicode normalization, PII redaction, whitespace cleanup and language
+detection on a bounded sample.
+"""
+import os, re, unicodedata
+
+# Bump when the output of `preprocess` changes so cached texts are redone
+PREP_VERSION = "2"
+LANG_SAMPLE_CHARS = int(os.getenv("LANG_SAMPLE_CHARS", 3000))
+
+# Typographic characters NFKC leaves alone
+TYPOGRAPHY = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u2033": '"',
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "-", "\u2015": "-",
+    "\u2212": "-",
+    "\u2022": "-", "\u25cf": "-", "\u25aa": "-", "\uf0b7": "-",   # bullets, incl. Word's private-use one
+    "\u00a0": " ", "\u2009": " ", "\u202f": " ",
+    "\u00ad": "", "\u200b": "", "\u200c": "", "\u200d": "", "\ufeff": "",
+}
+TYPOGRAPHY_TABLE = str.maketrans(TYPOGRAPHY)
+
+# PII detectors. Each scan starts from a literal or a digit run, which the
+# regex engine finds quickly; the exact pattern then only runs around it.
+EMAIL_DOMAIN_RE = re.compile(r"@[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}\b")
+EMAIL_LOCAL_RE = re.compile(r"[\w.+-]+$")
+URL_RE = re.compile(r"(?:https?://|www\.|linkedin\.com/|github\.com/)[^\s<>\"')\]]+")
+STREET_TYPES = ("Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way|Place|Pl|"
+                "Square|Sq|Terrace|Parkway|Pkwy|Highway|Hwy|Strasse|Straße|Str|Rue|Via|Calle")
+STREET_RE = re.compile(r"(?:" + STREET_TYPES + r")\b")
+# house number, up to three capitalized words, street type
+ADDRESS_RE = re.compile(r"\b\d{1,5}[a-zA-Z]?(?:,? +[A-Z][\w.'-]*){1,3},? +(?:" + STREET_TYPES + r")\b\.?")
+DIGITS_RE = re.compile(r"\d[\d ().-]{7,}\d")
+PHONE_RE = re.compile(r"(?<![\w+])(?:\+|00)?(?:\(\d{1,4}\)|\d{1,4})(?:[ .-]?(?:\(\d{1,4}\)|\d{1,4})){1,6}(?!\w)")
+DIGIT_GROUP_RE = re.compile(r"\d+")
+YEARS_RE = re.compile(r"(?:(?:19|20)\d\d[ .-]?)+")
+NUMERIC_DATE_RE = re.compile(r"(?:19|20)\d\d[./-]\d{1,2}[./-]\d{1,2}|\d{1,2}[./-]\d{1,2}[./-](?:19|20)?\d\d")
+# numbers labelled as something else; "Phone No." is still a phone
+IDENTIFIER_RE = re.compile(r"\b(?:isbn|issn|doi|orcid|arxiv|id|no|nr|number|grant|ref|pp|pages?|vol)\W{0,3}$",
+                           re.IGNORECASE)
+PHONE_LABEL_RE = re.compile(r"\b(?:phone|tel|telephone|mobile|mob|cell|contact|fax|whatsapp)\b", re.IGNORECASE)
+
+
+def normalize_text(text):
+    """NFKC plus typographic quotes, dashes, bullets and spaces to ASCII."""
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKC", text)
+    return text.translate(TYPOGRAPHY_TABLE)
+
+
+def _is_phone(text, start, end):
+    """
+    7-15 digits (E.164) after a phone label ("Mobile:") or in a phone shape:
+    a leading "+", "00" or "(", or at least three separated digit groups.
+    Bare digit runs (student IDs, grant numbers), two-group page ranges,
+    year lists, numeric dates and numbers labelled ID/No./grant/ISBN/...
+    are kept.
+    """
+    number = text[start:end]
+    groups = DIGIT_GROUP_RE.findall(number)
+    if not 7 <= sum(map(len, groups)) <= 15:
+        return False
+    before = text[max(0, start - 30):start]
+    if PHONE_LABEL_RE.search(before):
+        return True
+    if not (number[0] in "+(" or number.startswith("00") or len(groups) >= 3):
+        return False
+    return not (YEARS_RE.fullmatch(number) or NUMERIC_DATE_RE.fullmatch(number)
+                or IDENTIFIER_RE.search(before))
+
+def pii_spans(text):
+    """(start, end, kind) of emails, URLs, street addresses and phone numbers, unordered."""
+    if "@" in text:
+        for m in EMAIL_DOMAIN_RE.finditer(text):
+            local = EMAIL_LOCAL_RE.search(text, max(0, m.start() - 64), m.start())
+            if local:
+                yield local.start(), m.end(), "EMAIL"
+    if "://" in text or "www." in text or ".com/" in text:
+        for m in URL_RE.finditer(text):
+            yield m.start(), m.end(), "URL"
+    for m in STREET_RE.finditer(text):
+        line = text.rfind("\n", 0, m.start()) + 1
+        for a in ADDRESS_RE.finditer(text, max(line, m.start() - 120), min(m.end() + 1, len(text))):
+            if a.end() >= m.end():
+                yield a.start(), a.end(), "ADDRESS"
+    for m in DIGITS_RE.finditer(text):
+        # a leading "+" or "(" belongs to the number; endpos + 1 lets (?!\w) see the next character
+        start = m.start() - (m.start() > 0 and text[m.start() - 1] in "+(")
+        for p in PHONE_RE.finditer(text, start, m.end() + 1):
+            if _is_phone(text, *p.span()):
+                yield p.start(), p.end(), "PHONE"
+
+def redact_pii(text):
+    """Replace emails, URLs, street addresses and phone numbers (international formats)."""
+    out, pos = [], 0
+    for start, end, kind in sorted(pii_spans(text), key=lambda s: (s[0], -s[1])):
+        if start < pos:
+            continue   # inside an earlier match, e.g. digits in a URL
+        out += (text[pos:start], f"[REDACTED_{kind}]")
+        pos = end
+    if not out:
+        return text
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def clean_whitespace(text):
+    """Collapse whitespace within lines, trim lines and drop blank ones."""
+    return "\n".join(filter(None, map(" ".join, map(str.split, text.splitlines()))))
+
+
+def preprocess(text):
+    """Normalize, redact and clean CV text before it goes to the LLM."""
+    return clean_whitespace(redact_pii(normalize_text(text)))
+
+
+def language_sample(text, size=LANG_SAMPLE_CHARS):
+    """Up to `size` characters from the start, middle and end of `text`."""
+    if len(text) <= size:
+        return text
+    part = size // 3
+    mid = len(text) // 2
+    return " ".join((text[:part], text[mid - part // 2:mid + part // 2], text[-part:]))
+
+def detect_language(text):
+    """ISO 639-1 code of `text` from a bounded sample (deterministic), or "unknown"."""
+    from langdetect import DetectorFactory, detect
+    DetectorFactory.seed = 0
+    try:
+        return detect(language_sample(text))
+    except Exception:
+        return "unknown"
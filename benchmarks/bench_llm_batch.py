@@ -0,0 +1,72 @@
+"""
+Batched vs one-CV-per-request extraction against a local stub LLM.
+
+    python -m benchmarks.bench_llm_batch --cvs 200 --latency 0.2
+"""
+import argparse, asyncio, json, random, re, time
+from app.llm_batch import LLMBatcher
+
+CV_RE = re.compile(r"<<<CV (\d+)>>>\nCV Filename: (.*?)\n")
+SINGLE_RE = re.compile(r"CV Filename: (.*?)\n")
+
+
+class StubLLM:
+    """
+    Answers extraction prompts locally. Each request costs `latency`
+    seconds, requests are limited to `concurrency` at a time (like a rate
+    limit) and a fraction of batched results are dropped to exercise the
+    per-CV retry path.
+    """
+
+    def __init__(self, latency, concurrency, drop_rate, seed=0):
+        self.latency = latency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+
+    @staticmethod
+    def cv(filename):
+        return {"name": filename, "education": [{"degree": "PhD", "university": "MIT", "gpa": 3.9}],
+                "experience": [], "publications": [], "awards": []}
+
+    async def generate(self, prompt):
+        async with self.slots:
+            await asyncio.sleep(self.latency)
+        batch = CV_RE.findall(prompt)
+        if not batch:
+            return json.dumps(self.cv(SINGLE_RE.search(prompt).group(1)))
+        return "\n".join(
+            f"<<<RESULT {i}>>>\n{json.dumps(self.cv(name))}\n<<<END {i}>>>"
+            for i, name in batch if self.rng.random() >= self.drop_rate)
+
+
+async def run(items, args, max_items):
+    stub = StubLLM(args.latency, args.concurrency, args.drop_rate)
+    batcher = LLMBatcher(stub.generate, max_tokens=args.max_tokens, max_items=max_items)
+    t0 = time.perf_counter()
+    results = await batcher.extract_many(items)
+    elapsed = time.perf_counter() - t0
+    ok = sum(1 for r in results if isinstance(r, dict))
+    return elapsed, ok, batcher.stats.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cvs", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=4000, help="CV text length")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stub request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=8000)
+    parser.add_argument("--max-cvs", type=int, default=8)
+    parser.add_argument("--drop-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    items = [("lorem ipsum " * (args.chars // 12), f"cv{i}.pdf") for i in range(args.cvs)]
+    for label, max_items in (("one CV per request", 1), ("batched", args.max_cvs)):
+        elapsed, ok, stats = asyncio.run(run(items, args, max_items))
+        print(f"{label}: {elapsed:.2f}s, {ok}/{args.cvs} ok, {ok / elapsed:.1f} CVs/s")
+        print(f"  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Rule-based extraction (app/local_extract.py) against the ground truth of
+synthetic CVs rendered in three layouts: the two the grammar was written
+against and an "unseen" one it was not. Reports time per CV, how many CVs
+clear LOCAL_MIN_CONFIDENCE (and so skip the LLM), field accuracy on those,
+and how far their scores are from the scores of the true CVs (or that
+scoring failed). About a third of the degrees are listed without a GPA.
+
+    python -m benchmarks.bench_local_extract --cvs 1000 --out local.json
+"""
+import argparse, json, random, time
+from app.local_extract import extract_local, LOCAL_MIN_CONFIDENCE
+from app.scoring import score_cv
+from benchmarks.corpus import synthetic_cv, cv_text
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def month_year(ym):
+    year, month = ym.split("-")
+    return f"{MONTHS[int(month) - 1]} {year}"
+
+
+def resume_text(cv, rng):
+    """The same CV in a second, resume-style layout: titled headings, "Mon YYYY" dates, titles above dates."""
+    lines = [cv["name"], "Curriculum Vitae", "", "Education"]
+    for e in cv["education"]:
+        gpa = f" | CGPA: {e['gpa']} out of 4" if "gpa" in e else ""
+        lines.append(f"{e['degree']}, {e['field']} | {e['university']} | "
+                     f"{month_year(e['start'])} – {month_year(e['end'])}{gpa}")
+    lines += ["", "Professional Experience"]
+    for x in cv["experience"]:
+        lines.append(f"{x['title']} at {x['org']}")
+        lines.append(f"{month_year(x['start'])} – {month_year(x['end'])}; {x['domain']}")
+        lines.append("• " + "Built and operated production systems. " * rng.randint(1, 4))
+    lines += ["", "Selected Publications"]
+    for p in cv["publications"]:
+        lines.append(f"{cv['name'].split()[-1]}, A. Other. \"{p['title']}.\" {p['venue']}, {p['year']}.")
+    lines += ["", "Honors & Awards"]
+    for a in cv["awards"]:
+        lines.append(f"- {a['title']} ({a['issuer']}, {a['year']})")
+    lines += ["", "Skills", "Python, SQL, Docker"]
+    return "\n".join(lines)
+
+
+def unseen_text(cv, rng):
+    """
+    A layout the grammar was not written against: dates before the entry,
+    organisation before title, the domain only in the job description,
+    year-only degree dates and venue-first references.
+    """
+    lines = [cv["name"].upper(), f"Email: {cv['name'].split()[0].lower()}@example.com", "", "ACADEMIC BACKGROUND"]
+    for e in cv["education"]:
+        gpa = f" (GPA {e['gpa']})" if "gpa" in e else ""
+        lines.append(f"{e['start'][:4]}–{e['end'][:4]}  {e['university']}: {e['degree']}, {e['field']}{gpa}")
+    lines += ["", "WORK HISTORY"]
+    for x in cv["experience"]:
+        lines.append(f"{x['start'].replace('-', '/')} to {x['end'].replace('-', '/')}  {x['org']} — {x['title']}")
+        lines.append(f"Worked on {x['domain']} projects. " + "Led a small team. " * rng.randint(1, 3))
+    lines += ["", "PAPERS"]
+    for p in cv["publications"]:
+        lines.append(f"{p['venue']} ({p['year']}): {p['title']}")
+    lines += ["", "ACHIEVEMENTS"]
+    for a in cv["awards"]:
+        lines.append(f"{a['year']} {a['title']}, {a['issuer']}")
+    return "\n".join(lines)
+
+
+def without_gpa(cv, rng):
+    """About a third of education entries lose their GPA, as on many real CVs."""
+    for e in cv["education"]:
+        if rng.random() < 0.3:
+            del e["gpa"], e["scale"]
+    return cv
+
+
+def field_accuracy(truth, got):
+    """(matching, total) over the fields the scorer reads."""
+    checks = []
+    for kind, fields in (("education", ("degree", "university", "start", "end", "gpa")),
+                         ("experience", ("title", "org", "start", "end", "domain")),
+                         ("publications", ("title", "venue", "year")),
+                         ("awards", ("title", "year"))):
+        checks.append(len(truth[kind]) == len(got[kind]))
+        for t, g in zip(truth[kind], got[kind]):
+            checks += [t.get(f) == g.get(f) or (f == "degree" and g[f] in t[f]) for f in fields]
+    return sum(checks), len(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cvs", type=int, default=1000)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    config = json.load(open("config.json"))
+    mappings = json.load(open("mappings.json"))
+    rng = random.Random(0)
+    results = {"cvs": args.cvs, "min_confidence": LOCAL_MIN_CONFIDENCE, "layouts": {}}
+    layouts = (("plain", lambda cv: cv_text(cv)), ("resume", lambda cv: resume_text(cv, rng)),
+               ("unseen", lambda cv: unseen_text(cv, rng)))
+    for layout, render in layouts:
+        cvs = [without_gpa(synthetic_cv(rng), rng) for _ in range(args.cvs)]
+        texts = [render(cv) for cv in cvs]
+        t0 = time.perf_counter()
+        extracted = [extract_local(t, mappings=mappings) for t in texts]
+        elapsed = time.perf_counter() - t0
+
+        accepted = right = checked = failed = 0
+        score_errors = []
+        for truth, (cv, confidence) in zip(cvs, extracted):
+            if confidence < LOCAL_MIN_CONFIDENCE:
+                continue
+            accepted += 1
+            r, n = field_accuracy(truth, cv)
+            right, checked = right + r, checked + n
+            try:
+                score_errors.append(abs(score_cv(cv, config, mappings) - score_cv(truth, config, mappings)))
+            except (TypeError, ValueError):
+                failed += 1   # /rank would drop this candidate
+        r = {
+            "ms_per_cv": round(1000 * elapsed / args.cvs, 3),
+            "accepted": accepted,
+            "field_accuracy": round(right / checked, 4) if checked else None,
+            "score_exact": sum(e < 0.005 for e in score_errors),
+            "max_score_error": round(max(score_errors), 2) if score_errors else None,
+            "score_failed": failed,
+        }
+        results["layouts"][layout] = r
+        print(f"{layout:>7}: {r['ms_per_cv']} ms per CV, {accepted}/{args.cvs} above confidence "
+              f"{LOCAL_MIN_CONFIDENCE}, field accuracy {r['field_accuracy']}, "
+              f"exact score {r['score_exact']}/{accepted}, max score error {r['max_score_error']}, "
+              f"scoring failed {failed}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Per-stage and end-to-end benchmarks on a synthetic corpus with a stub LLM.
+
+    python -m benchmarks.bench_pipeline --out benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --compare benchmarks/baseline.json --out /tmp/new.json
+
+Stages: text extraction (DOCX, text PDF, scanned PDF), LLM extraction
+(`extract_structured_cv` against a deterministic stub), `score_cv`, and
+POST /rank at 10/100/1000 CVs. Each stage runs in a fresh process so its
+peak RSS is its own. Results (throughput, p50/p99 latency, peak RSS) are
+written as JSON; --compare prints the change against an earlier run.
+"""
+import os
+
+# Isolate the benchmark from local caches, stores and logs; set before app imports
+for key, value in {"CV_CACHE_ENABLED": "0", "CANDIDATE_STORE_ENABLED": "0", "LLM_BATCH_TOKENS": "0",
+                   "LOG_LEVEL": "WARNING", "GOOGLE_API_KEY": ""}.items():
+    os.environ.setdefault(key, value)
+
+import argparse, asyncio, json, multiprocessing, platform, random, re, resource, shutil, subprocess
+import sys, tempfile, time, zlib
+import numpy as np
+from benchmarks.corpus import generate, make_zip, synthetic_cv
+
+FILENAME_RE = re.compile(r"CV Filename: (.*?)\n")
+
+
+class StubLLMClient:
+    """Stands in for AsyncLLMClient: a fixed delay, then a CV derived from the filename."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def generate(self, prompt, model, temperature=0):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = FILENAME_RE.search(prompt).group(1)
+        return json.dumps(synthetic_cv(random.Random(zlib.crc32(name.encode())), name=name))
+
+
+def install_stub(latency):
+    import app.llm as llm
+    llm.client = StubLLMClient(latency)
+
+
+def peak_rss_mb():
+    """
+    (own, children) peak RSS in MB; children are finished worker processes
+    such as the OCR pool. On Linux ru_maxrss survives fork+exec, so the
+    process's own peak is read from VmHWM instead.
+    """
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024   # bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    try:
+        with open("/proc/self/status") as f:
+            own = next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+    except (OSError, StopIteration):
+        pass
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own, 1), round(children, 1)
+
+
+def summarize(latencies, elapsed, items=None):
+    lat = np.asarray(latencies, dtype=float) * 1000
+    items = len(latencies) if items is None else items
+    return {
+        "n": items,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_per_s": round(items / elapsed, 2) if elapsed else None,
+        "p50_ms": round(float(np.percentile(lat, 50)), 3) if lat.size else None,
+        "p99_ms": round(float(np.percentile(lat, 99)), 3) if lat.size else None,
+    }
+
+
+# ---------------------- STAGES (each runs in its own process) ----------------------
+def stage_extract(paths):
+    from app.parser import extract_cv_from_file
+    latencies = []
+    t0 = time.perf_counter()
+    for p in paths:
+        s = time.perf_counter()
+        extract_cv_from_file(p)
+        latencies.append(time.perf_counter() - s)
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def stage_llm(paths, latency):
+    from app.parser import extract_cv_from_file
+    install_stub(latency)
+    from app.llm import extract_structured_cv
+    texts = [(extract_cv_from_file(p), os.path.basename(p)) for p in paths]
+
+    async def run():
+        async def one(text, name):
+            s = time.perf_counter()
+            await extract_structured_cv(text, name)
+            return time.perf_counter() - s
+        return await asyncio.gather(*(one(t, n) for t, n in texts))
+
+    t0 = time.perf_counter()
+    latencies = asyncio.run(run())
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def stage_score(jsonl_path):
+    from app.scoring import score_cv
+    config = json.load(open("config.json"))
+    mappings = json.load(open("mappings.json"))
+    cvs = [json.loads(line) for line in open(jsonl_path)]
+    latencies = []
+    t0 = time.perf_counter()
+    for cv in cvs:
+        s = time.perf_counter()
+        try:
+            score_cv(cv, config, mappings)
+        except Exception:
+            pass
+        latencies.append(time.perf_counter() - s)
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def stage_rank(zip_path, n_cvs, repeats, latency):
+    tmp = tempfile.mkdtemp()
+    os.environ["JOBS_DIR"] = os.path.join(tmp, "jobs")
+    install_stub(latency)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    data = {"config": open("config.json").read(), "mappings": open("mappings.json").read(), "top_k": "50"}
+    body = open(zip_path, "rb").read()
+    latencies = []
+    try:
+        with TestClient(app) as client:
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                s = time.perf_counter()
+                r = client.post("/rank", files={"cvs_zip": ("cvs.zip", body)}, data=data)
+                latencies.append(time.perf_counter() - s)
+                if r.status_code != 200:
+                    raise RuntimeError(f"/rank returned {r.status_code}: {r.text[:200]}")
+            elapsed = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    result = summarize(latencies, elapsed, items=n_cvs * repeats)
+    result["requests"] = repeats
+    return result
+
+
+def _run_stage(fn, args, queue):
+    try:
+        result = fn(*args)
+        result["peak_rss_mb"], result["children_peak_rss_mb"] = peak_rss_mb()
+        queue.put(result)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+def run_isolated(fn, *args):
+    """Run one stage in a fresh (spawned) interpreter so peak RSS is per stage."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_stage, args=(fn, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+# ---------------------- REPORTING ----------------------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def print_result(name, r):
+    if "error" in r or "skipped" in r:
+        print(f"  {name:<22} {r.get('error') or r.get('skipped')}")
+        return
+    print(f"  {name:<22} {r['throughput_per_s']:>10,.1f}/s  p50 {r['p50_ms']:>9.2f}ms  "
+          f"p99 {r['p99_ms']:>9.2f}ms  rss {r['peak_rss_mb']:>7.1f}MB")
+
+def compare(results, baseline):
+    print(f"\nvs baseline {baseline.get('meta', {}).get('commit')}:")
+    for section in ("stages", "end_to_end"):
+        for name, r in results[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old or "p50_ms" not in old or "p50_ms" not in r:
+                continue
+            def change(key):
+                return f"{(r[key] - old[key]) / old[key]:+.1%}" if old[key] else "n/a"
+            print(f"  {name:<22} throughput {change('throughput_per_s'):>8}  p50 {change('p50_ms'):>8}  "
+                  f"p99 {change('p99_ms'):>8}  rss {change('peak_rss_mb'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="corpus directory (default: a temp dir, generated)")
+    parser.add_argument("--docx", type=int, default=100)
+    parser.add_argument("--pdf", type=int, default=100)
+    parser.add_argument("--scanned", type=int, default=5)
+    parser.add_argument("--json", type=int, default=20000)
+    parser.add_argument("--sizes", default="10,100,1000", help="CVs per /rank request")
+    parser.add_argument("--repeats", type=int, default=3, help="/rank requests per size")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub LLM seconds per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmarks/baseline.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    corpus = args.corpus or tempfile.mkdtemp(prefix="cv_corpus_")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    # /rank zips reuse DOCX files, so make enough of them for the biggest request
+    n_docx = max(args.docx, max(sizes, default=0))
+    t0 = time.perf_counter()
+    files = generate(corpus, {"docx": n_docx, "pdf": args.pdf, "scanned": args.scanned, "json": args.json},
+                     args.seed)
+    print(f"Corpus in {corpus} ({time.perf_counter() - t0:.1f}s)")
+
+    stages = {}
+    stages["extract_docx"] = run_isolated(stage_extract, files["docx"][:args.docx])
+    stages["extract_pdf"] = run_isolated(stage_extract, files.get("pdf", []))
+    if not args.scanned:
+        stages["extract_scanned_pdf"] = {"skipped": "--scanned 0"}
+    elif shutil.which("tesseract"):
+        stages["extract_scanned_pdf"] = run_isolated(stage_extract, files["scanned"])
+    else:
+        stages["extract_scanned_pdf"] = {"skipped": "tesseract not installed"}
+    stages["llm_extract"] = run_isolated(stage_llm, files["docx"][:args.docx], args.llm_latency)
+    stages["score_cv"] = run_isolated(stage_score, files["json"][0])
+
+    end_to_end = {}
+    for n in sizes:
+        zip_path = make_zip(files["docx"][:n], os.path.join(corpus, f"rank_{n}.zip"))
+        end_to_end[f"rank_{n}"] = run_isolated(stage_rank, zip_path, n, args.repeats, args.llm_latency)
+
+    print("\nStages:")
+    for name, r in stages.items():
+        print_result(name, r)
+    print("End to end (POST /rank, throughput in CVs/s, latency per request):")
+    for name, r in end_to_end.items():
+        print_result(name, r)
+
+    results = {
+        "meta": {
+            "commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "args": vars(args),
+        },
+        "stages": stages,
+        "end_to_end": end_to_end,
+    }
+    if args.compare:
+        compare(results, json.load(open(args.compare)))
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+    if not args.corpus:
+        shutil.rmtree(corpus, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare per-candidate `score_cv` with the vectorized BatchScorer.
+
+    python -m benchmarks.bench_scoring --candidates 50000 --configs 16
+"""
+import argparse, json, random, time
+import numpy as np
+from app.scoring import score_cv
+from app.batch_scoring import BatchScorer
+from benchmarks.corpus import synthetic_cv
+
+
+def perturbed_configs(config, m, rng):
+    configs = []
+    for _ in range(m):
+        c = json.loads(json.dumps(config))
+        for k in c["weights"]:
+            c["weights"][k] = round(rng.uniform(0, 1), 2)
+        for k in c["subweights"]["education"]:
+            c["subweights"]["education"][k] = round(rng.uniform(0, 1), 2)
+        configs.append(c)
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=50000)
+    parser.add_argument("--configs", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    config = json.load(open("config.json"))
+    mappings = json.load(open("mappings.json"))
+    cvs = [synthetic_cv(rng) for _ in range(args.candidates)]
+    configs = perturbed_configs(config, args.configs, rng)
+
+    t0 = time.perf_counter()
+    expected = np.array([[score_cv(cv, c, mappings) for c in configs] for cv in cvs])
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scorer = BatchScorer(mappings, config["policies"])
+    cols = scorer.columns(cvs)
+    t_columns = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = scorer.score(cols, configs)
+    t_score = time.perf_counter() - t0
+
+    diff = np.abs(got - expected)
+    n_scores = args.candidates * args.configs
+    print(f"{args.candidates} candidates x {args.configs} configs ({n_scores} scores)")
+    print(f"  score_cv loop:      {t_loop:8.3f}s  ({n_scores / t_loop:,.0f} scores/s)")
+    print(f"  batch columns:      {t_columns:8.3f}s  (once per pool)")
+    print(f"  batch score:        {t_score:8.3f}s  ({n_scores / t_score:,.0f} scores/s)")
+    print(f"  speedup (score):    {t_loop / t_score:8.1f}x")
+    print(f"  exact matches:      {np.mean(diff == 0):.4%}, max abs diff {diff.max():.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Prompt-size reduction from section-aware trimming (app/sections.py) on
+synthetic CVs padded the way real ones are: skill clouds, references,
+running page headers, OCR debris and long job descriptions. Reports the
+estimated CV tokens before and after, the time per CV, and how many of
+the entries the scorer uses (degrees, jobs, publications, awards) are
+still in the trimmed text.
+
+    python -m benchmarks.bench_sections --cvs 1000 --out sections.json
+"""
+import argparse, json, random, time
+from app.sections import trim_cv
+from benchmarks.corpus import synthetic_cv, cv_text
+
+SKILLS = ["Python", "C++", "Java", "SQL", "TensorFlow", "PyTorch", "Docker", "Kubernetes", "Spark",
+          "Git", "Linux", "AWS", "GCP", "Excel", "Tableau", "scikit-learn", "Pandas", "NumPy"]
+NOISE = ["|| ~~ ##", "_ - . _ -", "~ ' , ; :", "Page 1 of 3", "2 / 3"]
+
+
+def padded_text(cv, rng):
+    lines = [cv["name"] + " - Curriculum Vitae"] + cv_text(cv, filler=rng.randint(2, 8)).split("\n")
+    lines += ["", "PROFILE", "Motivated researcher " * rng.randint(5, 20),
+              "", "TECHNICAL SKILLS", ", ".join(rng.choices(SKILLS, k=rng.randint(40, 150))),
+              "", "LANGUAGES", "English (native), French (B2), German (A2)",
+              "", "REFERENCES"]
+    lines += [f"Prof. Referee {i}, Some University, referee{i}@example.edu" for i in range(3)]
+    lines.append("Available upon request")
+    # a running header and OCR debris every ~40 lines, as on multi-page scans
+    for pos in range(len(lines), 0, -40):
+        lines[pos:pos] = [cv["name"] + " - Curriculum Vitae", rng.choice(NOISE)]
+    return "\n".join(lines)
+
+
+def entry_lines(cv):
+    """Substrings identifying each entry the scorer reads."""
+    keys = [f"{e['degree']} in {e['field']}, {e['university']}" for e in cv["education"]]
+    keys += [f"{x['title']}, {x['org']} ({x['start']} - {x['end']})" for x in cv["experience"]]
+    keys += [f"{p['title']}. {p['venue']}, {p['year']}." for p in cv["publications"]]
+    keys += [f"{a['title']}, {a['issuer']} {a['year']}" for a in cv["awards"]]
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cvs", type=int, default=1000)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cvs = [synthetic_cv(rng) for _ in range(args.cvs)]
+    texts = [padded_text(cv, rng) for cv in cvs]
+
+    before = after = kept = total = 0
+    t0 = time.perf_counter()
+    trimmed = [trim_cv(t) for t in texts]
+    elapsed = time.perf_counter() - t0
+    for cv, (text, report) in zip(cvs, trimmed):
+        before += report["tokens_before"]
+        after += report["tokens_after"]
+        keys = entry_lines(cv)
+        kept += sum(k in text for k in keys)
+        total += len(keys)
+
+    results = {
+        "cvs": args.cvs,
+        "tokens_before": before,
+        "tokens_after": after,
+        "reduction": round(1 - after / before, 3),
+        "ms_per_cv": round(1000 * elapsed / args.cvs, 3),
+        "entries_kept": kept,
+        "entries_total": total,
+    }
+    print(f"{args.cvs} CVs: ~{before / args.cvs:.0f} -> ~{after / args.cvs:.0f} tokens per CV "
+          f"({100 * results['reduction']:.0f}% less), {results['ms_per_cv']} ms per CV")
+    print(f"entries kept: {kept}/{total}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
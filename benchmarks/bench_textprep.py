@@ -0,0 +1,113 @@
+"""
+Text preprocessing throughput (MB/s) on synthetic CV text with PII mixed in:
+the previous cv_pipeline.py helpers vs app/textprep.py, plus language
+detection on the full text vs a bounded sample.
+
+    python -m benchmarks.bench_textprep --cvs 2000 --out textprep.json
+"""
+import argparse, json, random, re, time, unicodedata
+from app.textprep import normalize_text, redact_pii, clean_whitespace, preprocess, language_sample
+from benchmarks.corpus import synthetic_cv, cv_text
+
+
+# cv_pipeline.py before app/textprep.py, kept here as the baseline
+def legacy_redact_pii(text):
+    text = re.sub(r'\b[\w\.-]+@[\w\.-]+\.\w+\b', '[REDACTED_EMAIL]', text)
+    text = re.sub(r'\b\d{10,}\b', '[REDACTED_PHONE]', text)
+    return text
+
+def legacy_normalize_text(text):
+    text = unicodedata.normalize("NFKC", text)
+    replacements = {
+        "‘": "'", "’": "'", "“": '"', "”": '"',
+        "–": "-", "—": "-"
+    }
+    for k, v in replacements.items():
+        text = text.replace(k, v)
+    return text
+
+def legacy_clean_whitespace(text):
+    text = re.sub(r'\n\s*\n', '\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return text.strip()
+
+def legacy_preprocess(text):
+    return legacy_clean_whitespace(legacy_normalize_text(legacy_redact_pii(text)))
+
+
+PII = ["jane.doe{i}@example.com", "+1 (555) 010-{i:04d}", "+44 20 7946 {i:04d}", "06 12 34 {i:02d} 78",
+       "https://www.linkedin.com/in/candidate-{i}", "{i} Baker Street, London"]
+TYPOGRAPHY = ["“led”", "2015–2019", "• ", "café", " ", "ﬁnance"]
+
+
+def corpus(n, seed=0):
+    """`n` CV texts; a third contain typographic (non-ASCII) characters."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        lines = cv_text(synthetic_cv(rng)).split("\n")
+        for template in rng.sample(PII, 3):
+            lines.insert(rng.randrange(len(lines) + 1), "Contact:  " + template.format(i=i % 100))
+        if i % 3 == 0:
+            lines = [line + " " + rng.choice(TYPOGRAPHY) for line in lines]
+        texts.append("\n\n".join(lines) + "\n   \n")
+    return texts
+
+
+def throughput(fn, texts, repeat):
+    size = sum(len(t.encode("utf-8")) for t in texts)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return {"seconds": round(best, 4), "mb_per_s": round(size / best / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cvs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lang-cvs", type=int, default=100, help="CVs for the (slow) language detection run")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    texts = corpus(args.cvs)
+    mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    print(f"{args.cvs} CVs, {mb:.1f} MB")
+
+    stages = {
+        "normalize": (legacy_normalize_text, normalize_text),
+        "redact": (legacy_redact_pii, redact_pii),
+        "clean": (legacy_clean_whitespace, clean_whitespace),
+        "preprocess": (legacy_preprocess, preprocess),
+    }
+    results = {"cvs": args.cvs, "mb": round(mb, 2), "stages": {}}
+    for stage, (old, new) in stages.items():
+        r = {"legacy": throughput(old, texts, args.repeat), "textprep": throughput(new, texts, args.repeat)}
+        results["stages"][stage] = r
+        print(f"{stage:>10}: legacy {r['legacy']['mb_per_s']:8.1f} MB/s, "
+              f"textprep {r['textprep']['mb_per_s']:8.1f} MB/s")
+
+    try:
+        from langdetect import DetectorFactory, detect
+    except ImportError:
+        print("langdetect not installed, skipping language detection")
+    else:
+        DetectorFactory.seed = 0
+        # long CVs are where sampling matters
+        long_texts = ["\n".join(texts[i:i + 5]) for i in range(0, args.lang_cvs * 5, 5)]
+        r = {"full": throughput(detect, long_texts, 1),
+             "sampled": throughput(lambda t: detect(language_sample(t)), long_texts, 1)}
+        results["language"] = r
+        print(f"  language: full {r['full']['mb_per_s']:8.2f} MB/s, "
+              f"sampled {r['sampled']['mb_per_s']:8.2f} MB/s")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
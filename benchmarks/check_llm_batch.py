@@ -0,0 +1,151 @@
+"""
+Batched LLM extraction (app/llm_batch.py) against a local stub client
+with scripted faults: a CV missing from the batched response, a malformed
+result block, an unparseable response, a failed batch request and a
+failed single-CV retry. Each CV must come back from the batch or from its
+own retry, and only the affected CVs may be retried. The pipeline is then
+run on real files to confirm LLM_BATCH_TOKENS=0 keeps the one-request-per-CV
+path (and that a budget turns batching on).
+
+    python -m benchmarks.check_llm_batch
+"""
+import asyncio, json, os, random, re, sys, tempfile
+
+os.environ.setdefault("CV_CACHE_ENABLED", "0")   # every run must reach the stub
+from app.llm_batch import LLMBatcher
+import app.llm as llm
+import app.pipeline as pipeline
+from benchmarks.corpus import synthetic_cv, cv_text, write_docx
+
+CV_RE = re.compile(r"<<<CV (\d+)>>>\nCV Filename: (.*?)\n")
+SINGLE_RE = re.compile(r"CV Filename: (.*?)\n")
+
+
+class StubClient:
+    """
+    Answers extraction prompts locally. `faults` maps a filename to what
+    goes wrong with it: "missing" or "malformed" in a batched response,
+    "fail" for missing from the batch and failing its single-CV retry.
+    `batch_fault` breaks the whole batched response ("garbage" or
+    "error"). `prompts` records ("batch", [filenames]) or ("single",
+    filename) per request.
+    """
+
+    def __init__(self, faults=None, batch_fault=None):
+        self.faults = faults or {}
+        self.batch_fault = batch_fault
+        self.prompts = []
+
+    @staticmethod
+    def cv(filename):
+        return {"name": filename, "education": [], "experience": [], "publications": [], "awards": []}
+
+    async def generate(self, prompt, model=None):
+        await asyncio.sleep(0)
+        batch = CV_RE.findall(prompt)
+        if not batch:
+            filename = SINGLE_RE.search(prompt).group(1)
+            self.prompts.append(("single", filename))
+            if self.faults.get(filename) == "fail":
+                raise RuntimeError(f"stub failure for {filename}")
+            return json.dumps(self.cv(filename))
+        self.prompts.append(("batch", [name for _, name in batch]))
+        if self.batch_fault == "error":
+            raise RuntimeError("stub batch failure")
+        if self.batch_fault == "garbage":
+            return "Sorry, I cannot help with that."
+        blocks = []
+        for i, name in batch:
+            fault = self.faults.get(name)
+            if fault in ("missing", "fail"):
+                continue
+            body = '{"name": "broken", "education": [' if fault == "malformed" else json.dumps(self.cv(name))
+            blocks.append(f"<<<RESULT {i}>>>\n{body}\n<<<END {i}>>>")
+        return "\n".join(blocks)
+
+    def singles(self):
+        return sorted(name for kind, name in self.prompts if kind == "single")
+
+
+async def batch_case(faults=None, batch_fault=None, n=4):
+    stub = StubClient(faults, batch_fault)
+    batcher = LLMBatcher(stub.generate, max_tokens=100_000, max_items=n)
+    items = [(f"text of cv{i}", f"cv{i}.pdf") for i in range(n)]
+    return stub, batcher, await batcher.extract_many(items)
+
+
+async def batch_checks(check):
+    stub, batcher, results = await batch_case()
+    check("clean batch: one request",
+          [r["name"] for r in results] == ["cv0.pdf", "cv1.pdf", "cv2.pdf", "cv3.pdf"]
+          and len(stub.prompts) == 1 and batcher.stats.retried == 0, stub.prompts)
+
+    stub, batcher, results = await batch_case({"cv1.pdf": "missing"})
+    check("missing CV is retried alone",
+          results[1] == StubClient.cv("cv1.pdf") and stub.singles() == ["cv1.pdf"]
+          and batcher.stats.retried == 1, stub.prompts)
+
+    stub, batcher, results = await batch_case({"cv2.pdf": "malformed"})
+    check("malformed result is retried alone",
+          results[2] == StubClient.cv("cv2.pdf") and stub.singles() == ["cv2.pdf"], stub.prompts)
+
+    for fault in ("garbage", "error"):
+        stub, batcher, results = await batch_case(batch_fault=fault)
+        check(f"unusable batch ({fault}) falls back per CV",
+              all(isinstance(r, dict) for r in results) and len(stub.singles()) == 4
+              and batcher.stats.retried == 4, stub.prompts)
+
+    stub, batcher, results = await batch_case({"cv0.pdf": "missing", "cv3.pdf": "fail"})
+    check("failed retry fails only that CV",
+          isinstance(results[3], Exception) and isinstance(results[0], dict)
+          and results[1] == StubClient.cv("cv1.pdf") and stub.singles() == ["cv0.pdf", "cv3.pdf"]
+          and batcher.stats.failed == 1, results)
+
+
+async def pipeline_run(paths, batch_tokens):
+    stub = StubClient()
+    saved = pipeline.LLM_BATCH_TOKENS, pipeline.LOCAL_EXTRACT, llm.client
+    pipeline.LLM_BATCH_TOKENS, pipeline.LOCAL_EXTRACT, llm.client = batch_tokens, False, stub
+    try:
+        results = await pipeline.extract_cvs(paths)
+    finally:
+        pipeline.LLM_BATCH_TOKENS, pipeline.LOCAL_EXTRACT, llm.client = saved
+    return stub, results
+
+
+async def pipeline_checks(check, tmp):
+    paths = []
+    for i in range(4):
+        paths.append(os.path.join(tmp, f"cv{i}.docx"))
+        write_docx(paths[-1], cv_text(synthetic_cv(random.Random(i), name=f"Person {i}")))
+
+    stub, results = await pipeline_run(paths, 0)
+    check("LLM_BATCH_TOKENS=0: one request per CV",
+          len(results) == 4 and [k for k, _ in stub.prompts] == ["single"] * 4, stub.prompts)
+
+    stub, results = await pipeline_run(paths, 100_000)
+    check("LLM_BATCH_TOKENS set: CVs share requests",
+          len(results) == 4 and any(k == "batch" for k, _ in stub.prompts) and len(stub.prompts) < 4,
+          stub.prompts)
+
+
+def main():
+    failures = []
+
+    def check(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}" + ("" if ok else f": {detail}"))
+        if not ok:
+            failures.append(name)
+
+    asyncio.run(batch_checks(check))
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            asyncio.run(pipeline_checks(check, tmp))
+        finally:
+            pipeline.shutdown_pools()
+    print(f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+The shared LLM client (app/llm_client.py) against a local fake Gemini
+server that answers generateContent with scripted HTTP statuses. Checks
+retries on 429/5xx, fallback models, no retry on 4xx, and the circuit
+breaker opening, rejecting calls without a request, and closing again
+after a successful half-open trial, with only one trial at a time.
+
+    python -m benchmarks.check_llm_client
+    python -m benchmarks.check_llm_client --serve 8765 --fail 503,503,429
+
+--serve runs the fake server alone: point GEMINI_BASE_URL at it (any
+GOOGLE_API_KEY) to try the API or cv_pipeline against failing backends.
+"""
+import argparse, asyncio, json, re, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.llm_client import AsyncLLMClient, LLMError, CircuitOpenError
+
+STATUS_NAMES = {400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL",
+                503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+MODEL_RE = re.compile(r"/models/([^/:]+):generateContent")
+
+
+class FakeGemini(ThreadingHTTPServer):
+    """
+    generateContent on 127.0.0.1. `script[model]` is a list of HTTP
+    statuses served in order (200 once it runs out); `delays[model]` holds
+    each answer back that many seconds; `hits` counts requests per model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.script, self.hits, self.delays = {}, {}, {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_status(self, model):
+        with self.lock:
+            self.hits[model] = self.hits.get(model, 0) + 1
+            statuses = self.script.get(model) or self.script.get("*") or []
+            return statuses.pop(0) if statuses else 200
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        m = MODEL_RE.search(self.path)
+        model = m.group(1) if m else "?"
+        status = self.server.next_status(model)
+        time.sleep(self.server.delays.get(model, 0))
+        if status == 200:
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": f'{{"model": "{model}"}}'}]},
+                                    "finishReason": "STOP"}]}
+        else:
+            body = {"error": {"code": status, "message": f"fake {status}",
+                              "status": STATUS_NAMES.get(status, "UNKNOWN")}}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_client(server, **kwargs):
+    from google import genai
+    from google.genai import types
+    genai_client = genai.Client(api_key="fake-key", http_options=types.HttpOptions(base_url=server.url))
+    options = dict(model_fallbacks=["fallback-model"], max_retries=2, backoff_base=0.01, backoff_max=0.05,
+                   breaker_failures=3, breaker_cooldown=0.3)
+    return AsyncLLMClient(genai_client, **{**options, **kwargs})
+
+
+async def run_checks(server):
+    failures = []
+
+    def check(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {detail}")
+        if not ok:
+            failures.append(name)
+
+    # 429 and 503 are retried with backoff on the same model
+    client = make_client(server)
+    server.script, server.hits = {"primary": [429, 503]}, {}
+    text = await client.generate("hello", "primary")
+    check("retry 429/5xx", text == '{"model": "primary"}' and client.metrics.retries == 2,
+          f"hits={server.hits} retries={client.metrics.retries}")
+
+    # retries exhausted on the primary model -> fallback model
+    client = make_client(server)
+    server.script, server.hits = {"primary": [500, 502, 504]}, {}
+    text = await client.generate("hello", "primary")
+    check("fallback model", text == '{"model": "fallback-model"}' and client.metrics.fallbacks == 1,
+          f"hits={server.hits}")
+
+    # 400 is not retried
+    client = make_client(server)
+    server.script, server.hits = {"primary": [400]}, {}
+    try:
+        await client.generate("hello", "primary")
+        check("no retry on 400", False, "no error raised")
+    except LLMError:
+        check("no retry on 400", server.hits == {"primary": 1}, f"hits={server.hits}")
+
+    # every model keeps failing: the breaker opens after 3 failed calls
+    client = make_client(server)
+    server.script, server.hits = {"*": [503] * 100}, {}
+    for _ in range(3):
+        try:
+            await client.generate("hello", "primary")
+        except LLMError:
+            pass
+    check("breaker opens", client.breaker.state == "open", f"failures={client.metrics.failures}")
+    before = sum(server.hits.values())
+    try:
+        await client.generate("hello", "primary")
+        check("open breaker rejects", False, "no error raised")
+    except CircuitOpenError:
+        check("open breaker rejects", sum(server.hits.values()) == before and client.metrics.rejected == 1,
+              "without an HTTP request")
+
+    # after the cooldown one trial call goes through and closes it
+    server.script = {}
+    await asyncio.sleep(0.35)
+    check("half-open after cooldown", client.breaker.state == "half-open")
+    text = await client.generate("hello", "primary")
+    check("trial closes breaker", client.breaker.state == "closed" and text == '{"model": "primary"}')
+
+    # a call started before the breaker opened ends during the trial: the
+    # trial slot stays taken, so no second trial gets through
+    client = make_client(server, max_retries=0)
+    server.script = {"early": [400], "trial": [200], "*": [503] * 100}
+    server.delays, server.hits = {"early": 0.5, "trial": 0.8}, {}
+    early = asyncio.create_task(client.generate("hello", "early"))
+    await asyncio.sleep(0.05)
+    for _ in range(3):
+        try:
+            await client.generate("hello", "primary")
+        except LLMError:
+            pass
+    await asyncio.sleep(0.35)
+    trial = asyncio.create_task(client.generate("hello", "trial"))
+    await asyncio.sleep(0.05)
+    try:
+        await early
+    except LLMError:
+        pass
+    await asyncio.sleep(0.35)   # cooldown over again, trial still running
+    try:
+        await client.generate("hello", "primary")
+        check("one trial at a time", False, "second call went through during the trial")
+    except CircuitOpenError:
+        check("one trial at a time", server.hits.get("primary") == 3, f"hits={server.hits}")
+    except LLMError:
+        check("one trial at a time", False, f"second call reached the server during the trial: hits={server.hits}")
+    await trial
+    server.delays = {}
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the fake server")
+    parser.add_argument("--fail", default="", help="statuses to serve first, e.g. 503,503,429")
+    args = parser.parse_args()
+
+    server = FakeGemini(args.serve or 0)
+    if args.serve is not None:
+        server.script = {"*": [int(s) for s in args.fail.split(",") if s]}
+        print(f"fake Gemini on {server.url}; set GEMINI_BASE_URL={server.url}")
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        failures = asyncio.run(run_checks(server))
+    finally:
+        server.shutdown()
+    print(f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Lookups of the compiled mappings matcher (app/matcher.py) against known
+answers: alias forms that must resolve to a university_tiers key, names
+whose initials collide with an acronym key and must not, and substring
+matching of degrees and venues against the plain dict scan.
+
+    python -m benchmarks.check_matcher
+"""
+import random, sys
+from app.matcher import MappingMatcher
+
+MAPPINGS = {
+    "degree_levels": {"phd": 1.0, "master": 0.8, "bachelor": 0.6, "diploma": 0.4},
+    "university_tiers": {"MIT": 1.0, "Stanford University": 0.95, "Oxford": 0.9, "ETH": 0.9},
+    "journal_impact": {"Nature": 1.0, "Science": 0.95, "IEEE": 0.7, "ACM": 0.65},
+    "university_aliases": {"Massachusetts Institute of Technology": "MIT"},
+}
+
+# name -> expected university_tiers key (None: no match, default tier)
+UNIVERSITIES = {
+    "MIT": "MIT",
+    "mit": "MIT",
+    "M.I.T.": "MIT",
+    "Massachusetts Institute of Technology": "MIT",   # via university_aliases
+    "Stanford University": "Stanford University",
+    "stanford university": "Stanford University",
+    "Stanford": "Stanford University",
+    "University of Oxford": "Oxford",
+    "Oxford University": "Oxford",
+    "E.T.H.": "ETH",
+    # initials that collide with an acronym key
+    "Michigan Institute of Technology": None,
+    "Manipal Institute of Technology": None,
+    "Madras Institute of Technology": None,
+    "SU": None,
+    "Seoul University": None,
+    "Eastern Technical Highschool": None,
+    "Unknown College": None,
+}
+
+
+def scan(table, text, default):
+    """The original dict scan the automaton must agree with."""
+    return next(((v, k) for k, v in table.items() if k in text), (default, None))
+
+
+def main():
+    matcher = MappingMatcher(MAPPINGS)
+    failures = []
+    for name, key in UNIVERSITIES.items():
+        got = matcher.university_match(name)[1]
+        if got != key:
+            failures.append(f"university {name!r}: expected {key!r}, got {got!r}")
+
+    rng = random.Random(0)
+    words = ["phd", "master", "of", "science", "Nature", "IEEE", "ACM", "Trans", "diploma", "x"]
+    for _ in range(2000):
+        text = " ".join(rng.choices(words, k=rng.randint(0, 5)))
+        if matcher.degree_match(text) != scan(MAPPINGS["degree_levels"], text, 0.4):
+            failures.append(f"degree {text!r}: {matcher.degree_match(text)}")
+        if matcher.venue_match(text) != scan(MAPPINGS["journal_impact"], text, 0.1):
+            failures.append(f"venue {text!r}: {matcher.venue_match(text)}")
+
+    for failure in failures:
+        print("FAIL", failure)
+    print(f"{len(UNIVERSITIES)} university cases, 2000 degree/venue texts: {len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Scores read straight from the candidate store (`ranking.score_stored`,
+i.e. `CandidateStore.columns` + BatchScorer) against `score_cv` on the
+same CVs: the whole store, a `query()` pool, ids deleted after the query,
+and a job description scored from the search index and, for candidates
+changed since the build, from the stored CVs (`semantic_column`).
+
+    python -m benchmarks.check_store
+"""
+import copy, json, os, random, shutil, sys, tempfile
+
+tmp = tempfile.mkdtemp()
+os.environ["SEARCH_INDEX_DIR"] = os.path.join(tmp, "search")
+from app.store import CandidateStore
+from app.search import build_search_index
+from app.ranking import score_stored
+from app.scoring import score_cv
+from benchmarks.corpus import synthetic_cv
+
+
+def odd_cvs(rng):
+    """Shapes the extraction schema allows but synthetic_cv never produces."""
+    cvs = []
+    for i in range(40):
+        cv = synthetic_cv(rng)
+        edu, exp = cv["education"][0], cv["experience"]
+        [lambda: edu.pop("gpa"),
+         lambda: edu.pop("university"),
+         lambda: edu.update(university=None),
+         lambda: edu.update(gpa="3.5"),                       # unscorable
+         lambda: cv.update(awards=["Best Paper", "Fellowship"]),
+         lambda: exp and exp[0].update(end=None),             # still employed
+         lambda: exp and exp[0].update(start="sometime"),
+         lambda: exp and exp[0].update(end="present"),
+         lambda: exp and exp[0].pop("domain"),
+         lambda: cv.update(publications=[{"title": "x"}]),
+         ][i % 10]()
+        cvs.append(cv)
+    return cvs
+
+
+def expected(cvs, config, mappings):
+    out = []
+    for cv in cvs:
+        try:
+            out.append(score_cv(cv, config, mappings))
+        except Exception:
+            out.append(None)
+    return out
+
+
+def main():
+    config = json.load(open("config.json"))
+    mappings = json.load(open("mappings.json"))
+    rng = random.Random(0)
+    store = CandidateStore(os.path.join(tmp, "candidates.sqlite"))
+    cvs = [synthetic_cv(rng) for _ in range(500)] + odd_cvs(rng)
+    ids = store.add_many(cvs)
+    by_id = dict(zip(ids, cvs))
+    failures = []
+
+    def check(name, config, pool=None):
+        pool_ids, scores = score_stored(store, config, mappings, pool)
+        want = expected([by_id[int(i)] for i in pool_ids], config, mappings)
+        got = [None if s != s else float(s) for s in scores]
+        bad = [(int(i), w, g) for i, w, g in zip(pool_ids, want, got) if w != g]
+        print(f"{'ok  ' if not bad else 'FAIL'} {name}: {len(pool_ids)} candidates"
+              + (f", {len(bad)} differ, e.g. (id, score_cv, stored) {bad[:3]}" if bad else ""))
+        if bad:
+            failures.append(name)
+        return pool_ids
+
+    check("whole store", config)
+    pool = store.query(degree="phd", domain="nlp", min_months=12)
+    check("query pool", config, pool)
+
+    gone = [key for key, in store.db.execute("SELECT key FROM candidates WHERE id IN (?, ?)",
+                                              (int(pool[0]), int(pool[1])))]
+    for key in gone:
+        store.delete(key)
+    pool_ids = check("ids deleted after the query", config, pool)
+    if len(pool_ids) != len(pool) - 2:
+        failures.append("deleted ids are dropped")
+        print(f"FAIL deleted ids are dropped: {len(pool)} -> {len(pool_ids)}")
+    for cid in pool[:2]:
+        by_id.pop(int(cid))
+
+    semantic = copy.deepcopy(config)
+    semantic["weights"]["semantic"] = 0.4
+    semantic["policies"]["job_description"] = "NLP research scientist, speech and language models"
+    check("job description, no index", semantic)
+
+    build_search_index(store)
+    fresh = [synthetic_cv(rng) for _ in range(20)]
+    for cid, cv in zip(store.add_many(fresh), fresh):
+        by_id[cid] = cv
+    changed = copy.deepcopy(by_id[ids[5]])
+    changed["experience"].append({"title": "Researcher", "org": "Lab", "start": "2020-01",
+                                  "end": "2024-01", "domain": "NLP"})
+    store.add(changed, key=store.db.execute("SELECT key FROM candidates WHERE id = ?", (ids[5],)).fetchone()[0])
+    by_id[ids[5]] = changed
+    check("job description, index plus changed candidates", semantic)
+
+    print(f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,166 @@
+"""
+Synthetic CV corpus for benchmarks, generated offline and deterministically.
+
+    python -m benchmarks.corpus --out /tmp/cv_corpus --docx 100 --pdf 100 --scanned 20 --json 10000
+
+Writes docx/, pdf/ (text layer), scanned/ (image-only PDFs that need OCR)
+and cvs.jsonl (structured CVs in the extraction schema).
+"""
+import argparse, io, json, os, random, textwrap, zipfile
+import docx
+import fitz
+from PIL import Image, ImageDraw, ImageFont
+
+FIRST = ["Ana", "Bilal", "Chen", "Dana", "Emeka", "Farah", "Goran", "Hiro", "Ines", "Jonas"]
+LAST = ["Alvarez", "Brown", "Cohen", "Das", "Eriksen", "Fischer", "Garcia", "Haddad", "Ito", "Jensen"]
+DEGREES = ["PhD in Computer Science", "Master of Science", "Bachelor of Engineering", "Diploma", "MBA"]
+FIELDS = ["Computer Science", "Linguistics", "Electrical Engineering", "Statistics", "Physics"]
+UNIVERSITIES = ["MIT", "Stanford", "Harvard", "Oxford", "Cambridge", "Unknown College", "State University"]
+ORGS = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Wayne Research"]
+TITLES = ["Research Scientist", "Software Engineer", "ML Engineer", "Data Scientist", "Postdoc"]
+VENUES = ["Nature", "Science", "IEEE Transactions", "ACM SIGIR", "Elsevier", "Workshop on X", "arXiv"]
+DOMAINS = ["NLP", "Computer Vision", "Robotics", "nlp and speech", "Finance"]
+FILLER = ("Designed and shipped systems used by millions of users, led cross-functional teams, "
+          "mentored junior engineers and published results at international venues. ")
+
+
+def synthetic_cv(rng, name=None):
+    """A structured CV in the extraction schema."""
+    def ym(y0, y1):
+        return f"{rng.randint(y0, y1)}-{rng.randint(1, 12):02d}"
+    return {
+        "name": name or f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "education": [{
+            "degree": rng.choice(DEGREES), "field": rng.choice(FIELDS),
+            "university": rng.choice(UNIVERSITIES), "country": "USA",
+            "start": ym(2000, 2010), "end": ym(2011, 2015),
+            "gpa": round(rng.uniform(2.0, 4.0), 2), "scale": 4.0,
+        } for _ in range(rng.randint(1, 3))],
+        "experience": [{
+            "title": rng.choice(TITLES), "org": rng.choice(ORGS),
+            "start": ym(2005, 2015), "end": ym(2016, 2024), "duration_months": None,
+            "domain": rng.choice(DOMAINS),
+        } for _ in range(rng.randint(0, 4))],
+        "publications": [{
+            "title": f"On {rng.choice(DOMAINS)} at scale", "venue": rng.choice(VENUES),
+            "year": rng.randint(2010, 2024), "type": "conference", "authors": [],
+            "author_position": rng.randint(1, 5), "journal_if": None, "domain": rng.choice(DOMAINS),
+        } for _ in range(rng.randint(0, 6))],
+        "awards": [{"title": "Best Paper Award", "issuer": "Conference", "year": rng.randint(2010, 2024),
+                    "type": "academic"} for _ in range(rng.randint(0, 3))],
+    }
+
+
+def cv_text(cv, filler=2):
+    """Plain-text rendering of a structured CV, the way it would appear in a document."""
+    lines = [cv["name"], f"{cv['name'].split()[0].lower()}@example.com  +1 555 0100", "", "EDUCATION"]
+    for e in cv["education"]:
+        gpa = f", GPA {e['gpa']}/4.0" if e.get("gpa") is not None else ""
+        lines.append(f"{e['degree']} in {e['field']}, {e['university']}, {e['start']} - {e['end']}{gpa}")
+    lines += ["", "EXPERIENCE"]
+    for x in cv["experience"]:
+        lines.append(f"{x['title']}, {x['org']} ({x['start']} - {x['end']}) - {x['domain']}")
+        lines.append(FILLER * filler)
+    lines += ["", "PUBLICATIONS"]
+    for p in cv["publications"]:
+        lines.append(f"{p['title']}. {p['venue']}, {p['year']}.")
+    lines += ["", "AWARDS"]
+    for a in cv["awards"]:
+        lines.append(f"{a['title']}, {a['issuer']} {a['year']}")
+    return "\n".join(lines)
+
+
+def write_docx(path, text):
+    d = docx.Document()
+    for line in text.split("\n"):
+        d.add_paragraph(line)
+    d.save(path)
+
+def wrapped(text, width=95):
+    return [w for line in text.split("\n") for w in (textwrap.wrap(line, width) or [""])]
+
+def write_text_pdf(path, text, lines_per_page=60):
+    doc = fitz.open()
+    lines = wrapped(text)
+    for start in range(0, len(lines), lines_per_page):
+        page = doc.new_page()
+        page.insert_text((40, 50), "\n".join(lines[start:start + lines_per_page]), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def write_scanned_pdf(path, text, dpi=150, lines_per_page=60):
+    """Image-only PDF: every page is a rendered bitmap with no text layer."""
+    font = ImageFont.load_default()
+    doc = fitz.open()
+    lines = wrapped(text)
+    for start in range(0, len(lines), lines_per_page):
+        img = Image.new("L", (int(8.27 * dpi), int(11.69 * dpi)), 255)
+        draw = ImageDraw.Draw(img)
+        for i, line in enumerate(lines[start:start + lines_per_page]):
+            draw.text((60, 60 + i * 26), line, fill=0, font=font)
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=image_bytes(img))
+    doc.save(path)
+    doc.close()
+
+def image_bytes(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+WRITERS = {"docx": (".docx", write_docx), "pdf": (".pdf", write_text_pdf), "scanned": (".pdf", write_scanned_pdf)}
+
+def generate(out, counts, seed=0, filler=2):
+    """
+    Write `counts` = {"docx": n, "pdf": n, "scanned": n, "json": n} CVs
+    under `out`. Returns {kind: [paths]} (json -> [path to cvs.jsonl]).
+    """
+    rng = random.Random(seed)
+    written = {}
+    for kind, (ext, write) in WRITERS.items():
+        n = counts.get(kind, 0)
+        if not n:
+            continue
+        os.makedirs(os.path.join(out, kind), exist_ok=True)
+        written[kind] = []
+        for i in range(n):
+            path = os.path.join(out, kind, f"{kind}_{i:05d}{ext}")
+            text = cv_text(synthetic_cv(rng), filler)   # keeps the rng sequence when reusing files
+            if not os.path.exists(path):
+                write(path, text)
+            written[kind].append(path)
+    if counts.get("json"):
+        os.makedirs(out, exist_ok=True)
+        path = os.path.join(out, "cvs.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(counts["json"]):
+                f.write(json.dumps(synthetic_cv(rng, name=f"Candidate {i}")) + "\n")
+        written["json"] = [path]
+    return written
+
+def make_zip(paths, zip_path):
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for i, p in enumerate(paths):
+            z.write(p, f"{i:05d}_{os.path.basename(p)}")
+    return zip_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic CV corpus.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docx", type=int, default=100)
+    parser.add_argument("--pdf", type=int, default=100)
+    parser.add_argument("--scanned", type=int, default=10)
+    parser.add_argument("--json", type=int, default=10000)
+    parser.add_argument("--filler", type=int, default=2, help="paragraphs of filler per job (CV length)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    written = generate(args.out, {"docx": args.docx, "pdf": args.pdf, "scanned": args.scanned,
+                                  "json": args.json}, args.seed, args.filler)
+    for kind, paths in written.items():
+        print(f"{kind}: {len(paths)} file(s) in {os.path.dirname(paths[0])}")
+
+
+if __name__ == "__main__":
+    main()
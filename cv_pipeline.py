@@ -1,32 +1,48 @@
+"""
+Offline CV processing pipeline.
+
+    python cv_pipeline.py --workers 16 --consolidate
+    python cv_pipeline.py --watch          # keep processing the drop folder
+
+Text extraction, language check and cleaning run on a process pool; Gemini
+parsing runs concurrently through the shared LLM client, on CV text trimmed
+to per-section token budgets (app/sections.py). Well-formatted CVs are
+parsed by local rules (app/local_extract.py) and never reach Gemini. Near-duplicate CVs
+(re-submitted, lightly edited copies) are clustered after cleaning and
+parsed once per cluster; clusters are written to duplicates.json. Every
+processed CV is appended to a JSONL file as soon as it is done and recorded
+in a manifest (size, mtime and content hash), so a rerun only processes new
+or changed files; deleted files are removed from the candidate store.
+"""
+import argparse
 import os
 import re
 from pathlib import Path
-from langdetect import detect
-from docx import Document
-from PIL import Image
 import pytesseract
-import fitz
 import json
-from google import genai
-from google.genai import types
+import asyncio
 import dotenv
-import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import time
-from tqdm import tqdm  
+from tqdm import tqdm
+from app.llm_client import get_llm_client, LLMError
+from app.parser import extract_cv_from_file
+from app.cache import file_hash
+from app.store import get_store
+from app.dedup import Deduplicator, DEDUP_ENABLED
+from app.textprep import preprocess, detect_language
+from app.sections import prompt_text
+from app.metrics import PROMPT_TOKENS, EXTRACTIONS
+from app.local_extract import extract_local, LOCAL_EXTRACT, LOCAL_MIN_CONFIDENCE
 
 dotenv.load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 RAW_DIR = "cvs_data/raw_cvs"
-FINAL_JSON = "cvs_data/final/all_cvs.json"
+OUT_DIR = "cvs_data/final"
 LOG_FILE = "logs/logs.txt"
+TESSERACT_CMD = os.getenv("TESSERACT_CMD")  # e.g. C:\Program Files\Tesseract-OCR\tesseract.exe
 
-
-for d in [RAW_DIR, "cvs_data/final", "logs"]:
-    Path(d).mkdir(parents=True, exist_ok=True)
-
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+CV_EXTENSIONS = (".pdf", ".docx")
 
 
 def log_step(message: str):
@@ -35,55 +51,6 @@ def log_step(message: str):
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(f"[{timestamp}] {message}\n")
 
-def redact_pii(text):
-    text = re.sub(r'\b[\w\.-]+@[\w\.-]+\.\w+\b', '[REDACTED_EMAIL]', text)
-    text = re.sub(r'\b\d{10,}\b', '[REDACTED_PHONE]', text)
-    return text
-
-def normalize_text(text):
-    text = unicodedata.normalize("NFKC", text)
-    replacements = {
-        "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
-        "\u2013": "-", "\u2014": "-"
-    }
-    for k, v in replacements.items():
-        text = text.replace(k, v)
-    return text
-
-def clean_whitespace(text):
-    text = re.sub(r'\n\s*\n', '\n', text)
-    text = re.sub(r'[ \t]+', ' ', text)
-    return text.strip()
-
-def extract_text_pdf(path):
-    try:
-        doc = fitz.open(path)
-        full_text = ""
-        for page in doc:
-            t = page.get_text()
-            if t.strip():
-                full_text += t
-            else:
-                pix = page.get_pixmap(dpi=300)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                full_text += pytesseract.image_to_string(img, lang="eng")
-        return full_text
-    except Exception as e:
-        return f"ERROR: {e}"
-
-def extract_text_docx(path):
-    try:
-        doc = Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-    except Exception as e:
-        return f"ERROR: {e}"
-
-def detect_language_safe(text):
-    try:
-        return detect(text)
-    except:
-        return "unknown"
-
 def calculate_duration_months(start, end):
     try:
         start_date = datetime.strptime(start, "%Y-%m")
@@ -93,55 +60,60 @@ def calculate_duration_months(start, end):
     except:
         return None
 
+# ---------------------- EXTRACTION WORKERS ----------------------
+def init_worker(tesseract_cmd):
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+def prepare_cv(path):
+    """
+    Runs in a worker process: extract, language check and clean one CV.
+    Returns (status, text); status is "ok", "failed" or "skipped".
+    """
+    try:
+        text = extract_cv_from_file(path)
+    except Exception as e:
+        return "failed", f"extraction failed: {e}"
+    if not text.strip():
+        return "failed", "extraction failed: no text"
+    if detect_language(text) != "en":
+        return "skipped", "non-English"
+    return "ok", preprocess(text)
+
 # ---------------------- GEMINI PARSING ----------------------
-client = genai.Client(api_key=GOOGLE_API_KEY)
+# Shared async client: token-bucket rate limits, jittered backoff on 429/503,
+# fallback models (LLM_FALLBACK_MODELS) and a circuit breaker.
+client = get_llm_client()
 
-def call_gemini_with_retry(prompt, model_primary="gemini-2.0-flash-lite", max_retries=3, wait_times=[1, 2, 4]):
-    attempts = 0
-    while attempts < max_retries:
-        try:
-            resp = client.models.generate_content(
-                model=model_primary,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0)
-            )
-            return resp.text.strip()
-        except Exception as e:
-            if "503" in str(e) or "overloaded" in str(e):
-                wait = wait_times[min(attempts, len(wait_times)-1)]
-                time.sleep(wait)
-                attempts += 1
-            else:
-                raise e
+async def call_gemini(prompt, model_primary="gemini-2.0-flash-lite"):
+    if client is None:
+        log_step("Gemini call skipped: GOOGLE_API_KEY not set")
+        return None
     try:
-        resp = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0)
-        )
-        return resp.text.strip()
-    except:
+        return (await client.generate(prompt, model_primary)).strip()
+    except LLMError as e:
+        log_step(f"Gemini call failed: {e}")
         return None
 
-def parse_cv_with_gemini(text):
-    prompt = f"""
+async def parse_cv_with_gemini(text):
+    prompt = """
 Extract structured CV information in this JSON format:
 
-{{
-  "education": [{{"degree":"","field":"","university":"","country":"","start":null,"end":null,"gpa":null,"scale":null}}],
-  "experience": [{{"title":"","org":"","start":null,"end":null,"duration_months":null,"domain":""}}],
-  "publications": [{{"title":"","venue":"","year":null,"type":"","authors":[],"author_position":null,"journal_if":null,"domain":""}}],
-  "awards": [{{"title":"","issuer":"","year":null,"type":""}}]
-}}
+{
+  "education": [{"degree":"","field":"","university":"","country":"","start":null,"end":null,"gpa":null,"scale":null}],
+  "experience": [{"title":"","org":"","start":null,"end":null,"duration_months":null,"domain":""}],
+  "publications": [{"title":"","venue":"","year":null,"type":"","authors":[],"author_position":null,"journal_if":null,"domain":""}],
+  "awards": [{"title":"","issuer":"","year":null,"type":""}]
+}
 
 RULES:
 1. For experience, if end date missing, set "end": "currently working".
 2. For education, include only Bachelor's or university-level degree or higher.
 3. Return ONLY valid JSON.
 """
-    raw = call_gemini_with_retry(prompt + text)
+    raw = await call_gemini(prompt + prompt_text(text))
     if not raw:
-        return {"education": [], "experience": [], "publications": [], "awards": []}
+        return None
     try:
         return json.loads(raw)
     except:
@@ -150,57 +122,272 @@ RULES:
         try:
             return json.loads(c)
         except:
-            return {"education": [], "experience": [], "publications": [], "awards": []}
+            return None
+
+async def parse_cv(text):
+    """
+    Structured CV from the rule-based extractor when it is confident (or
+    Gemini is not configured), otherwise from Gemini.
+    """
+    if LOCAL_EXTRACT or client is None:
+        structured, confidence = extract_local(text)
+        if confidence >= LOCAL_MIN_CONFIDENCE or client is None:
+            EXTRACTIONS.inc(method="local")
+            structured.pop("name")   # records are named after their file
+            return structured
+    EXTRACTIONS.inc(method="llm")
+    return await parse_cv_with_gemini(text)
+
+# ---------------------- CHECKPOINTING ----------------------
+def file_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def read_jsonl(path):
+    """Yield records from a JSONL file, ignoring a torn last line after a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def load_manifest(path):
+    """filename -> latest manifest record (key, hash, status) of every file seen."""
+    return {r["file"]: r for r in read_jsonl(path)}
+
+def append_jsonl(f, record):
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+
+def read_saved_cv(jsonl_path, offset):
+    """The structured CV appended at byte `offset` of the JSONL output (without its file name)."""
+    with open(jsonl_path, "rb") as f:
+        f.seek(offset)
+        record = json.loads(f.readline())
+    record.pop("name", None)
+    return record
+
+def consolidate(jsonl_path, json_path, deleted=()):
+    """Write the JSONL results as one JSON array without loading them all at once."""
+    latest = {}
+    for offset, record in enumerate(read_jsonl(jsonl_path)):
+        latest[record["name"]] = offset  # reruns of a changed file supersede older lines
+    keep = {offset for name, offset in latest.items() if name not in deleted}
+    with open(json_path, "w", encoding="utf-8") as out:
+        out.write("[\n")
+        first = True
+        for offset, record in enumerate(read_jsonl(jsonl_path)):
+            if offset not in keep:
+                continue
+            if not first:
+                out.write(",\n")
+            out.write(json.dumps(record, indent=2, ensure_ascii=False))
+            first = False
+        out.write("\n]\n")
+
+def scan(raw_dir, done, seen=None):
+    """
+    Compare the raw directory with the manifest. Returns (changed, deleted):
+    files that are new or whose size/mtime changed, and manifest files that
+    are gone. With `seen` (filename -> key from the previous scan, updated
+    in place) a changed file is only returned once its key is stable across
+    two scans, so files still being copied in are not picked up half written.
+    """
+    files = {f: file_key(os.path.join(raw_dir, f)) for f in os.listdir(raw_dir)
+             if f.lower().endswith(CV_EXTENSIONS)}
+    changed = []
+    for f, key in sorted(files.items()):
+        if done.get(f, {}).get("key") == key:
+            continue
+        if seen is not None and seen.get(f) != key:
+            continue
+        changed.append(f)
+    if seen is not None:
+        seen.clear()
+        seen.update(files)
+    deleted = sorted(f for f, r in done.items() if f not in files and r.get("status") != "deleted")
+    return changed, deleted
 
 # ---------------------- MAIN PIPELINE ----------------------
-if os.path.exists(LOG_FILE):
-    os.remove(LOG_FILE)  # start fresh
-
-final_data = []
-files = os.listdir(RAW_DIR)
-
-for filename in tqdm(files, desc="Processing CVs", ncols=100):
-    path = os.path.join(RAW_DIR, filename)
-    text = ""
-
-    if filename.endswith(".pdf"):
-        text = extract_text_pdf(path)
-    elif filename.endswith(".docx"):
-        text = extract_text_docx(path)
-    else:
-        log_step(f"{filename}: unsupported format")
-        continue
-    log_step(f"{filename}: extraction done")
-
-    if not text.strip() or text.startswith("ERROR"):
-        log_step(f"{filename}: extraction failed")
-        continue
-
-    if detect_language_safe(text) != "en":
-        log_step(f"{filename}: non-English, skipped")
-        continue
-    log_step(f"{filename}: language check passed")
-
-    text = redact_pii(text)
-    text = normalize_text(text)
-    text = clean_whitespace(text)
-    log_step(f"{filename}: cleaning done")
-
-    structured = parse_cv_with_gemini(text)
-    log_step(f"{filename}: parsing done")
-
-    for exp in structured.get("experience", []):
-        if exp.get("end") == "currently working" and exp.get("start"):
-            exp["duration_months"] = calculate_duration_months(exp["start"], exp["end"])
-    log_step(f"{filename}: duration calculation done")
-
-    final_data.append({
-        "name": filename,
-        **structured
-    })
-    log_step(f"{filename}: added to final JSON")
-
-with open(FINAL_JSON, "w", encoding="utf-8") as f:
-    json.dump(final_data, f, indent=2, ensure_ascii=False)
-log_step(f"Final JSON saved: {FINAL_JSON}")
-log_step(" Pipeline completed successfully!")
+async def run_bounded(items, handle, concurrency):
+    """`await handle(item)` for every item, with at most `concurrency` running (and existing) at once."""
+    pending = iter(items)
+
+    async def worker():
+        for item in pending:
+            await handle(item)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(items)))))
+
+async def process_all(args):
+    """
+    Process new and changed files, drop deleted ones; with --watch, keep
+    polling the raw directory every --interval seconds.
+    """
+    out_jsonl = os.path.join(args.out_dir, "cvs.jsonl")
+    manifest_path = os.path.join(args.out_dir, "manifest.jsonl")
+    done = load_manifest(manifest_path)
+
+    loop = asyncio.get_running_loop()
+    # files in progress at once; bounds memory (texts, tasks) however many files are queued
+    concurrency = args.workers * 4
+    counts = {"ok": 0, "skipped": 0, "failed": 0, "unchanged": 0, "deleted": 0}
+    store = get_store()
+    clusters = []
+    # parsing failures are retried on the next run, but not on every poll of the same run
+    attempted = {}
+    seen = {} if args.watch else None
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.tesseract_cmd,)) as pool, \
+            open(out_jsonl, "a", encoding="utf-8") as out, \
+            open(manifest_path, "a", encoding="utf-8") as manifest, \
+            tqdm(total=0, desc="Processing CVs", ncols=100) as progress:
+
+        def record(filename, **fields):
+            entry = {"file": filename, **fields}
+            append_jsonl(manifest, entry)
+            done[filename] = entry
+
+        async def process(filename, dedup):
+            try:
+                await process_file(filename, dedup)
+            finally:
+                if dedup is not None:
+                    dedup.finished(filename)   # later duplicates stop waiting for a skipped or failed file
+
+        async def process_file(filename, dedup):
+            path = os.path.join(args.raw_dir, filename)
+            try:
+                key = file_key(path)
+                digest = await asyncio.to_thread(file_hash, path)
+            except FileNotFoundError:
+                progress.update(1)
+                return   # removed again before we got to it; the next scan records the deletion
+            attempted[filename] = key
+            if done.get(filename, {}).get("hash") == digest:
+                # touched or copied over with the same bytes: nothing to redo
+                record(filename, **{**done[filename], "key": key})
+                log_step(f"{filename}: content unchanged")
+                counts["unchanged"] += 1
+                progress.update(1)
+                return
+
+            status, text = await loop.run_in_executor(pool, prepare_cv, path)
+            log_step(f"{filename}: extraction {status}")
+            detail, duplicate_of = None, None
+            if status == "ok":
+                if dedup is not None:
+                    structured = await dedup.extract(filename, filename, text,
+                                                     lambda: parse_cv(text))
+                    if dedup.representative(filename) != filename:
+                        duplicate_of = dedup.representative(filename)
+                else:
+                    structured = await parse_cv(text)
+                if structured is None:
+                    status, detail = "failed", "parsing failed"
+                else:
+                    for exp in structured.get("experience", []):
+                        if exp.get("end") == "currently working" and exp.get("start"):
+                            exp["duration_months"] = calculate_duration_months(exp["start"], exp["end"])
+                    record_cv = {"name": filename, **structured}
+                    offset = os.fstat(out.fileno()).st_size
+                    append_jsonl(out, record_cv)
+                    if dedup is not None:
+                        # later duplicates re-read this line instead of the CV staying in memory
+                        dedup.saved(filename, offset)
+                    if store is not None:
+                        # upsert: a changed file replaces its earlier version
+                        await asyncio.to_thread(store.add, record_cv, "cv_pipeline", f"file:{filename}")
+            else:
+                detail = text
+            # parsing failures are retried on the next run; everything else is final
+            if detail != "parsing failed":
+                record(filename, key=key, hash=digest, status=status, detail=detail,
+                       duplicate_of=duplicate_of)
+            log_step(f"{filename}: {status}{' (' + detail + ')' if detail else ''}"
+                     f"{' duplicate of ' + duplicate_of if duplicate_of else ''}")
+            counts[status] += 1
+            progress.update(1)
+
+        def remove(filename):
+            if store is not None:
+                store.delete(f"file:{filename}")
+            record(filename, status="deleted")
+            log_step(f"{filename}: deleted")
+            counts["deleted"] += 1
+
+        while True:
+            changed, deleted = scan(args.raw_dir, done, seen)
+            todo = [f for f in changed if attempted.get(f) != seen.get(f)] if seen is not None else changed
+            if todo or deleted or not args.watch:
+                log_step(f"{len(todo)} new or changed CVs to process, {len(deleted)} deleted")
+            for filename in deleted:
+                remove(filename)
+
+            if todo:
+                progress.total += len(todo)
+                progress.refresh()
+                # near-duplicates are clustered within one batch of new files
+                dedup = Deduplicator(todo, load=lambda offset: read_saved_cv(out_jsonl, offset)) \
+                    if DEDUP_ENABLED else None
+                await run_bounded(todo, lambda f: process(f, dedup), concurrency)
+                if dedup is not None and dedup.clusters():
+                    batch = dedup.clusters()
+                    clusters.extend(batch)
+                    with open(os.path.join(args.out_dir, "duplicates.json"), "w", encoding="utf-8") as f:
+                        json.dump(clusters, f, indent=2, ensure_ascii=False)
+                    log_step(f"{sum(len(c['members']) - 1 for c in batch)} near-duplicate CVs "
+                             f"in {len(batch)} clusters (one Gemini call per cluster)")
+
+            if not args.watch:
+                break
+            await asyncio.sleep(args.interval)
+    return counts, {f for f, r in done.items() if r.get("status") == "deleted"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and structure raw CVs into JSONL.")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="processes for extraction/cleaning")
+    parser.add_argument("--tesseract-cmd", default=TESSERACT_CMD,
+                        help="path to the tesseract binary (default: $TESSERACT_CMD or PATH)")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="also write all_cvs.json from the JSONL output")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process CVs as they are added, changed or deleted")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between scans of the raw directory in --watch mode")
+    args = parser.parse_args()
+
+    for d in [args.raw_dir, args.out_dir, os.path.dirname(LOG_FILE)]:
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    try:
+        counts, deleted = asyncio.run(process_all(args))
+    except KeyboardInterrupt:
+        log_step("Watch stopped")
+        return
+    log_step(f"Run finished: {counts}")
+    before, after = PROMPT_TOKENS.values.get(("raw",), 0), PROMPT_TOKENS.values.get(("trimmed",), 0)
+    local, llm = EXTRACTIONS.values.get(("local",), 0), EXTRACTIONS.values.get(("llm",), 0)
+    if local or llm:
+        log_step(f"Structured extraction: {local} CVs by local rules, {llm} sent to Gemini")
+    if before:
+        log_step(f"Prompt CV text: ~{before} tokens before trimming, ~{after} after "
+                 f"({100 * (1 - after / before):.0f}% less)")
+
+    if args.consolidate:
+        final_json = os.path.join(args.out_dir, "all_cvs.json")
+        consolidate(os.path.join(args.out_dir, "cvs.jsonl"), final_json, deleted)
+        log_step(f"Final JSON saved: {final_json}")
+    log_step(" Pipeline completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,35 @@
 let currentConfig = null;
 let currentResults = null;
 let latestResults = [];
+let currentBatchId = null;
+let rescoreTimer = null;
+
+// Default mappings
+const defaultMappings = {
+  degree_levels: {
+    phd: 1.0,
+    master: 0.8,
+    bachelor: 0.6,
+    diploma: 0.4,
+  },
+  university_tiers: {
+    MIT: 1.0,
+    Stanford: 0.95,
+    Harvard: 0.95,
+    Oxford: 0.9,
+    Cambridge: 0.9,
+    "Top Tier": 0.9,
+    "Tier 1": 0.7,
+    "Tier 2": 0.5,
+  },
+  journal_impact: {
+    Nature: 1.0,
+    Science: 0.95,
+    IEEE: 0.7,
+    ACM: 0.65,
+    Elsevier: 0.6,
+  },
+};
 
 // ========== DOM Elements ==========
 const cvZipInput = document.getElementById("cvZip");
@@ -11,6 +40,7 @@ const fileName = document.getElementById("fileName");
 const submitBtn = document.getElementById("submitBtn");
 const resetBtn = document.getElementById("resetBtn");
 const loading = document.getElementById("loading");
+const loadingText = document.getElementById("loadingText");
 const resultsSection = document.getElementById("resultsSection");
 const resultsTable = document.getElementById("resultsTable");
 const detailsModal = document.getElementById("detailsModal");
@@ -203,6 +233,38 @@ function updateConfigJson() {
   currentConfig = getConfigObject();
   const configTextarea = document.getElementById("configJson");
   configTextarea.value = JSON.stringify(currentConfig, null, 2);
+  scheduleRescore();
+}
+
+// ========== Live Rescoring ==========
+// Once a batch has been ranked, weight changes are re-scored on the server
+// against the already extracted CVs instead of re-uploading the zip.
+function scheduleRescore() {
+  if (!currentBatchId) return;
+  clearTimeout(rescoreTimer);
+  rescoreTimer = setTimeout(rescoreBatch, 250);
+}
+
+async function rescoreBatch() {
+  const formData = new FormData();
+  formData.append("config", JSON.stringify(currentConfig));
+  formData.append("mappings", JSON.stringify(defaultMappings));
+
+  try {
+    const response = await fetch(`/batches/${currentBatchId}/rescore`, {
+      method: "POST",
+      body: formData,
+    });
+    if (response.status === 404) {
+      // Batch expired on the server; the next submit will create a new one
+      currentBatchId = null;
+      return;
+    }
+    if (!response.ok) return;
+    displayResults(await response.json());
+  } catch (err) {
+    console.error("Rescore failed:", err);
+  }
 }
 
 function checkSubmitButton() {
@@ -342,46 +404,19 @@ submitBtn.addEventListener("click", async () => {
 
     console.log("Setting UI state...");
     loading.style.display = "block";
+    loadingText.textContent = "Uploading CVs...";
     resultsSection.classList.add("hidden");
     submitBtn.disabled = true;
 
-    console.log("Creating mappings...");
-    // Default mappings
-    const defaultMappings = {
-      degree_levels: {
-        phd: 1.0,
-        master: 0.8,
-        bachelor: 0.6,
-        diploma: 0.4,
-      },
-      university_tiers: {
-        MIT: 1.0,
-        Stanford: 0.95,
-        Harvard: 0.95,
-        Oxford: 0.9,
-        Cambridge: 0.9,
-        "Top Tier": 0.9,
-        "Tier 1": 0.7,
-        "Tier 2": 0.5,
-      },
-      journal_impact: {
-        Nature: 1.0,
-        Science: 0.95,
-        IEEE: 0.7,
-        ACM: 0.65,
-        Elsevier: 0.6,
-      },
-    };
-
     console.log("Creating FormData...");
     const formData = new FormData();
     formData.append("cvs_zip", cvZipInput.files[0]);
     formData.append("config", JSON.stringify(currentConfig));
     formData.append("mappings", JSON.stringify(defaultMappings));
 
-    console.log("Sending request to /rank...");
+    console.log("Sending request to /rank/stream...");
 
-    const response = await fetch("/rank", {
+    const response = await fetch("/rank/stream", {
       method: "POST",
       body: formData,
     });
@@ -394,7 +429,7 @@ submitBtn.addEventListener("click", async () => {
       throw new Error(error.detail || "Server error");
     }
 
-    const data = await response.json();
+    const data = await readRankingStream(response);
     console.log("Response data:", data);
 
     displayResults(data);
@@ -409,9 +444,44 @@ submitBtn.addEventListener("click", async () => {
   }
 });
 
+// ========== Streaming Progress ==========
+// /rank/stream sends one JSON event per line as each CV finishes.
+async function readRankingStream(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let result = null;
+
+  const handle = (event) => {
+    if (event.event === "start") {
+      loadingText.textContent = `Processing ${event.total} CVs...`;
+    } else if (event.event === "progress") {
+      loadingText.textContent = `Processed ${event.done} of ${event.total} CVs (${event.file})`;
+    } else if (event.event === "ranking") {
+      result = event;
+    } else if (event.event === "error") {
+      throw new Error(event.detail);
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.filter((l) => l.trim()).forEach((l) => handle(JSON.parse(l)));
+  }
+  if (buffer.trim()) handle(JSON.parse(buffer));
+
+  if (!result) throw new Error("Ranking stream ended unexpectedly");
+  return result;
+}
+
 // ========== Results Display ==========
 function displayResults(data) {
   currentResults = data;
+  currentBatchId = data.batch_id || null;
   latestResults = data.ranked_candidates || [];
 
   // Summary stats
@@ -609,6 +679,7 @@ function downloadFile(content, filename, type) {
 
 // ========== Reset ==========
 resetBtn.addEventListener("click", () => {
+  currentBatchId = null;
   cvZipInput.value = "";
   filePreview.classList.add("hidden");
   resultsSection.classList.add("hidden");